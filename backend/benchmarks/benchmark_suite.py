@@ -0,0 +1,283 @@
+"""
+再現可能なベンチマークスイート
+
+合成論文コーパス (1k/10k/100k件、日本語・英語) を投入し、Gemini APIをフェイククライアントに
+差し替えたアプリに対して、シナリオごとに同時実行数concurrencyでリクエストを発行する。
+シナリオごとのスループットとp50/p95/p99レイテンシ・エラー数を表示し、--outputでJSONに保存する。
+--baselineに以前の結果を渡すと、p95が--max-regressionを超えて悪化したシナリオがあれば終了コード1で終了する。
+
+シナリオ:
+    search_<search_type>  /search-papers (keyword, title, author, full_text, semantic, hybrid)
+    papers_pagination     /papers (next_cursorをたどって一覧を読み進める)
+    ask_question          /ask-question (毎回異なる質問。本文チャンクの検索を含む)
+    upload                /upload-paper (毎回異なるPDF。全ジョブの完了までの件数/秒も表示する)
+
+使い方 (backendディレクトリで実行):
+    python -m benchmarks.benchmark_suite --corpus 10k --concurrency 16 --requests 400 --output results.json
+    python -m benchmarks.benchmark_suite --corpus 10k --baseline results.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.concurrency_benchmark import calculate_percentile, configure_environment
+from benchmarks.fake_gemini_client import FakeGeminiClient
+from benchmarks.synthetic_corpus import CORPUS_SIZES, SyntheticCorpusGenerator, build_synthetic_pdf, seed_synthetic_corpus
+
+SEARCH_TYPES = ["keyword", "title", "author", "full_text", "semantic", "hybrid"]
+SCENARIOS    = [f"search_{search_type}" for search_type in SEARCH_TYPES] + ["papers_pagination", "ask_question", "upload"]
+
+# アップロードしたジョブの完了を確認する間隔
+JOB_POLL_INTERVAL_SECONDS = 0.05
+
+
+@dataclass
+class ScenarioResult:
+    """シナリオ1件の計測結果"""
+    requests        : int
+    errors          : int
+    elapsed_seconds : float
+    req_per_second  : float
+    p50_ms          : float
+    p95_ms          : float
+    p99_ms          : float
+    # アップロードのみ: 全ジョブの完了までを含めた取り込み件数/秒
+    jobs_per_second : Optional[float] = None
+
+
+class BenchmarkScenarios:
+    """シナリオごとのリクエスト発行 (リクエスト番号から決定的に内容を決める)"""
+
+    def __init__(self, client, generator: SyntheticCorpusGenerator, paper_count: int, seed: int):
+        self.client       = client
+        self.generator    = generator
+        self.paper_count  = paper_count
+        self.seed         = seed
+        self.next_cursor  = None
+        self.upload_jobs  : List[str] = []
+
+    def get_request(self, scenario_name: str) -> Callable[[int], Awaitable[Any]]:
+        """シナリオ名に対応するリクエスト発行関数を取得"""
+        if scenario_name.startswith("search_"):
+            search_type = scenario_name.removeprefix("search_")
+            return lambda request_index: self.search(search_type, request_index)
+        return getattr(self, scenario_name)
+
+    async def search(self, search_type: str, request_index: int):
+        return await self.client.post("/search-papers", json={
+            "query"       : self.generator.generate_search_query(search_type, request_index),
+            "search_type" : search_type,
+            "limit"       : 20,
+        })
+
+    async def papers_pagination(self, request_index: int):
+        # 最後のページまで読んだら先頭から読み直す
+        params   = {"limit": 20} if self.next_cursor is None else {"limit": 20, "cursor": self.next_cursor}
+        response = await self.client.get("/papers", params=params)
+        if response.status_code == 200:
+            self.next_cursor = response.json()["next_cursor"]
+        return response
+
+    async def ask_question(self, request_index: int):
+        paper_random = random.Random(f"{self.seed}-ask-{request_index}")
+        return await self.client.post("/ask-question", json={
+            "paper_id"     : paper_random.randint(1, self.paper_count),
+            "question"     : self.generator.generate_question(request_index),
+            "user_session" : "benchmark",
+        })
+
+    async def upload(self, request_index: int):
+        pdf_bytes = build_synthetic_pdf([
+            f"Synthetic upload {self.seed}-{request_index}. We propose a transformer approach for retrieval.",
+            f"Experiments on public benchmarks show improvements. Upload {request_index}.",
+        ])
+        response = await self.client.post(
+            "/upload-paper",
+            files={"file": (f"benchmark_upload_{request_index}.pdf", pdf_bytes, "application/pdf")}
+        )
+        if response.status_code == 202:
+            self.upload_jobs.append(response.json()["job_id"])
+        return response
+
+    async def wait_for_upload_jobs(self) -> int:
+        """アップロードした全ジョブの完了・失敗を待ち、失敗したジョブ数を返す"""
+        failed_count = 0
+        for job_id in self.upload_jobs:
+            while True:
+                job = (await self.client.get(f"/jobs/{job_id}")).json()
+                if job["status"] in ("completed", "failed"):
+                    failed_count += 1 if job["status"] == "failed" else 0
+                    break
+                await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+        return failed_count
+
+
+async def run_scenario(
+    request       : Callable[[int], Awaitable[Any]],
+    concurrency   : int,
+    request_count : int
+) -> ScenarioResult:
+    """同時実行数concurrencyでrequest_count件のリクエストを発行して計測"""
+    latencies     = []
+    error_count   = 0
+    request_queue = asyncio.Queue()
+    for request_index in range(request_count):
+        request_queue.put_nowait(request_index)
+
+    async def worker():
+        nonlocal error_count
+        while not request_queue.empty():
+            request_index = request_queue.get_nowait()
+            started_at    = time.perf_counter()
+            try:
+                response = await request(request_index)
+                if response.status_code >= 400:
+                    error_count += 1
+            except Exception:
+                error_count += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed    = time.perf_counter() - started_at
+    latencies  = sorted(latencies)
+    return ScenarioResult(
+        requests        = len(latencies),
+        errors          = error_count,
+        elapsed_seconds = elapsed,
+        req_per_second  = len(latencies) / elapsed if elapsed else 0.0,
+        p50_ms          = calculate_percentile(latencies, 0.50) * 1000,
+        p95_ms          = calculate_percentile(latencies, 0.95) * 1000,
+        p99_ms          = calculate_percentile(latencies, 0.99) * 1000
+    )
+
+
+async def run_suite(
+    scenario_names : List[str],
+    generator      : SyntheticCorpusGenerator,
+    paper_count    : int,
+    concurrency    : int,
+    request_count  : int,
+    seed           : int
+) -> Dict[str, ScenarioResult]:
+    """アプリを起動してシナリオを順に実行"""
+    import httpx
+    from main import app, paper_embedding_indexer
+
+    results   = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+        await paper_embedding_indexer.wait_for_backfill()
+        scenarios = BenchmarkScenarios(client, generator, paper_count, seed)
+
+        print(f"{'scenario':<18} {'req/s':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'errors':>7} {'jobs/s':>8}")
+        for scenario_name in scenario_names:
+            started_at = time.perf_counter()
+            result     = await run_scenario(scenarios.get_request(scenario_name), concurrency, request_count)
+            if scenario_name == "upload":
+                # 受付のレイテンシに加え、要約・保存・埋め込みまでを含めた取り込みのスループットを計測する
+                result.errors          += await scenarios.wait_for_upload_jobs()
+                result.jobs_per_second  = len(scenarios.upload_jobs) / (time.perf_counter() - started_at)
+            results[scenario_name] = result
+            jobs_per_second = f"{result.jobs_per_second:.1f}" if result.jobs_per_second is not None else "-"
+            print(
+                f"{scenario_name:<18} {result.req_per_second:>9.1f} {result.p50_ms:>9.1f} {result.p95_ms:>9.1f}"
+                f" {result.p99_ms:>9.1f} {result.errors:>7} {jobs_per_second:>8}"
+            )
+    return results
+
+
+def find_regressions(
+    results        : Dict[str, Dict[str, Any]],
+    baseline       : Dict[str, Dict[str, Any]],
+    max_regression : float
+) -> List[str]:
+    """ベースラインよりp95がmax_regressionの割合を超えて悪化したシナリオの説明を返す"""
+    regressions = []
+    for scenario_name, result in results.items():
+        baseline_result = baseline.get(scenario_name)
+        if baseline_result is None or not baseline_result["p95_ms"]:
+            continue
+        change_ratio = result["p95_ms"] / baseline_result["p95_ms"] - 1
+        if change_ratio > max_regression:
+            regressions.append(
+                f"{scenario_name}: p95 {baseline_result['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms ({change_ratio:+.0%})"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成コーパスとフェイクGeminiによる再現可能なベンチマーク")
+    parser.add_argument("--corpus",            choices=sorted(CORPUS_SIZES), default="1k", help="合成コーパスの論文数")
+    parser.add_argument("--scenarios",         nargs="+", choices=SCENARIOS, default=SCENARIOS, help="実行するシナリオ")
+    parser.add_argument("--concurrency",       type=int,   default=16,  help="同時実行数")
+    parser.add_argument("--requests",          type=int,   default=200, help="シナリオごとのリクエスト数")
+    parser.add_argument("--seed",              type=int,   default=0,   help="コーパス・リクエスト内容の乱数のシード")
+    parser.add_argument("--japanese-ratio",    type=float, default=0.5, help="日本語の論文・クエリの割合")
+    parser.add_argument("--chunks-per-paper",  type=int,   default=4,   help="論文ごとの本文チャンク数")
+    parser.add_argument("--gemini-latency-ms", type=float, default=500, help="フェイクGeminiの生成の遅延(ミリ秒)")
+    parser.add_argument("--gemini-jitter-ms",  type=float, default=0,   help="フェイクGeminiの遅延に加える揺らぎの最大値(ミリ秒)")
+    parser.add_argument("--disable-caches",    action="store_true",     help="検索結果キャッシュを無効にして計測する")
+    parser.add_argument("--output",            default=None, help="結果を保存するJSONファイル")
+    parser.add_argument("--baseline",          default=None, help="比較するベースラインの結果のJSONファイル")
+    parser.add_argument("--max-regression",    type=float, default=0.2, help="許容するp95の悪化の割合")
+    arguments = parser.parse_args()
+
+    paper_count = CORPUS_SIZES[arguments.corpus]
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        configure_environment(os.path.join(temporary_directory, "benchmark.db"))
+        if arguments.disable_caches:
+            os.environ["SEARCH_CACHE_ENABLED"] = "false"
+
+        import main as application  # スキーマを作成する
+        application.gemini_service.client = FakeGeminiClient(
+            latency_seconds        = arguments.gemini_latency_ms / 1000,
+            latency_jitter_seconds = arguments.gemini_jitter_ms / 1000,
+            seed                   = arguments.seed
+        )
+
+        seeding_started_at = time.perf_counter()
+        generator = seed_synthetic_corpus(
+            paper_count, arguments.seed, arguments.japanese_ratio, arguments.chunks_per_paper
+        )
+        print(f"corpus={arguments.corpus} papers={paper_count} seeded in {time.perf_counter() - seeding_started_at:.1f}s")
+
+        scenario_results = asyncio.run(run_suite(
+            arguments.scenarios, generator, paper_count, arguments.concurrency, arguments.requests, arguments.seed
+        ))
+
+    results = {scenario_name: asdict(result) for scenario_name, result in scenario_results.items()}
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            json.dump({
+                "corpus"            : arguments.corpus,
+                "papers"            : paper_count,
+                "concurrency"       : arguments.concurrency,
+                "requests"          : arguments.requests,
+                "seed"              : arguments.seed,
+                "gemini_latency_ms" : arguments.gemini_latency_ms,
+                "disable_caches"    : arguments.disable_caches,
+                "scenarios"         : results,
+            }, output_file, ensure_ascii=False, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["scenarios"]
+        regressions = find_regressions(results, baseline, arguments.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+並行リクエスト時のレイテンシ計測ベンチマーク
+
+検索と論文取得を混在させたリクエストを同時実行数ごとに発行し、
+スループットとp50/p95/p99レイテンシを表示する。
+同時に/healthのレイテンシも計測し、DBアクセスがイベントループを
+ブロックしていないこと (同時実行数を上げてもp99が悪化しないこと) を確認する。
+
+使い方 (backendディレクトリで実行):
+    python -m benchmarks.concurrency_benchmark --papers 5000 --requests 400
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import List, Tuple
+
+
+def configure_environment(database_path: str) -> None:
+    """ベンチマーク用のデータベース・作業ディレクトリとダミーAPIキーを設定"""
+    working_directory = os.path.dirname(database_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-dummy-key")
+    # Gemini APIを呼ばないローカルの埋め込みを使う
+    os.environ["EMBEDDING_BACKEND"]      = "hashing"
+    os.environ["VECTOR_INDEX_DIRECTORY"] = os.path.join(working_directory, "vector_index")
+    os.environ["UPLOAD_DIRECTORY"]       = os.path.join(working_directory, "uploads")
+    os.environ["PDF_STORE_DIRECTORY"]    = os.path.join(working_directory, "pdf_store")
+
+
+def seed_papers(paper_count: int) -> None:
+    """ベンチマーク用の論文データを投入 (シード固定の合成コーパス)"""
+    from benchmarks.synthetic_corpus import seed_synthetic_corpus
+
+    seed_synthetic_corpus(paper_count)
+
+
+def calculate_percentile(sorted_values: List[float], ratio: float) -> float:
+    """ソート済みの値からパーセンタイルを計算"""
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[position]
+
+
+async def run_load(client, concurrency: int, request_count: int, paper_count: int) -> Tuple[List[float], int]:
+    """同時実行数concurrencyで検索・論文取得を発行し、各レイテンシ(秒)とエラー数を返す"""
+    latencies     = []
+    error_count   = 0
+    request_queue = asyncio.Queue()
+    for request_index in range(request_count):
+        request_queue.put_nowait(request_index)
+
+    async def worker():
+        nonlocal error_count
+        while not request_queue.empty():
+            request_index = request_queue.get_nowait()
+            started_at    = time.perf_counter()
+            if request_index % 2 == 0:
+                response = await client.post(
+                    "/search-papers",
+                    json={"query": "ニューラル language", "search_type": "full_text", "limit": 20}
+                )
+            else:
+                response = await client.get(f"/papers/{random.randint(1, paper_count)}")
+            latencies.append(time.perf_counter() - started_at)
+            if response.status_code >= 400:
+                error_count += 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, error_count
+
+
+async def run_probe(client, load_task: asyncio.Task, interval: float = 0.01) -> List[float]:
+    """負荷実行中に/healthを定期的に呼び、イベントループの応答レイテンシ(秒)を返す"""
+    latencies = []
+    while not load_task.done():
+        started_at = time.perf_counter()
+        response   = await client.get("/health")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started_at)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run_benchmark(concurrency_levels: List[int], request_count: int, paper_count: int) -> None:
+    """同時実行数ごとにベンチマークを実行して結果を表示"""
+    import httpx
+    from main import app, paper_embedding_indexer
+
+    transport = httpx.ASGITransport(app=app)
+    # 検索履歴の書き込みなどのバックグラウンド処理も本番と同様に動かす
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await paper_embedding_indexer.wait_for_backfill()
+        print(
+            f"{'concurrency':>11} {'req/s':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}"
+            f" {'errors':>7} {'health p99(ms)':>15}"
+        )
+        for concurrency in concurrency_levels:
+            started_at             = time.perf_counter()
+            load_task              = asyncio.create_task(run_load(client, concurrency, request_count, paper_count))
+            probe_latencies        = sorted(await run_probe(client, load_task))
+            latencies, error_count = await load_task
+            latencies              = sorted(latencies)
+            elapsed                = time.perf_counter() - started_at
+            print(
+                f"{concurrency:>11} {len(latencies) / elapsed:>9.1f}"
+                f" {calculate_percentile(latencies, 0.50) * 1000:>9.1f}"
+                f" {calculate_percentile(latencies, 0.95) * 1000:>9.1f}"
+                f" {calculate_percentile(latencies, 0.99) * 1000:>9.1f}"
+                f" {error_count:>7}"
+                f" {calculate_percentile(probe_latencies, 0.99) * 1000:>15.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="並行リクエスト時のレイテンシ計測")
+    parser.add_argument("--papers",      type=int, default=5000, help="投入する論文数")
+    parser.add_argument("--requests",    type=int, default=400,  help="同時実行数ごとのリクエスト数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64], help="計測する同時実行数")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        configure_environment(os.path.join(temporary_directory, "benchmark.db"))
+        import main as _  # noqa: F401  スキーマを作成する
+        seed_papers(arguments.papers)
+        asyncio.run(run_benchmark(arguments.concurrency, arguments.requests, arguments.papers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+ベンチマーク用のGemini APIフェイククライアント
+
+google-genaiのClientのうちGeminiService・埋め込みで使う部分 (client.aio.files / models / caches) を
+同じ呼び出し方で実装し、設定した遅延の後に要約・回答・埋め込みを返す。
+APIキー・通信なしで、Gemini APIの応答時間を含めたアプリ側の処理を計測できる。
+
+使い方:
+    from main import gemini_service
+    gemini_service.client = FakeGeminiClient(latency_seconds=0.5)
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, List, Optional
+
+# 一括回答のプロンプトから番号付きの質問を取り出す (質問一覧は注意事項の前に並ぶ)
+NUMBERED_QUESTION_PATTERN = re.compile(r"^\d+\. ", re.MULTILINE)
+QUESTION_SECTION_PATTERN  = re.compile(r"質問:\n(.*?)\n回答は以下の点に注意してください", re.DOTALL)
+
+# 概算トークン数 (4文字で1トークンとする)
+CHARACTERS_PER_TOKEN = 4
+
+FAKE_SUMMARY_TEXT = """**TITLE:** Synthetic Benchmark Paper {digest}
+**AUTHORS:** Benchmark Author, Fake Gemini
+**ABSTRACT:** ベンチマーク用に生成した論文の要約です ({digest})。ニューラル language transformer を扱う。
+**INTRODUCTION:** 強化学習と retrieval に関する研究背景を述べる。
+**METHODS:** 分子設計のための最適化手法とグラフ表現を提案する。
+**RESULTS:** 提案手法はベースラインを上回った。
+**DISCUSSION:** 計算コストと精度のトレードオフについて考察する。
+**CONCLUSION:** 今後は大規模なデータでの検証が課題である。
+**KEYWORDS:** ニューラル, transformer, 強化学習, retrieval, benchmark-{digest}
+"""
+
+
+class FakeGeminiError(Exception):
+    """Gemini APIのエラーを模した例外 (codeはHTTPステータス)"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+@dataclass
+class FakeUsageMetadata:
+    prompt_token_count         : int
+    cached_content_token_count : int = 0
+    candidates_token_count     : int = 0
+
+
+@dataclass
+class FakeResponse:
+    text           : str
+    usage_metadata : Optional[FakeUsageMetadata] = None
+
+
+@dataclass
+class FakeNamedResource:
+    """アップロードしたファイル・コンテキストキャッシュ"""
+    name : str
+
+
+@dataclass
+class FakeEmbedding:
+    values : List[float]
+
+
+@dataclass
+class FakeEmbedResponse:
+    embeddings : List[FakeEmbedding] = field(default_factory=list)
+
+
+class FakeGeminiClient:
+    """google-genaiのClientの代わりに使うフェイククライアント"""
+
+    def __init__(
+        self,
+        latency_seconds        : float = 0.5,
+        latency_jitter_seconds : float = 0.0,
+        file_latency_seconds   : float = 0.05,
+        stream_chunk_count     : int   = 8,
+        error_rate             : float = 0.0,
+        embedding_dimensions   : int   = 768,
+        seed                   : int   = 0
+    ):
+        self.latency_seconds        = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        # ファイルのアップロード・削除、キャッシュの作成・削除の遅延
+        self.file_latency_seconds   = file_latency_seconds
+        self.stream_chunk_count     = stream_chunk_count
+        # 生成・埋め込みの呼び出しがこの割合で429 (レート制限) になる
+        self.error_rate             = error_rate
+        self.embedding_dimensions   = embedding_dimensions
+        self._random                = random.Random(seed)
+        self.call_count             = 0
+
+        self.aio = _FakeAsyncClient(self)
+
+    async def wait(self, latency_seconds: Optional[float] = None) -> None:
+        """設定した遅延だけ待機し、error_rateの割合でレート制限のエラーを発生させる"""
+        self.call_count += 1
+        if latency_seconds is None:
+            latency_seconds = self.latency_seconds + self._random.uniform(0, self.latency_jitter_seconds)
+        await asyncio.sleep(latency_seconds)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise FakeGeminiError(429, "RESOURCE_EXHAUSTED (fake)")
+
+
+class _FakeAsyncClient:
+    def __init__(self, client: FakeGeminiClient):
+        self.files  = _FakeFiles(client)
+        self.models = _FakeModels(client)
+        self.caches = _FakeCaches(client)
+
+
+class _FakeFiles:
+    def __init__(self, client: FakeGeminiClient):
+        self.client = client
+
+    async def upload(self, file: str, **kwargs) -> FakeNamedResource:
+        await self.client.wait(self.client.file_latency_seconds)
+        return FakeNamedResource(name=f"files/{hashlib.sha256(str(file).encode()).hexdigest()[:16]}")
+
+    async def delete(self, name: str, **kwargs) -> None:
+        await self.client.wait(self.client.file_latency_seconds)
+
+
+class _FakeCaches:
+    def __init__(self, client: FakeGeminiClient):
+        self.client = client
+        self.created_count = 0
+
+    async def create(self, model: str, config: Any = None) -> FakeNamedResource:
+        await self.client.wait(self.client.file_latency_seconds)
+        self.created_count += 1
+        return FakeNamedResource(name=f"cachedContents/fake-{self.created_count}")
+
+    async def delete(self, name: str, **kwargs) -> None:
+        await self.client.wait(self.client.file_latency_seconds)
+
+
+class _FakeModels:
+    def __init__(self, client: FakeGeminiClient):
+        self.client = client
+
+    async def generate_content(self, model: str, contents: List[Any], config: Any = None) -> FakeResponse:
+        await self.client.wait()
+        prompt_text = _get_prompt_text(contents)
+
+        # PDFを含む要約の呼び出し
+        if "**TITLE:**" in prompt_text:
+            digest = hashlib.sha256(repr(contents).encode()).hexdigest()[:12]
+            return self._create_response(prompt_text, FAKE_SUMMARY_TEXT.format(digest=digest), config)
+
+        # 一括回答はJSON配列を返す
+        if getattr(config, "response_mime_type", None) == "application/json":
+            question_section = QUESTION_SECTION_PATTERN.search(prompt_text)
+            question_count   = len(NUMBERED_QUESTION_PATTERN.findall(question_section.group(1))) if question_section else 1
+            answers = [_create_answer_text(question_number) for question_number in range(1, question_count + 1)]
+            return self._create_response(prompt_text, json.dumps(answers, ensure_ascii=False), config)
+
+        return self._create_response(prompt_text, _create_answer_text(1), config)
+
+    async def generate_content_stream(self, model: str, contents: List[Any], config: Any = None) -> AsyncIterator[FakeResponse]:
+        prompt_text = _get_prompt_text(contents)
+        answer_text = _create_answer_text(1)
+        chunk_count = max(1, self.client.stream_chunk_count)
+        chunk_size  = -(-len(answer_text) // chunk_count)
+
+        async def stream():
+            # 最初のチャンクまでに生成の遅延の大半がかかり、以降は少しずつ届く
+            await self.client.wait()
+            for chunk_start in range(0, len(answer_text), chunk_size):
+                chunk_text = answer_text[chunk_start:chunk_start + chunk_size]
+                if chunk_start + chunk_size >= len(answer_text):
+                    yield self._create_response(prompt_text, chunk_text, config, output_text=answer_text)
+                else:
+                    yield FakeResponse(text=chunk_text)
+                    await asyncio.sleep(self.client.latency_seconds / chunk_count / 10)
+
+        return stream()
+
+    async def embed_content(self, model: str, contents: List[str], config: Any = None) -> FakeEmbedResponse:
+        await self.client.wait(self.client.file_latency_seconds)
+        dimensions = getattr(config, "output_dimensionality", None) or self.client.embedding_dimensions
+        return FakeEmbedResponse(embeddings=[
+            FakeEmbedding(values=_create_embedding_values(content, dimensions)) for content in contents
+        ])
+
+    def _create_response(self, prompt_text: str, text: str, config: Any, output_text: Optional[str] = None) -> FakeResponse:
+        """概算トークン数のusage_metadataを付けたレスポンス (キャッシュ利用時は論文コンテキスト分をキャッシュ扱いにする)"""
+        prompt_token_count = len(prompt_text) // CHARACTERS_PER_TOKEN + 1
+        cached_token_count = 0
+        if getattr(config, "cached_content", None):
+            cached_token_count  = 4096
+            prompt_token_count += cached_token_count
+        return FakeResponse(text=text, usage_metadata=FakeUsageMetadata(
+            prompt_token_count         = prompt_token_count,
+            cached_content_token_count = cached_token_count,
+            candidates_token_count     = len(output_text or text) // CHARACTERS_PER_TOKEN + 1
+        ))
+
+
+def _get_prompt_text(contents: List[Any]) -> str:
+    """contentsのうち文字列のプロンプト部分を連結 (アップロードしたファイルは除く)"""
+    return "\n".join(content for content in contents if isinstance(content, str))
+
+
+def _create_answer_text(question_number: int) -> str:
+    return (
+        f"[フェイク回答 {question_number}] この論文では提案手法の限界として評価データの規模が挙げられています。"
+        "根拠: 考察および結論の項目。"
+    )
+
+
+def _create_embedding_values(content: str, dimensions: int) -> List[float]:
+    """テキストから決定的な単位ベクトルを生成"""
+    content_random = random.Random(hashlib.sha256(content.encode()).digest())
+    values = [content_random.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(value * value for value in values) ** 0.5 or 1.0
+    return [value / norm for value in values]
@@ -0,0 +1,143 @@
+"""
+SQLiteのPRAGMAプロファイル別の並行読み書きベンチマーク
+
+SQLITE_PROFILEごとに別プロセスで、全文検索 (読み取り専用セッション) と
+質問履歴のINSERT (書き込みセッション、1件ごとにコミット) を同時に一定時間実行し、
+スループット・p50/p99レイテンシ・エラー数 ("database is locked" など) を表示する。
+
+使い方 (backendディレクトリで実行):
+    python -m benchmarks.sqlite_profile_benchmark --papers 5000 --readers 16 --writers 4 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.concurrency_benchmark import calculate_percentile, configure_environment, seed_papers
+
+SEARCH_QUERIES = ["ニューラル", "transformer", "強化学習 language", "retrieval", "分子設計 最適化"]
+
+
+async def run_workload(reader_count: int, writer_count: int, duration_seconds: float) -> Dict[str, Any]:
+    """読み取り・書き込みを同時に実行し、種類ごとのレイテンシ(秒)とエラー数を集計"""
+    from database.connection import AsyncSessionLocal, ReadOnlyAsyncSessionLocal
+    from models.database_models import QAHistory
+    from services.search_service import SearchService
+
+    search_service = SearchService()
+    latencies      = {"read": [], "write": []}
+    error_counts   = {"read": 0, "write": 0}
+    deadline       = time.perf_counter() + duration_seconds
+
+    async def reader(reader_index: int):
+        request_index = reader_index
+        while time.perf_counter() < deadline:
+            started_at = time.perf_counter()
+            try:
+                async with ReadOnlyAsyncSessionLocal() as db:
+                    await search_service.search_papers(
+                        SEARCH_QUERIES[request_index % len(SEARCH_QUERIES)], "full_text", 20, db
+                    )
+                latencies["read"].append(time.perf_counter() - started_at)
+            except Exception:
+                error_counts["read"] += 1
+            request_index += 1
+
+    async def writer(writer_index: int):
+        while time.perf_counter() < deadline:
+            started_at = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    db.add(QAHistory(
+                        paper_id     = 1,
+                        question     = f"benchmark question {writer_index}",
+                        answer       = "benchmark answer " * 50,
+                        user_session = f"writer-{writer_index}"
+                    ))
+                    await db.commit()
+                latencies["write"].append(time.perf_counter() - started_at)
+            except Exception:
+                error_counts["write"] += 1
+
+    await asyncio.gather(
+        *[reader(reader_index) for reader_index in range(reader_count)],
+        *[writer(writer_index) for writer_index in range(writer_count)]
+    )
+
+    summary = {}
+    for operation_name, operation_latencies in latencies.items():
+        sorted_latencies = sorted(operation_latencies)
+        summary[operation_name] = {
+            "ops_per_second" : len(sorted_latencies) / duration_seconds,
+            "p50_ms"         : calculate_percentile(sorted_latencies, 0.50) * 1000,
+            "p99_ms"         : calculate_percentile(sorted_latencies, 0.99) * 1000,
+            "errors"         : error_counts[operation_name],
+        }
+    return summary
+
+
+def run_profile(arguments: argparse.Namespace) -> None:
+    """1つのプロファイルでベンチマークを実行し、結果をJSONで出力 (子プロセス)"""
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        configure_environment(os.path.join(temporary_directory, "benchmark.db"))
+        from database.connection import engine
+        from database.schema import run_database_migrations
+
+        run_database_migrations(engine)
+        seed_papers(arguments.papers)
+        summary = asyncio.run(run_workload(arguments.readers, arguments.writers, arguments.duration))
+    print(json.dumps(summary))
+
+
+def compare_profiles(arguments: argparse.Namespace, profile_names: List[str]) -> None:
+    """プロファイルごとに子プロセスでベンチマークを実行して結果を表示"""
+    print(
+        f"{'profile':>12} {'op':>6} {'ops/s':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'errors':>7}"
+    )
+    for profile_name in profile_names:
+        # 接続設定はモジュール読み込み時に決まるため、プロファイルごとにプロセスを分ける
+        completed_process = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.sqlite_profile_benchmark", "--run-profile",
+                "--papers", str(arguments.papers), "--readers", str(arguments.readers),
+                "--writers", str(arguments.writers), "--duration", str(arguments.duration),
+            ],
+            env={**os.environ, "SQLITE_PROFILE": profile_name},
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        summary = json.loads(completed_process.stdout.strip().splitlines()[-1])
+        for operation_name, operation_summary in summary.items():
+            print(
+                f"{profile_name:>12} {operation_name:>6}"
+                f" {operation_summary['ops_per_second']:>9.1f}"
+                f" {operation_summary['p50_ms']:>9.1f}"
+                f" {operation_summary['p99_ms']:>9.1f}"
+                f" {operation_summary['errors']:>7}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLiteのPRAGMAプロファイル別の並行読み書きベンチマーク")
+    parser.add_argument("--papers",   type=int,   default=5000, help="投入する論文数")
+    parser.add_argument("--readers",  type=int,   default=16,   help="同時に検索するタスク数")
+    parser.add_argument("--writers",  type=int,   default=4,    help="同時に書き込むタスク数")
+    parser.add_argument("--duration", type=float, default=10.0, help="プロファイルごとの計測時間(秒)")
+    parser.add_argument("--profiles", nargs="+",  default=["default", "performance"], help="比較するSQLITE_PROFILE")
+    parser.add_argument("--run-profile", action="store_true", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.run_profile:
+        run_profile(arguments)
+    else:
+        compare_profiles(arguments, arguments.profiles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+ベンチマーク用の合成論文コーパスの生成
+
+日本語・英語の論文 (要約項目・キーワード・質問回答用コンテキスト・本文チャンク) を
+シードから決定的に生成し、キーワード索引・全文検索インデックスと合わせてデータベースに投入する。
+同じシード・件数であれば毎回同じコーパスになるため、実行ごとの結果を比較できる。
+
+使い方 (backendディレクトリで実行。DATABASE_URLのデータベースに追加する):
+    python -m benchmarks.synthetic_corpus --size 10k --japanese-ratio 0.5 --chunks-per-paper 8
+"""
+import argparse
+import hashlib
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+# コーパスの規模のプリセット
+CORPUS_SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+
+# 1回のINSERTにまとめる論文数
+SEED_BATCH_SIZE = 2000
+
+# 日本語の論文の語彙
+JAPANESE_TOPICS = [
+    "グラフニューラルネットワーク", "強化学習", "分子設計", "大規模言語モデル", "画像認識", "音声合成",
+    "推薦システム", "異常検知", "知識グラフ", "因果推論", "ベイズ最適化", "連合学習",
+]
+JAPANESE_METHODS = ["注意機構", "対照学習", "拡散モデル", "ニューラル", "自己教師あり学習", "転移学習", "最適化", "蒸留"]
+JAPANESE_DATASETS = ["ベンチマーク", "実データ", "医療データ", "材料データ", "対話コーパス", "時系列データ"]
+JAPANESE_SENTENCES = [
+    "本研究では{method}を用いた{topic}の新しい手法を提案する。",
+    "{dataset}における実験により、提案手法が従来手法を上回ることを示した。",
+    "{topic}では計算コストと精度のトレードオフが課題となっている。",
+    "{method}により{topic}の汎化性能が向上することを確認した。",
+    "限界として{dataset}の規模が小さいことが挙げられる。",
+    "今後の課題は{topic}への{method}の適用範囲の拡大である。",
+]
+
+# 英語の論文の語彙
+ENGLISH_TOPICS = [
+    "graph neural networks", "reinforcement learning", "molecular design", "language models", "image recognition",
+    "speech synthesis", "recommender systems", "anomaly detection", "knowledge graphs", "causal inference",
+    "bayesian optimization", "federated learning",
+]
+ENGLISH_METHODS = ["attention", "contrastive learning", "diffusion", "transformer", "self-supervised learning", "retrieval", "distillation"]
+ENGLISH_DATASETS = ["public benchmarks", "clinical records", "materials data", "dialogue corpora", "time series", "web-scale language data"]
+ENGLISH_SENTENCES = [
+    "We propose a {method} approach for {topic}.",
+    "Experiments on {dataset} show that the proposed method outperforms strong baselines.",
+    "A key challenge in {topic} is the trade-off between computational cost and accuracy.",
+    "We find that {method} improves the generalization of {topic}.",
+    "A limitation of this work is the limited size of {dataset}.",
+    "Future work includes extending {method} to broader settings of {topic}.",
+]
+
+AUTHOR_FAMILY_NAMES = ["Sato", "Suzuki", "Takahashi", "Tanaka", "Smith", "Johnson", "Garcia", "Chen", "Kim", "Müller"]
+AUTHOR_GIVEN_NAMES  = ["Yuki", "Haruto", "Aoi", "Ren", "Emma", "Liam", "Sofia", "Wei", "Min-jun", "Lena"]
+
+
+class SyntheticCorpusGenerator:
+    """シードから決定的に合成論文を生成"""
+
+    def __init__(self, seed: int = 0, japanese_ratio: float = 0.5, chunks_per_paper: int = 0):
+        self.seed             = seed
+        self.japanese_ratio   = japanese_ratio
+        self.chunks_per_paper = chunks_per_paper
+
+    def generate_paper(self, paper_id: int) -> Tuple[Dict[str, Any], List[str], List[Tuple[int, str]]]:
+        """論文1件の (papersの行, キーワード, (ページ番号, 本文チャンク)のリスト) を生成"""
+        from database.paper_context import build_paper_context
+
+        # 論文ごとに乱数を初期化し、生成順・件数によらず同じ論文IDからは同じ内容を生成する
+        paper_random = random.Random(f"{self.seed}-{paper_id}")
+        is_japanese  = paper_random.random() < self.japanese_ratio
+        vocabulary   = self._get_vocabulary(is_japanese)
+        topic        = paper_random.choice(vocabulary["topics"])
+        method       = paper_random.choice(vocabulary["methods"])
+
+        def paragraph(sentence_count: int) -> str:
+            separator = "" if is_japanese else " "
+            return separator.join(
+                paper_random.choice(vocabulary["sentences"]).format(
+                    topic=topic if paper_random.random() < 0.7 else paper_random.choice(vocabulary["topics"]),
+                    method=method if paper_random.random() < 0.7 else paper_random.choice(vocabulary["methods"]),
+                    dataset=paper_random.choice(vocabulary["datasets"])
+                )
+                for _ in range(sentence_count)
+            )
+
+        if is_japanese:
+            title = f"{method}を用いた{topic}に関する研究"
+        else:
+            title = f"{method.capitalize()} for {topic.capitalize()}"
+        keywords = [topic, method, *paper_random.sample(vocabulary["methods"], k=2)]
+        keywords = list(dict.fromkeys(keywords))
+
+        paper_row = {
+            "paper_id"             : paper_id,
+            "original_filename"    : f"synthetic_{paper_id}.pdf",
+            "title"                : title,
+            "authors"              : ", ".join(
+                f"{paper_random.choice(AUTHOR_GIVEN_NAMES)} {paper_random.choice(AUTHOR_FAMILY_NAMES)}"
+                for _ in range(paper_random.randint(1, 5))
+            ),
+            "abstract"             : paragraph(4),
+            "summary_introduction" : paragraph(5),
+            "summary_methods"      : paragraph(5),
+            "summary_results"      : paragraph(5),
+            "summary_discussion"   : paragraph(4),
+            "summary_conclusion"   : paragraph(3),
+            "keywords"             : keywords,
+            "upload_date"          : datetime(2024, 1, 1) + timedelta(minutes=paper_id),
+            "file_size"            : paper_random.randint(200_000, 5_000_000),
+            "file_hash"            : hashlib.sha256(f"synthetic-{self.seed}-{paper_id}".encode()).hexdigest(),
+        }
+        paper_context = build_paper_context(SimpleNamespace(**paper_row))
+        paper_row.update({
+            "qa_context"                     : paper_context.text,
+            "qa_context_token_count"         : paper_context.token_count,
+            "qa_context_trimmed_token_count" : paper_context.trimmed_token_count,
+        })
+
+        chunks = [
+            (chunk_index // 2 + 1, paragraph(12))
+            for chunk_index in range(self.chunks_per_paper)
+        ]
+        return paper_row, keywords, chunks
+
+    def generate_question(self, question_index: int) -> str:
+        """質問回答のベンチマーク用の質問を生成 (回答キャッシュに当たらないよう番号を含める)"""
+        question_random = random.Random(f"{self.seed}-question-{question_index}")
+        if question_random.random() < self.japanese_ratio:
+            topic = question_random.choice(JAPANESE_TOPICS)
+            return f"この論文の{topic}における限界と今後の課題は何ですか？ (#{question_index})"
+        topic = question_random.choice(ENGLISH_TOPICS)
+        return f"What are the limitations of this work on {topic}? (#{question_index})"
+
+    def generate_search_query(self, search_type: str, query_index: int) -> str:
+        """検索タイプに応じた検索クエリを生成"""
+        query_random = random.Random(f"{self.seed}-query-{search_type}-{query_index}")
+        is_japanese  = query_random.random() < self.japanese_ratio
+        vocabulary   = self._get_vocabulary(is_japanese)
+        if search_type == "author":
+            return query_random.choice(AUTHOR_FAMILY_NAMES)
+        if search_type == "keyword":
+            return ", ".join(query_random.sample(vocabulary["topics"] + vocabulary["methods"], k=query_random.randint(1, 2)))
+        if search_type == "title":
+            return query_random.choice(vocabulary["methods"])
+        return f"{query_random.choice(vocabulary['methods'])} {query_random.choice(vocabulary['topics'])}"
+
+    def _get_vocabulary(self, is_japanese: bool) -> Dict[str, List[str]]:
+        """言語ごとの語彙"""
+        if is_japanese:
+            return {"topics": JAPANESE_TOPICS, "methods": JAPANESE_METHODS, "datasets": JAPANESE_DATASETS, "sentences": JAPANESE_SENTENCES}
+        return {"topics": ENGLISH_TOPICS, "methods": ENGLISH_METHODS, "datasets": ENGLISH_DATASETS, "sentences": ENGLISH_SENTENCES}
+
+
+def seed_synthetic_corpus(
+    paper_count      : int,
+    seed             : int   = 0,
+    japanese_ratio   : float = 0.5,
+    chunks_per_paper : int   = 0,
+    generator        : Optional[SyntheticCorpusGenerator] = None
+) -> SyntheticCorpusGenerator:
+    """合成論文をpaper_count件データベースに投入 (キーワード索引・全文検索インデックスも作成される)"""
+    from sqlalchemy import func, insert, select
+    from database.connection import engine
+    from database.keyword_index import normalize_keywords
+    from models.database_models import Paper, PaperChunk, PaperKeyword
+
+    generator = generator or SyntheticCorpusGenerator(seed, japanese_ratio, chunks_per_paper)
+    with engine.begin() as connection:
+        first_paper_id = (connection.execute(select(func.max(Paper.paper_id))).scalar() or 0) + 1
+        for batch_start in range(first_paper_id, first_paper_id + paper_count, SEED_BATCH_SIZE):
+            batch_end = min(batch_start + SEED_BATCH_SIZE, first_paper_id + paper_count)
+            paper_rows, keyword_rows, chunk_rows = [], [], []
+            for paper_id in range(batch_start, batch_end):
+                paper_row, keywords, chunks = generator.generate_paper(paper_id)
+                paper_rows.append(paper_row)
+                keyword_rows += [
+                    {"paper_id": paper_id, "keyword_normalised": normalized_keyword}
+                    for normalized_keyword in normalize_keywords(keywords)
+                ]
+                chunk_rows += [
+                    {"paper_id": paper_id, "chunk_index": chunk_index, "page_number": page_number, "content": content}
+                    for chunk_index, (page_number, content) in enumerate(chunks)
+                ]
+
+            # ORMを経由せずにまとめてINSERTする (全文検索インデックスはトリガーで作成される)
+            connection.execute(insert(Paper), paper_rows)
+            connection.execute(insert(PaperKeyword), keyword_rows)
+            if chunk_rows:
+                connection.execute(insert(PaperChunk), chunk_rows)
+    return generator
+
+
+def build_synthetic_pdf(page_texts: List[str]) -> bytes:
+    """テキストのみの最小構成のPDFを作成 (アップロードのベンチマーク用。ASCII文字のみ対応)"""
+    page_count      = len(page_texts)
+    font_object_id  = 3 + page_count * 2
+    page_object_ids = [3 + page_index * 2 for page_index in range(page_count)]
+
+    pdf_objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: (
+            f"<< /Type /Pages /Kids [{' '.join(f'{object_id} 0 R' for object_id in page_object_ids)}]"
+            f" /Count {page_count} >>"
+        ).encode(),
+        font_object_id: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_object_id, page_text in zip(page_object_ids, page_texts):
+        escaped_text   = page_text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        content_stream = f"BT /F1 10 Tf 50 750 Td ({escaped_text}) Tj ET".encode("latin-1", "replace")
+        pdf_objects[page_object_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {page_object_id + 1} 0 R"
+            f" /Resources << /Font << /F1 {font_object_id} 0 R >> >> >>"
+        ).encode()
+        pdf_objects[page_object_id + 1] = (
+            f"<< /Length {len(content_stream)} >>\nstream\n".encode() + content_stream + b"\nendstream"
+        )
+
+    pdf_bytes      = b"%PDF-1.4\n"
+    object_offsets = []
+    for object_id in sorted(pdf_objects):
+        object_offsets.append(len(pdf_bytes))
+        pdf_bytes += f"{object_id} 0 obj\n".encode() + pdf_objects[object_id] + b"\nendobj\n"
+
+    xref_offset = len(pdf_bytes)
+    pdf_bytes  += f"xref\n0 {len(pdf_objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf_bytes  += b"".join(f"{object_offset:010d} 00000 n \n".encode() for object_offset in object_offsets)
+    pdf_bytes  += f"trailer\n<< /Size {len(pdf_objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF".encode()
+    return pdf_bytes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ベンチマーク用の合成論文コーパスを投入")
+    parser.add_argument("--size",             choices=sorted(CORPUS_SIZES), default="1k", help="投入する論文数のプリセット")
+    parser.add_argument("--papers",           type=int,   default=None, help="投入する論文数 (--sizeより優先)")
+    parser.add_argument("--seed",             type=int,   default=0,    help="乱数のシード")
+    parser.add_argument("--japanese-ratio",   type=float, default=0.5,  help="日本語の論文の割合")
+    parser.add_argument("--chunks-per-paper", type=int,   default=0,    help="論文ごとの本文チャンク数")
+    arguments = parser.parse_args()
+
+    from database.connection import engine
+    from database.schema import run_database_migrations
+
+    run_database_migrations(engine)
+    paper_count = arguments.papers or CORPUS_SIZES[arguments.size]
+    started_at  = time.perf_counter()
+    seed_synthetic_corpus(paper_count, arguments.seed, arguments.japanese_ratio, arguments.chunks_per_paper)
+    print(f"seeded={paper_count} elapsed={time.perf_counter() - started_at:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
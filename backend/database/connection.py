@@ -1,23 +1,75 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from database.sqlite_tuning import build_pool_arguments, get_sqlite_pragmas, install_sqlite_pragmas
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./papers.db")
+# 同期ドライバのURLに対応する非同期ドライバ
+ASYNC_DRIVER_SCHEMES = {
+    "sqlite"     : "sqlite+aiosqlite",
+    "postgresql" : "postgresql+asyncpg",
+}
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+
+def to_async_database_url(database_url: str) -> str:
+    """同期ドライバのデータベースURLを非同期ドライバのURLに変換"""
+    scheme, separator, remainder = database_url.partition("://")
+    async_scheme = ASYNC_DRIVER_SCHEMES.get(scheme, scheme)
+    return f"{async_scheme}{separator}{remainder}"
+
+
+DATABASE_URL                 = os.getenv("DATABASE_URL", "sqlite:///./papers.db")
+ASYNC_DATABASE_URL           = os.getenv("ASYNC_DATABASE_URL", to_async_database_url(DATABASE_URL))
+# 参照系エンドポイント用 (PostgreSQLではリードレプリカを指定できる)
+READ_ONLY_ASYNC_DATABASE_URL = os.getenv("READ_ONLY_ASYNC_DATABASE_URL", ASYNC_DATABASE_URL)
+
+SQLITE_PRAGMAS = get_sqlite_pragmas()
+
+# スキーマ作成・インデックス初期化などの起動時処理用 (同期)
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    **build_pool_arguments(DATABASE_URL)
+)
+install_sqlite_pragmas(engine, SQLITE_PRAGMAS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# APIエンドポイント用 (非同期)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **build_pool_arguments(ASYNC_DATABASE_URL))
+install_sqlite_pragmas(async_engine.sync_engine, SQLITE_PRAGMAS)
+AsyncSessionLocal = async_sessionmaker(
+    bind             = async_engine,
+    class_           = AsyncSession,
+    autoflush        = False,
+    expire_on_commit = False
+)
+
+# 参照系エンドポイント用 (非同期・読み取り専用)
+read_only_async_engine = create_async_engine(
+    READ_ONLY_ASYNC_DATABASE_URL, **build_pool_arguments(READ_ONLY_ASYNC_DATABASE_URL)
+)
+install_sqlite_pragmas(read_only_async_engine.sync_engine, SQLITE_PRAGMAS, read_only=True)
+ReadOnlyAsyncSessionLocal = async_sessionmaker(
+    bind             = read_only_async_engine,
+    class_           = AsyncSession,
+    autoflush        = False,
+    expire_on_commit = False
+)
+
 Base = declarative_base()
 
 
-def get_database_session():
+async def get_database_session():
     """データベースセッションを取得"""
-    database_session = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as database_session:
+        yield database_session
+
+
+async def get_read_only_database_session():
+    """読み取り専用のデータベースセッションを取得 (書き込みを行わないエンドポイント用)"""
+    async with ReadOnlyAsyncSessionLocal() as database_session:
         yield database_session
-    finally:
-        database_session.close()
\ No newline at end of file
@@ -0,0 +1,42 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# corpus_stateの唯一の行のID
+CORPUS_STATE_ID = 1
+
+# 論文の追加・更新・削除のたびにコーパスの更新回数を進めるトリガー
+CORPUS_VERSION_TRIGGER_NAMES = [
+    "corpus_state_after_paper_insert",
+    "corpus_state_after_paper_update",
+    "corpus_state_after_paper_delete",
+]
+
+
+def _create_corpus_version_trigger_statements() -> list:
+    """論文テーブルの変更でコーパスの更新回数を進めるトリガーのDDLを作成"""
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {trigger_name} AFTER {operation} ON papers BEGIN
+            UPDATE corpus_state SET version = version + 1 WHERE state_id = {CORPUS_STATE_ID};
+        END
+        """
+        for trigger_name, operation in zip(CORPUS_VERSION_TRIGGER_NAMES, ["INSERT", "UPDATE", "DELETE"])
+    ]
+
+
+def create_corpus_version_triggers(connection: Connection) -> None:
+    """コーパスの更新回数の行とトリガーを作成 (CLI・他のワーカープロセスでの論文の保存も検索結果キャッシュに反映する)"""
+    connection.execute(
+        text(f"INSERT INTO corpus_state (state_id, version) SELECT {CORPUS_STATE_ID}, 0 "
+             f"WHERE NOT EXISTS (SELECT 1 FROM corpus_state WHERE state_id = {CORPUS_STATE_ID})")
+    )
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in _create_corpus_version_trigger_statements():
+        connection.execute(text(statement))
+
+
+def drop_corpus_version_triggers(connection: Connection) -> None:
+    """コーパスの更新回数のトリガーを削除"""
+    for trigger_name in CORPUS_VERSION_TRIGGER_NAMES:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger_name}"))
@@ -0,0 +1,154 @@
+from sqlalchemy import Table, Column, Integer, Text, MetaData, text
+from sqlalchemy.engine import Connection
+
+
+# 全文検索インデックス (FTS5) の対象カラム
+FULL_TEXT_INDEX_COLUMNS = [
+    "title",
+    "authors",
+    "abstract",
+    "keywords",
+    "summary_introduction",
+    "summary_methods",
+    "summary_results",
+    "summary_discussion",
+    "summary_conclusion",
+]
+
+# trigramトークナイザは3文字未満の語をMATCHで検索できない
+TRIGRAM_MINIMUM_TERM_LENGTH = 3
+
+# Base.metadataとは分離し、create_allの対象外にする
+full_text_index_metadata = MetaData()
+
+papers_fts_table = Table(
+    "papers_fts",
+    full_text_index_metadata,
+    Column("rowid", Integer, primary_key=True),
+    *[Column(column_name, Text) for column_name in FULL_TEXT_INDEX_COLUMNS],
+)
+
+# 論文本文チャンクの全文検索インデックス (本文はpaper_chunksにのみ保存し、FTS5には索引だけを持たせる)
+paper_chunks_fts_table = Table(
+    "paper_chunks_fts",
+    full_text_index_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("content", Text),
+)
+
+
+def _build_index_values(row_alias: str) -> str:
+    """トリガー内でFTS5に挿入する値リストを作成"""
+    values = []
+    for column_name in FULL_TEXT_INDEX_COLUMNS:
+        if column_name == "keywords":
+            # JSON配列はユニコードエスケープされているため、展開してから索引化する
+            values.append(f"(SELECT group_concat(value, ', ') FROM json_each({row_alias}.keywords))")
+        else:
+            values.append(f"{row_alias}.{column_name}")
+    return ", ".join(values)
+
+
+def _create_full_text_index_statements() -> list:
+    """FTS5仮想テーブルと同期トリガーのDDLを作成"""
+    column_list = ", ".join(FULL_TEXT_INDEX_COLUMNS)
+    new_values  = _build_index_values("new")
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+            {column_list},
+            tokenize = 'trigram'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS papers_fts_after_insert AFTER INSERT ON papers BEGIN
+            INSERT INTO papers_fts(rowid, {column_list}) VALUES (new.paper_id, {new_values});
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS papers_fts_after_delete AFTER DELETE ON papers BEGIN
+            DELETE FROM papers_fts WHERE rowid = old.paper_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS papers_fts_after_update AFTER UPDATE ON papers BEGIN
+            DELETE FROM papers_fts WHERE rowid = old.paper_id;
+            INSERT INTO papers_fts(rowid, {column_list}) VALUES (new.paper_id, {new_values});
+        END
+        """,
+    ]
+
+
+def create_full_text_index(connection: Connection) -> None:
+    """全文検索インデックスを作成し、既存の論文データをバックフィル (作成済みの場合は何もしない)"""
+    if connection.dialect.name != "sqlite":
+        return
+
+    column_list  = ", ".join(FULL_TEXT_INDEX_COLUMNS)
+    paper_values = _build_index_values("papers")
+
+    index_exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'papers_fts'")
+    ).first() is not None
+
+    for statement in _create_full_text_index_statements():
+        connection.execute(text(statement))
+
+    # 既存のpapers.dbは索引が空のため、初回作成時に全件を投入する
+    if not index_exists:
+        connection.execute(text(
+            f"INSERT INTO papers_fts(rowid, {column_list}) "
+            f"SELECT papers.paper_id, {paper_values} FROM papers"
+        ))
+
+
+def _create_chunk_full_text_index_statements() -> list:
+    """論文本文チャンクのFTS5仮想テーブル (外部コンテンツ) と同期トリガーのDDLを作成"""
+    return [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS paper_chunks_fts USING fts5(
+            content,
+            content = 'paper_chunks',
+            content_rowid = 'chunk_id',
+            tokenize = 'trigram'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS paper_chunks_fts_after_insert AFTER INSERT ON paper_chunks BEGIN
+            INSERT INTO paper_chunks_fts(rowid, content) VALUES (new.chunk_id, new.content);
+        END
+        """,
+        # 外部コンテンツのFTS5は削除する行の値を'delete'コマンドで渡す
+        """
+        CREATE TRIGGER IF NOT EXISTS paper_chunks_fts_after_delete AFTER DELETE ON paper_chunks BEGIN
+            INSERT INTO paper_chunks_fts(paper_chunks_fts, rowid, content) VALUES ('delete', old.chunk_id, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS paper_chunks_fts_after_update AFTER UPDATE ON paper_chunks BEGIN
+            INSERT INTO paper_chunks_fts(paper_chunks_fts, rowid, content) VALUES ('delete', old.chunk_id, old.content);
+            INSERT INTO paper_chunks_fts(rowid, content) VALUES (new.chunk_id, new.content);
+        END
+        """,
+    ]
+
+
+def create_chunk_full_text_index(connection: Connection) -> None:
+    """論文本文チャンクの全文検索インデックスを作成し、既存のチャンクを索引化 (作成済みの場合は何もしない)"""
+    if connection.dialect.name != "sqlite":
+        return
+
+    index_exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'paper_chunks_fts'")
+    ).first() is not None
+
+    for statement in _create_chunk_full_text_index_statements():
+        connection.execute(text(statement))
+
+    if not index_exists:
+        connection.execute(text("INSERT INTO paper_chunks_fts(paper_chunks_fts) VALUES ('rebuild')"))
+
+
+def quote_full_text_term(term: str) -> str:
+    """FTS5のフレーズとして検索語をクォート"""
+    return '"' + term.replace('"', '""') + '"'
@@ -0,0 +1,53 @@
+import re
+import unicodedata
+from typing import Iterable, List
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Connection
+from models.database_models import Paper, PaperKeyword
+
+# paper_keywords.keyword_normalisedの最大長
+MAX_KEYWORD_LENGTH = 255
+
+
+def normalize_keyword(keyword: str) -> str:
+    """表記揺れ (全角・半角、大文字・小文字、空白) を吸収するためにキーワードを正規化"""
+    normalized_keyword = unicodedata.normalize("NFKC", keyword).lower()
+    normalized_keyword = re.sub(r"\s+", " ", normalized_keyword).strip()
+    return normalized_keyword[:MAX_KEYWORD_LENGTH]
+
+
+def normalize_keywords(keywords: Iterable) -> List[str]:
+    """キーワードのリストを正規化し、空・重複を除いて順序を保ったまま返す"""
+    normalized_keywords = []
+    for keyword in keywords or []:
+        if not isinstance(keyword, str):
+            continue
+        normalized_keyword = normalize_keyword(keyword)
+        if normalized_keyword and normalized_keyword not in normalized_keywords:
+            normalized_keywords.append(normalized_keyword)
+    return normalized_keywords
+
+
+def build_paper_keywords(keywords: Iterable) -> List[PaperKeyword]:
+    """Paper.keywordsからキーワード索引の行を作成"""
+    return [
+        PaperKeyword(keyword_normalised=normalized_keyword)
+        for normalized_keyword in normalize_keywords(keywords)
+    ]
+
+
+def backfill_keyword_index(connection: Connection) -> None:
+    """キーワード索引が未作成の論文 (既存データ) をバックフィル"""
+    unindexed_papers = connection.execute(
+        select(Paper.paper_id, Paper.keywords).where(
+            Paper.paper_id.not_in(select(PaperKeyword.paper_id))
+        )
+    ).all()
+
+    keyword_rows = [
+        {"paper_id": paper_id, "keyword_normalised": normalized_keyword}
+        for paper_id, keywords in unindexed_papers
+        for normalized_keyword in normalize_keywords(keywords)
+    ]
+    if keyword_rows:
+        connection.execute(insert(PaperKeyword), keyword_rows)
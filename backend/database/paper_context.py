@@ -0,0 +1,147 @@
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Connection
+from models.database_models import Paper
+
+load_dotenv()
+
+# 質問回答のコンテキストに含める項目 (ラベル, Paperの属性名)。この順序でコンテキストを組み立てる
+PAPER_CONTEXT_SECTIONS = [
+    ("タイトル",       "title"),
+    ("著者",           "authors"),
+    ("アブストラクト", "abstract"),
+    ("研究背景・目的", "summary_introduction"),
+    ("研究手法",       "summary_methods"),
+    ("結果",           "summary_results"),
+    ("考察",           "summary_discussion"),
+    ("結論",           "summary_conclusion"),
+    ("キーワード",     "keywords"),
+]
+
+# トークン予算を超える場合に優先して残す項目 (先頭ほど優先度が高い)
+PAPER_CONTEXT_PRIORITY = [
+    "title", "keywords", "abstract", "summary_conclusion", "summary_results",
+    "summary_methods", "summary_introduction", "summary_discussion", "authors",
+]
+
+# 1文字で約1トークンになる文字 (ひらがな・カタカナ・漢字・全角記号)
+WIDE_CHARACTER_PATTERN = re.compile(r"[　-ヿ㐀-䶿一-鿿＀-￯]")
+
+# 英数字などは約4文字で1トークンとして見積もる
+NARROW_CHARACTERS_PER_TOKEN = 4
+
+# 予算に合わせて切り詰めた項目の末尾に付ける記号
+TRUNCATION_MARKER = "…"
+
+# バックフィルで1回のUPDATEにまとめる論文数
+BACKFILL_BATCH_SIZE = 500
+
+
+@dataclass
+class PaperContext:
+    """質問回答用に事前計算した論文コンテキスト"""
+    text                : str
+    token_count         : int
+    trimmed_token_count : int
+
+
+def estimate_token_count(text: str) -> int:
+    """Gemini APIを呼ばずに入力トークン数を概算"""
+    wide_character_count = len(WIDE_CHARACTER_PATTERN.findall(text))
+    narrow_character_count = len(text) - wide_character_count
+    return wide_character_count + math.ceil(narrow_character_count / NARROW_CHARACTERS_PER_TOKEN)
+
+
+def truncate_to_token_budget(text: str, token_budget: int) -> str:
+    """概算トークン数がtoken_budget以内に収まるよう末尾を切り詰める (予算がない場合は空文字列)"""
+    if estimate_token_count(text) <= token_budget:
+        return text
+    if token_budget <= estimate_token_count(TRUNCATION_MARKER):
+        return ""
+
+    narrow_token_budget = (token_budget - estimate_token_count(TRUNCATION_MARKER)) * NARROW_CHARACTERS_PER_TOKEN
+    used_budget = 0
+    for character_index, character in enumerate(text):
+        used_budget += NARROW_CHARACTERS_PER_TOKEN if WIDE_CHARACTER_PATTERN.match(character) else 1
+        if used_budget > narrow_token_budget:
+            return text[:character_index].rstrip() + TRUNCATION_MARKER
+    return text
+
+
+def build_paper_context(paper: Any, token_budget: Optional[int] = None) -> PaperContext:
+    """要約項目から質問回答用のコンテキストを作成し、優先度の低い項目からトークン予算に収める"""
+    token_budget = token_budget or int(os.getenv("QA_CONTEXT_TOKEN_BUDGET", "3000"))
+
+    section_values = {}
+    for label, attribute_name in PAPER_CONTEXT_SECTIONS:
+        value = getattr(paper, attribute_name, None)
+        if attribute_name == "keywords":
+            value = ", ".join(value) if value else None
+        section_values[attribute_name] = f"{label}: {value or '不明'}"
+
+    # 項目間の区切り ("\n\n") も予算に含める
+    remaining_budget = token_budget - estimate_token_count("\n\n") * (len(PAPER_CONTEXT_SECTIONS) - 1)
+    full_token_count = sum(estimate_token_count(section_text) for section_text in section_values.values())
+    for attribute_name in PAPER_CONTEXT_PRIORITY:
+        section_text = truncate_to_token_budget(section_values[attribute_name], max(remaining_budget, 0))
+        section_values[attribute_name] = section_text
+        remaining_budget -= estimate_token_count(section_text)
+
+    context_text = "\n\n".join(
+        section_values[attribute_name]
+        for _, attribute_name in PAPER_CONTEXT_SECTIONS
+        if section_values[attribute_name]
+    )
+    token_count = estimate_token_count(context_text)
+    return PaperContext(
+        text                = context_text,
+        token_count         = token_count,
+        trimmed_token_count = max(full_token_count - sum(
+            estimate_token_count(section_text) for section_text in section_values.values()
+        ), 0)
+    )
+
+
+def apply_paper_context(paper: Paper) -> None:
+    """論文レコードに質問回答用のコンテキストを設定 (要約の保存・更新時に呼ぶ)"""
+    paper_context = build_paper_context(paper)
+    paper.qa_context                     = paper_context.text
+    paper.qa_context_token_count         = paper_context.token_count
+    paper.qa_context_trimmed_token_count = paper_context.trimmed_token_count
+
+
+def backfill_paper_contexts(connection: Connection) -> None:
+    """質問回答用のコンテキストが未作成の論文 (既存データ) をバックフィル"""
+    papers_table = Paper.__table__
+    uncontextualized_papers = connection.execute(
+        select(*[papers_table.c[attribute_name] for _, attribute_name in PAPER_CONTEXT_SECTIONS], papers_table.c.paper_id)
+        .where(papers_table.c.qa_context.is_(None))
+    ).all()
+
+    # updated_atを変えると回答キャッシュ・QA履歴の再利用が無効になるため、元の値のまま更新する
+    update_statement = (
+        update(papers_table)
+        .where(papers_table.c.paper_id == bindparam("target_paper_id"))
+        .values(
+            qa_context                     = bindparam("context_text"),
+            qa_context_token_count         = bindparam("context_token_count"),
+            qa_context_trimmed_token_count = bindparam("context_trimmed_token_count"),
+            updated_at                     = papers_table.c.updated_at
+        )
+    )
+    for batch_start in range(0, len(uncontextualized_papers), BACKFILL_BATCH_SIZE):
+        context_rows = []
+        for paper_row in uncontextualized_papers[batch_start:batch_start + BACKFILL_BATCH_SIZE]:
+            paper_context = build_paper_context(paper_row)
+            context_rows.append({
+                "target_paper_id"             : paper_row.paper_id,
+                "context_text"                : paper_context.text,
+                "context_token_count"         : paper_context.token_count,
+                "context_trimmed_token_count" : paper_context.trimmed_token_count,
+            })
+        connection.execute(update_statement, context_rows)
@@ -0,0 +1,16 @@
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.engine import Engine
+
+# backend/alembic.ini
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def run_database_migrations(engine: Engine, revision: str = "head") -> None:
+    """Alembicのマイグレーションを適用 (APIサーバー・CLI共通)"""
+    alembic_config = Config(ALEMBIC_INI_PATH)
+    with engine.begin() as connection:
+        # migrations/env.pyはこの接続を使ってマイグレーションを実行する
+        alembic_config.attributes["connection"] = connection
+        command.upgrade(alembic_config, revision)
@@ -0,0 +1,79 @@
+import os
+import re
+from typing import Any, Dict
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+# SQLITE_PROFILEで選択するPRAGMAの組み合わせ
+SQLITE_PROFILES = {
+    # SQLiteの既定値 (ロールバックジャーナル) のまま。比較・トラブルシュート用
+    "default": {},
+    # 読み取りと書き込みを並行させるための設定
+    "performance": {
+        "auto_vacuum"  : "INCREMENTAL",  # 新規作成時のみ有効 (既存DBはscripts.run_retentionで変換する)
+        "journal_mode" : "WAL",          # 読み取りが書き込みをブロックしない
+        "synchronous"  : "NORMAL",       # WALではコミットごとのfsyncを省略しても破損しない
+        "mmap_size"    : 268435456,      # 256MiBまでメモリマップで読む
+        "cache_size"   : -65536,         # 接続ごとに64MiBのページキャッシュ (負の値はKiB指定)
+        "busy_timeout" : 5000,           # ロック中は即エラーにせず5秒まで待つ
+        "temp_store"   : "MEMORY",
+    },
+}
+
+# 環境変数 (SQLITE_<PRAGMA名>) で個別に上書きできるPRAGMA
+SQLITE_PRAGMA_NAMES = ["auto_vacuum", "journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout", "temp_store"]
+
+# PRAGMA文に埋め込む値として許可する文字
+PRAGMA_VALUE_PATTERN = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+
+def get_sqlite_pragmas() -> Dict[str, Any]:
+    """環境変数SQLITE_PROFILE・SQLITE_<PRAGMA名>から接続時に設定するPRAGMAを作成"""
+    profile_name = os.getenv("SQLITE_PROFILE", "performance")
+    if profile_name not in SQLITE_PROFILES:
+        raise Exception(f"不明なSQLITE_PROFILEです: {profile_name}")
+
+    sqlite_pragmas = dict(SQLITE_PROFILES[profile_name])
+    for pragma_name in SQLITE_PRAGMA_NAMES:
+        pragma_value = os.getenv(f"SQLITE_{pragma_name.upper()}")
+        if pragma_value:
+            sqlite_pragmas[pragma_name] = pragma_value
+
+    for pragma_name, pragma_value in sqlite_pragmas.items():
+        if not PRAGMA_VALUE_PATTERN.match(str(pragma_value)):
+            raise Exception(f"PRAGMA {pragma_name} の値が不正です: {pragma_value}")
+    return sqlite_pragmas
+
+
+def install_sqlite_pragmas(engine: Engine, sqlite_pragmas: Dict[str, Any], read_only: bool = False) -> None:
+    """接続ごとにPRAGMAを設定するイベントを登録 (非同期エンジンはsync_engineを渡す)"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma_name, pragma_value in sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {pragma_name} = {pragma_value}")
+            # 読み取り専用エンジンの接続では書き込みを禁止する
+            if read_only:
+                cursor.execute("PRAGMA query_only = ON")
+        finally:
+            cursor.close()
+
+
+def build_pool_arguments(database_url: str) -> Dict[str, Any]:
+    """create_engineに渡すコネクションプールの設定を作成"""
+    # インメモリDBは接続ごとに別のDBになるため、プールの既定値 (単一接続) に任せる
+    if database_url.startswith("sqlite") and (":memory:" in database_url or database_url.endswith("://")):
+        return {}
+
+    return {
+        "pool_size"    : int(os.getenv("DATABASE_POOL_SIZE", "8")),
+        "max_overflow" : int(os.getenv("DATABASE_MAX_OVERFLOW", "16")),
+        "pool_timeout" : float(os.getenv("DATABASE_POOL_TIMEOUT_SECONDS", "30")),
+    }
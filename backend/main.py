@@ -1,34 +1,114 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import os
 from dotenv import load_dotenv
 
-from database.connection import get_database_session, engine
-from models.database_models import Base
+from database.connection import (
+    AsyncSessionLocal,
+    async_engine,
+    engine,
+    get_database_session,
+    get_read_only_database_session,
+    read_only_async_engine
+)
+from database.schema import run_database_migrations
 from services.pdf_processor import PDFProcessor
 from services.gemini_service import GeminiService
 from services.search_service import SearchService
+from services.embedding_backends import create_embedding_backend
+from services.paper_embedding_indexer import PaperEmbeddingIndexer
+from services.search_log_writer import SearchLogWriter
+from services.retention_service import RetentionService
+from services.ingestion_queue import IngestionQueue
+from services.upload_spooler import UploadTooLargeError
+from services.question_answer_service import QuestionAnswerService
+from services.resummarization_service import ResummarizationService
+from services.server_sent_events import format_server_sent_event, iterate_until_disconnected
+from services.metrics import RequestMetricsMiddleware, install_query_metrics, register_cache_stats, render_metrics
 from models.database_models import Paper, SearchHistory, QAHistory
 from models.api_models import (
     PaperSummaryResponse,
+    PaperListItem,
+    PaperListResponse,
     SearchRequest,
     SearchResponse,
+    KeywordFacetResponse,
     QuestionRequest,
-    QuestionResponse
+    QuestionResponse,
+    BatchQuestionRequest,
+    BatchQuestionItem,
+    BatchQuestionResponse,
+    IngestionJobResponse,
+    BatchUploadResponse,
+    BatchUploadRejectedItem,
+    CacheStatsResponse,
+    ResummarizationStatusResponse
 )
 
 load_dotenv()
 
-# データベース初期化
-Base.metadata.create_all(bind=engine)
+# データベースのマイグレーション
+run_database_migrations(engine)
+
+# 一括質問で一度に指定できる論文数・質問数
+BATCH_QUESTION_MAX_PAPERS = int(os.getenv("BATCH_QUESTION_MAX_PAPERS", "20"))
+BATCH_QUESTION_MAX_QUESTIONS = int(os.getenv("BATCH_QUESTION_MAX_QUESTIONS", "10"))
+
+# サービスインスタンス
+pdf_processor = PDFProcessor()
+gemini_service = GeminiService()
+paper_embedding_indexer = PaperEmbeddingIndexer(create_embedding_backend(gemini_service))
+search_log_writer = SearchLogWriter()
+search_service = SearchService(paper_embedding_indexer, search_log_writer)
+ingestion_queue = IngestionQueue(gemini_service, pdf_processor, paper_embedding_indexer=paper_embedding_indexer)
+question_answer_service = QuestionAnswerService(gemini_service)
+retention_service = RetentionService()
+resummarization_service = ResummarizationService(
+    gemini_service,
+    pdf_processor,
+    paper_embedding_indexer=paper_embedding_indexer,
+    answer_cache=question_answer_service.answer_cache
+)
+
+# メトリクス (SQLクエリの件数・所要時間、キャッシュの統計情報)
+install_query_metrics(async_engine.sync_engine, "write")
+install_query_metrics(read_only_async_engine.sync_engine, "read_only")
+register_cache_stats({
+    "answer"  : question_answer_service.answer_cache,
+    "context" : gemini_service.context_cache,
+    "search"  : search_service.search_cache,
+})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """取り込みワーカー・ベクトルインデックス・検索履歴の書き込み・履歴削除・再要約の起動・停止"""
+    await paper_embedding_indexer.start()
+    await search_log_writer.start()
+    await ingestion_queue.start()
+    if os.getenv("RETENTION_ENABLED", "true").lower() == "true":
+        await retention_service.start()
+    # 再要約は処理済みの論文を保存しながら進むため、起動時に開始すると中断された実行の残りから再開する
+    if os.getenv("RESUMMARIZE_ON_STARTUP", "false").lower() == "true":
+        await resummarization_service.start()
+    yield
+    await resummarization_service.stop()
+    await retention_service.stop()
+    await ingestion_queue.stop()
+    await search_log_writer.stop()
+    await paper_embedding_indexer.stop()
+
 
 app = FastAPI(
     title="論文要約・検索API",
     description="Gemini APIを使用した論文要約・検索システム",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS設定
@@ -40,10 +120,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# サービスインスタンス
-pdf_processor = PDFProcessor()
-gemini_service = GeminiService()
-search_service = SearchService()
+# リクエスト数・所要時間の記録と遅いリクエストのログ (最後に追加したミドルウェアが最も外側で実行される)
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.get("/")
@@ -56,136 +134,321 @@ async def health_check():
     return {"status": "healthy"}
 
 
-@app.post("/upload-paper", response_model=PaperSummaryResponse)
+@app.post("/upload-paper", response_model=IngestionJobResponse, status_code=202)
 async def upload_and_summarize_paper(
     file: UploadFile = File(...),
-    db: Session = Depends(get_database_session)
+    db: AsyncSession = Depends(get_database_session)
 ):
-    """PDFファイルをアップロードして要約を生成"""
+    """PDFファイルをアップロードして要約ジョブを登録"""
+    # ファイル検証
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="PDFファイルのみ対応しています")
+
     try:
-        # ファイル検証
-        if not file.filename.endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="PDFファイルのみ対応しています")
-        
-        # Gemini APIで要約生成
-        summary_data = await gemini_service.generate_paper_summary(file)
-        
-        # データベースに保存
-        paper = await pdf_processor.save_paper_to_database(
-            file, summary_data, db
-        )
-        
-        return PaperSummaryResponse(
-            paper_id=paper.paper_id,
-            title=paper.title,
-            authors=paper.authors,
-            abstract=paper.abstract,
-            summary_introduction=paper.summary_introduction,
-            summary_methods=paper.summary_methods,
-            summary_results=paper.summary_results,
-            summary_discussion=paper.summary_discussion,
-            summary_conclusion=paper.summary_conclusion,
-            keywords=paper.keywords
-        )
-        
+        # 要約はワーカーで実行し、ジョブIDを即座に返す
+        job = await ingestion_queue.enqueue_upload(file, db)
+        return IngestionJobResponse.model_validate(job)
+
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"ファイル処理エラー: {str(e)}")
 
 
+@app.post("/upload-papers", response_model=BatchUploadResponse, status_code=202)
+async def upload_papers_in_batch(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_database_session)
+):
+    """複数のPDFファイルをまとめてアップロードして要約ジョブを登録
+
+    論文の保存はファイルごとのジョブで行う (要約の完了時刻がファイルごとに異なり、論文とジョブの完了を
+    1トランザクションで保存するため)。まとめて保存する一括取り込みはscripts.backfill_papersを使う。
+    """
+    jobs = []
+    rejected = []
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            rejected.append(BatchUploadRejectedItem(filename=file.filename, detail="PDFファイルのみ対応しています"))
+            continue
+
+        try:
+            # 取り込み済み・処理中のファイルは既存のジョブに集約される
+            job = await ingestion_queue.enqueue_upload(file, db)
+            jobs.append(IngestionJobResponse.model_validate(job))
+        except Exception as e:
+            await db.rollback()
+            rejected.append(BatchUploadRejectedItem(filename=file.filename, detail=f"ファイル処理エラー: {str(e)}"))
+
+    return BatchUploadResponse(jobs=jobs, rejected=rejected)
+
+
+@app.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_read_only_database_session)
+):
+    """論文取り込みジョブの状態を取得"""
+    job = await ingestion_queue.get_job(job_id, db)
+    if not job:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+
+    job_response = IngestionJobResponse.model_validate(job)
+    if job.paper_id is not None:
+        paper = await db.get(Paper, job.paper_id)
+        if paper:
+            job_response.result = PaperSummaryResponse.model_validate(paper)
+
+    return job_response
+
+
 @app.post("/search-papers", response_model=SearchResponse)
 async def search_papers(
     request: SearchRequest,
-    db: Session = Depends(get_database_session)
+    db: AsyncSession = Depends(get_read_only_database_session)
 ):
-    """論文検索"""
+    """論文検索
+
+    タイトル・著者・全文検索の2文字以下の検索語はtrigramの全文検索インデックスで検索できないため、
+    索引を使わない部分一致 (論文数に比例した走査) で絞り込む。
+    """
     try:
+        timings = {}
+        keyword_counts = {}
         results = await search_service.search_papers(
             query=request.query,
             search_type=request.search_type,
             limit=request.limit,
-            db=db
+            db=db,
+            timings=timings,
+            keyword_match=request.keyword_match,
+            keyword_counts=keyword_counts
         )
         
         return SearchResponse(
             query=request.query,
             results=results,
-            total_count=len(results)
+            total_count=len(results),
+            timings=timings,
+            keyword_counts=keyword_counts
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"検索エラー: {str(e)}")
 
 
+@app.get("/keywords/facets", response_model=KeywordFacetResponse)
+async def get_keyword_facets(
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_only_database_session)
+):
+    """論文数の多いキーワードを取得"""
+    try:
+        facets = await search_service.get_keyword_facets(limit, db)
+        return KeywordFacetResponse(facets=facets)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"キーワード集計エラー: {str(e)}")
+
+
 @app.post("/ask-question", response_model=QuestionResponse)
 async def ask_question_about_paper(
     request: QuestionRequest,
-    db: Session = Depends(get_database_session)
+    db: AsyncSession = Depends(get_database_session)
 ):
     """PDFに対する質問"""
     try:
         # 論文データを取得
-        paper = db.query(Paper).filter(Paper.paper_id == request.paper_id).first()
+        paper = await db.get(Paper, request.paper_id)
         if not paper:
             raise HTTPException(status_code=404, detail="論文が見つかりません")
         
-        # Gemini APIで質問に回答
-        answer = await gemini_service.answer_question_about_paper(
-            paper, request.question
+        # キャッシュ・QA履歴になければGemini APIで質問に回答し、QA履歴に保存
+        token_usage = {}
+        answer = await question_answer_service.answer_question(
+            paper, request.question, request.user_session, db, token_usage
         )
         
-        # QA履歴を保存
-        qa_record = QAHistory(
-            paper_id=request.paper_id,
-            question=request.question,
-            answer=answer,
-            user_session=request.user_session
-        )
-        db.add(qa_record)
-        db.commit()
-        
         return QuestionResponse(
             question=request.question,
             answer=answer,
-            paper_id=request.paper_id
+            paper_id=request.paper_id,
+            token_usage=token_usage
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"質問処理エラー: {str(e)}")
 
 
-@app.get("/papers", response_model=List[PaperSummaryResponse])
-async def get_all_papers(
-    limit: Optional[int] = 20,
-    offset: Optional[int] = 0,
-    db: Session = Depends(get_database_session)
+@app.post("/ask-question/stream")
+async def ask_question_about_paper_stream(
+    request: QuestionRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_read_only_database_session)
 ):
-    """すべての論文を取得"""
-    papers = db.query(Paper).offset(offset).limit(limit).all()
-    
-    return [
-        PaperSummaryResponse(
-            paper_id=paper.paper_id,
-            title=paper.title,
-            authors=paper.authors,
-            abstract=paper.abstract,
-            summary_introduction=paper.summary_introduction,
-            summary_methods=paper.summary_methods,
-            summary_results=paper.summary_results,
-            summary_discussion=paper.summary_discussion,
-            summary_conclusion=paper.summary_conclusion,
-            keywords=paper.keywords
+    """PDFに対する質問 (回答をServer-Sent Eventsで生成された順に送信)"""
+    paper = await db.get(Paper, request.paper_id)
+    if not paper:
+        raise HTTPException(status_code=404, detail="論文が見つかりません")
+
+    async def generate_events():
+        # レスポンスの送信中も使えるよう、QA履歴の保存にはストリーム内で開いたセッションを使う
+        token_usage = {}
+        answer_chunks = []
+        try:
+            async with AsyncSessionLocal() as qa_db:
+                answer_stream = question_answer_service.stream_answer(
+                    paper, request.question, request.user_session, qa_db, token_usage
+                )
+                # 切断された場合はGemini APIの生成をキャンセルし、QA履歴は保存しない
+                async for answer_chunk in iterate_until_disconnected(http_request, answer_stream):
+                    answer_chunks.append(answer_chunk)
+                    yield format_server_sent_event("chunk", {"text": answer_chunk})
+
+            if await http_request.is_disconnected():
+                return
+            yield format_server_sent_event("done", QuestionResponse(
+                question=request.question,
+                answer="".join(answer_chunks).strip(),
+                paper_id=request.paper_id,
+                token_usage=token_usage
+            ).model_dump())
+
+        except Exception as e:
+            yield format_server_sent_event("error", {"detail": f"質問処理エラー: {str(e)}"})
+
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        # プロキシにバッファリングさせず、チャンクをそのまま届ける
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/ask-questions", response_model=BatchQuestionResponse)
+async def ask_questions_in_batch(
+    request: BatchQuestionRequest,
+    db: AsyncSession = Depends(get_database_session)
+):
+    """複数の論文への複数の質問にまとめて回答 (論文ごとに質問をまとめ、論文間は並行に処理)"""
+    # 重複を除き、指定された順序を保つ
+    paper_ids = list(dict.fromkeys(request.paper_ids))
+    questions = list(dict.fromkeys(question for question in request.questions if question.strip()))
+    if not paper_ids or not questions:
+        raise HTTPException(status_code=400, detail="論文IDと質問を1件以上指定してください")
+    if len(paper_ids) > BATCH_QUESTION_MAX_PAPERS or len(questions) > BATCH_QUESTION_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に指定できるのは論文{BATCH_QUESTION_MAX_PAPERS}件・質問{BATCH_QUESTION_MAX_QUESTIONS}件までです"
         )
-        for paper in papers
-    ]
+
+    try:
+        # 論文は1回のクエリでまとめて取得する
+        papers = (await db.scalars(select(Paper).where(Paper.paper_id.in_(paper_ids)))).all()
+        papers_by_id = {paper.paper_id: paper for paper in papers}
+
+        token_usage = {}
+        answer_items = await question_answer_service.answer_questions_in_batch(
+            [papers_by_id[paper_id] for paper_id in paper_ids if paper_id in papers_by_id],
+            questions,
+            request.user_session,
+            db,
+            token_usage
+        )
+        answers_by_key = {(answer_item["paper_id"], answer_item["question"]): answer_item for answer_item in answer_items}
+
+        return BatchQuestionResponse(
+            answers=[
+                BatchQuestionItem(**answers_by_key[(paper_id, question)])
+                if paper_id in papers_by_id
+                else BatchQuestionItem(paper_id=paper_id, question=question, detail="論文が見つかりません")
+                for paper_id in paper_ids
+                for question in questions
+            ],
+            token_usage=token_usage
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"一括質問処理エラー: {str(e)}")
+
+
+@app.post("/resummarize", response_model=ResummarizationStatusResponse, status_code=202)
+async def start_resummarization(
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_only_database_session)
+):
+    """現在の要約プロンプト・モデル以外で要約された論文の再要約をバックグラウンドで開始 (実行中の場合は状況のみ返す)"""
+    try:
+        await resummarization_service.start(limit)
+        return ResummarizationStatusResponse(**await resummarization_service.get_status(db))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"再要約開始エラー: {str(e)}")
+
+
+@app.get("/resummarize", response_model=ResummarizationStatusResponse)
+async def get_resummarization_status(
+    db: AsyncSession = Depends(get_read_only_database_session)
+):
+    """再要約の実行状況と再要約が必要な論文数を取得"""
+    return ResummarizationStatusResponse(**await resummarization_service.get_status(db))
+
+
+@app.get("/cache-stats", response_model=CacheStatsResponse)
+async def get_cache_stats():
+    """キャッシュのヒット率などの統計情報を取得"""
+    return CacheStatsResponse(
+        answer_cache=question_answer_service.answer_cache.get_stats(),
+        context_cache=gemini_service.context_cache.get_stats(),
+        search_cache=search_service.search_cache.get_stats()
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus形式のメトリクスを取得"""
+    metrics_body, content_type = render_metrics()
+    return Response(content=metrics_body, media_type=content_type)
+
+
+@app.get("/papers", response_model=PaperListResponse)
+async def get_all_papers(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_only_database_session)
+):
+    """論文一覧を新しい順に取得 (paper_idによるキーセットページネーション)"""
+    # 一覧表示に必要なカラムのみを取得する
+    paper_query = select(
+        Paper.paper_id,
+        Paper.title,
+        Paper.authors,
+        Paper.keywords,
+        Paper.upload_date
+    ).order_by(Paper.paper_id.desc()).limit(limit + 1)
+    if cursor is not None:
+        paper_query = paper_query.where(Paper.paper_id < cursor)
+
+    result = await db.execute(paper_query)
+    rows = result.all()
+
+    # limit + 1件目があれば次ページが存在する
+    has_next_page = len(rows) > limit
+    items = [PaperListItem.model_validate(row) for row in rows[:limit]]
+
+    return PaperListResponse(
+        items=items,
+        next_cursor=items[-1].paper_id if has_next_page else None
+    )
 
 
 @app.get("/papers/{paper_id}", response_model=PaperSummaryResponse)
 async def get_paper_by_id(
     paper_id: int,
-    db: Session = Depends(get_database_session)
+    db: AsyncSession = Depends(get_read_only_database_session)
 ):
     """特定の論文を取得"""
-    paper = db.query(Paper).filter(Paper.paper_id == paper_id).first()
+    paper = await db.get(Paper, paper_id)
     
     if not paper:
         raise HTTPException(status_code=404, detail="論文が見つかりません")
@@ -0,0 +1,63 @@
+from logging.config import fileConfig
+from alembic import context
+from database.connection import engine
+from models.database_models import Base
+
+alembic_config = context.config
+
+# アプリケーションから実行する場合はロガー設定を上書きしない
+if alembic_config.config_file_name is not None and "connection" not in alembic_config.attributes:
+    fileConfig(alembic_config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(database_object, name, type_, reflected, compare_to) -> bool:
+    """autogenerateの比較対象から全文検索インデックス (FTS5の仮想テーブル・内部テーブル) を除外"""
+    return not (type_ == "table" and name.startswith(("papers_fts", "paper_chunks_fts")))
+
+
+def run_migrations_offline() -> None:
+    """SQLを出力するのみのマイグレーション (alembic upgrade --sql)"""
+    context.configure(
+        url             = engine.url.render_as_string(hide_password=False),
+        target_metadata = target_metadata,
+        include_object  = include_object,
+        literal_binds   = True,
+        render_as_batch = engine.dialect.name == "sqlite",
+        dialect_opts    = {"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """データベースに接続してマイグレーションを実行"""
+    connection = alembic_config.attributes.get("connection")
+    if connection is not None:
+        # run_database_migrations() から渡された接続を使う
+        _run_migrations(connection)
+        return
+
+    with engine.connect() as connection:
+        _run_migrations(connection)
+        connection.commit()
+
+
+def _run_migrations(connection) -> None:
+    """接続を指定してマイグレーションを実行"""
+    context.configure(
+        connection      = connection,
+        target_metadata = target_metadata,
+        include_object  = include_object,
+        # SQLiteはALTER TABLEの機能が限られるため、テーブル再作成で変更する
+        render_as_batch = connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,142 @@
+"""ベースラインスキーマ (論文・検索履歴・質問履歴・取り込みジョブ・キーワード索引・全文検索インデックス)
+
+create_allで作成された既存のデータベースにも適用できるよう、
+存在しないテーブルのみを作成し、全文検索インデックス・キーワード索引はバックフィルする。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from database.full_text_index import create_full_text_index
+from database.keyword_index import backfill_keyword_index
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "papers" not in existing_tables:
+        op.create_table(
+            "papers",
+            sa.Column("paper_id",             sa.Integer(),     nullable=False),
+            sa.Column("original_filename",    sa.String(255),   nullable=False),
+            sa.Column("title",                sa.Text(),        nullable=False),
+            sa.Column("authors",              sa.Text()),
+            sa.Column("abstract",             sa.Text()),
+            sa.Column("summary_introduction", sa.Text()),
+            sa.Column("summary_methods",      sa.Text()),
+            sa.Column("summary_results",      sa.Text()),
+            sa.Column("summary_discussion",   sa.Text()),
+            sa.Column("summary_conclusion",   sa.Text()),
+            sa.Column("keywords",             sa.JSON()),
+            sa.Column("upload_date",          sa.DateTime()),
+            sa.Column("file_size",            sa.BIGINT()),
+            sa.Column("file_hash",            sa.String(64),    nullable=False),
+            sa.Column("created_at",           sa.DateTime()),
+            sa.Column("updated_at",           sa.DateTime()),
+            sa.PrimaryKeyConstraint("paper_id"),
+            sa.UniqueConstraint("file_hash"),
+        )
+        op.create_index("ix_papers_paper_id", "papers", ["paper_id"])
+
+    if "search_history" not in existing_tables:
+        op.create_table(
+            "search_history",
+            sa.Column("search_id",    sa.Integer(),   nullable=False),
+            sa.Column("search_query", sa.Text(),      nullable=False),
+            sa.Column("search_type",  sa.String(50),  nullable=False),
+            sa.Column("result_count", sa.Integer()),
+            sa.Column("search_date",  sa.DateTime()),
+            sa.Column("user_session", sa.String(255)),
+            sa.Column("created_at",   sa.DateTime()),
+            sa.PrimaryKeyConstraint("search_id"),
+        )
+        op.create_index("ix_search_history_search_id", "search_history", ["search_id"])
+
+    if "search_results" not in existing_tables:
+        op.create_table(
+            "search_results",
+            sa.Column("result_id",       sa.Integer(), nullable=False),
+            sa.Column("search_id",       sa.Integer(), nullable=False),
+            sa.Column("paper_id",        sa.Integer(), nullable=False),
+            sa.Column("relevance_score", sa.Float()),
+            sa.Column("created_at",      sa.DateTime()),
+            sa.PrimaryKeyConstraint("result_id"),
+            sa.ForeignKeyConstraint(["search_id"], ["search_history.search_id"], ondelete="CASCADE"),
+            sa.ForeignKeyConstraint(["paper_id"], ["papers.paper_id"], ondelete="CASCADE"),
+        )
+        op.create_index("ix_search_results_result_id", "search_results", ["result_id"])
+
+    if "qa_history" not in existing_tables:
+        op.create_table(
+            "qa_history",
+            sa.Column("qa_id",         sa.Integer(),   nullable=False),
+            sa.Column("paper_id",      sa.Integer(),   nullable=False),
+            sa.Column("question",      sa.Text(),      nullable=False),
+            sa.Column("answer",        sa.Text(),      nullable=False),
+            sa.Column("question_date", sa.DateTime()),
+            sa.Column("user_session",  sa.String(255)),
+            sa.Column("created_at",    sa.DateTime()),
+            sa.PrimaryKeyConstraint("qa_id"),
+            sa.ForeignKeyConstraint(["paper_id"], ["papers.paper_id"], ondelete="CASCADE"),
+        )
+        op.create_index("ix_qa_history_qa_id", "qa_history", ["qa_id"])
+
+    if "ingestion_jobs" not in existing_tables:
+        op.create_table(
+            "ingestion_jobs",
+            sa.Column("job_id",            sa.String(36),  nullable=False),
+            sa.Column("status",            sa.String(20),  nullable=False),
+            sa.Column("progress_message",  sa.String(255)),
+            sa.Column("original_filename", sa.String(255), nullable=False),
+            sa.Column("spool_file_path",   sa.Text(),      nullable=False),
+            sa.Column("file_hash",         sa.String(64)),
+            sa.Column("file_size",         sa.BIGINT()),
+            sa.Column("paper_id",          sa.Integer()),
+            sa.Column("error_message",     sa.Text()),
+            sa.Column("attempt_count",     sa.Integer()),
+            sa.Column("created_at",        sa.DateTime()),
+            sa.Column("updated_at",        sa.DateTime()),
+            sa.Column("finished_at",       sa.DateTime()),
+            sa.PrimaryKeyConstraint("job_id"),
+            sa.ForeignKeyConstraint(["paper_id"], ["papers.paper_id"], ondelete="SET NULL"),
+        )
+        op.create_index("ix_ingestion_jobs_status", "ingestion_jobs", ["status"])
+        op.create_index("ix_ingestion_jobs_file_hash", "ingestion_jobs", ["file_hash"])
+        op.create_index(
+            "ux_ingestion_jobs_active_file_hash",
+            "ingestion_jobs",
+            ["file_hash"],
+            unique=True,
+            sqlite_where=sa.text("status IN ('pending', 'summarizing', 'saving')"),
+            postgresql_where=sa.text("status IN ('pending', 'summarizing', 'saving')")
+        )
+
+    if "paper_keywords" not in existing_tables:
+        op.create_table(
+            "paper_keywords",
+            sa.Column("paper_id",           sa.Integer(),   nullable=False),
+            sa.Column("keyword_normalised", sa.String(255), nullable=False),
+            sa.PrimaryKeyConstraint("paper_id", "keyword_normalised"),
+            sa.ForeignKeyConstraint(["paper_id"], ["papers.paper_id"], ondelete="CASCADE"),
+        )
+        op.create_index("ix_paper_keywords_keyword_paper", "paper_keywords", ["keyword_normalised", "paper_id"])
+
+    create_full_text_index(op.get_bind())
+    backfill_keyword_index(op.get_bind())
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS papers_fts")
+    op.drop_table("paper_keywords")
+    op.drop_table("ingestion_jobs")
+    op.drop_table("qa_history")
+    op.drop_table("search_results")
+    op.drop_table("search_history")
+    op.drop_table("papers")
@@ -0,0 +1,39 @@
+"""検索履歴・質問履歴・検索結果・論文一覧の検索用インデックスを追加
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # セッションごとの検索履歴を新しい順に取得する (get_search_history)
+    op.create_index(
+        "ix_search_history_user_session_search_date", "search_history", ["user_session", "search_date"]
+    )
+    # 期間指定での集計・古い履歴の削除
+    op.create_index("ix_search_history_search_date", "search_history", ["search_date"])
+    # 論文ごとの質問履歴 (SQLiteではqa_idを含むため、qa_id順の取得もインデックスで完結する)
+    op.create_index("ix_qa_history_paper_id", "qa_history", ["paper_id"])
+    op.create_index(
+        "ix_qa_history_user_session_question_date", "qa_history", ["user_session", "question_date"]
+    )
+    # 検索履歴ごとの検索結果の取得・削除
+    op.create_index("ix_search_results_search_id", "search_results", ["search_id"])
+    # 論文一覧の日付順表示・期間での絞り込み
+    op.create_index("ix_papers_upload_date", "papers", ["upload_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_papers_upload_date", table_name="papers")
+    op.drop_index("ix_search_results_search_id", table_name="search_results")
+    op.drop_index("ix_qa_history_user_session_question_date", table_name="qa_history")
+    op.drop_index("ix_qa_history_paper_id", table_name="qa_history")
+    op.drop_index("ix_search_history_search_date", table_name="search_history")
+    op.drop_index("ix_search_history_user_session_search_date", table_name="search_history")
@@ -0,0 +1,30 @@
+"""保持期間を過ぎた検索履歴を集約する日次集計テーブルを追加
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "search_daily_stats",
+        sa.Column("stat_date",          sa.Date(),      nullable=False),
+        sa.Column("search_type",        sa.String(50),  nullable=False),
+        sa.Column("search_count",       sa.Integer(),   nullable=False),
+        sa.Column("zero_result_count",  sa.Integer(),   nullable=False),
+        sa.Column("total_result_count", sa.Integer(),   nullable=False),
+        sa.Column("updated_at",         sa.DateTime()),
+        sa.PrimaryKeyConstraint("stat_date", "search_type"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("search_daily_stats")
@@ -0,0 +1,31 @@
+"""論文に質問回答用の事前計算済みコンテキストを追加
+
+既存の論文のコンテキストはdatabase.paper_contextでバックフィルする。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from database.paper_context import backfill_paper_contexts
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("papers", sa.Column("qa_context",                     sa.Text()))
+    op.add_column("papers", sa.Column("qa_context_token_count",         sa.Integer()))
+    op.add_column("papers", sa.Column("qa_context_trimmed_token_count", sa.Integer()))
+
+    backfill_paper_contexts(op.get_bind())
+
+
+def downgrade() -> None:
+    # batchモードはテーブルを作り直し全文検索のトリガーが消えるため、ALTER TABLE DROP COLUMN (SQLite 3.35以降) を使う
+    op.drop_column("papers", "qa_context_trimmed_token_count")
+    op.drop_column("papers", "qa_context_token_count")
+    op.drop_column("papers", "qa_context")
@@ -0,0 +1,39 @@
+"""論文本文のチャンクテーブルと全文検索インデックスを追加
+
+既存の論文はPDFを保存していないためチャンクを持たず、質問回答は要約のみで行う。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from database.full_text_index import create_chunk_full_text_index
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "paper_chunks",
+        sa.Column("chunk_id",    sa.Integer(), nullable=False),
+        sa.Column("paper_id",    sa.Integer(), nullable=False),
+        sa.Column("chunk_index", sa.Integer(), nullable=False),
+        sa.Column("page_number", sa.Integer(), nullable=False),
+        sa.Column("content",     sa.Text(),    nullable=False),
+        sa.PrimaryKeyConstraint("chunk_id"),
+        sa.ForeignKeyConstraint(["paper_id"], ["papers.paper_id"], ondelete="CASCADE"),
+    )
+    op.create_index("ux_paper_chunks_paper_chunk_index", "paper_chunks", ["paper_id", "chunk_index"], unique=True)
+
+    create_chunk_full_text_index(op.get_bind())
+
+
+def downgrade() -> None:
+    # トリガーはpaper_chunksの削除と同時に削除される
+    op.execute("DROP TABLE IF EXISTS paper_chunks_fts")
+    op.drop_index("ux_paper_chunks_paper_chunk_index", table_name="paper_chunks")
+    op.drop_table("paper_chunks")
@@ -0,0 +1,26 @@
+"""論文に要約プロンプトのバージョンと要約モデルを追加
+
+既存の論文はどのプロンプト・モデルで要約したか不明なため、NULLのまま再要約の対象とする。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("papers", sa.Column("summary_prompt_version", sa.String(64)))
+    op.add_column("papers", sa.Column("summary_model",          sa.String(100)))
+
+
+def downgrade() -> None:
+    # batchモードはテーブルを作り直し全文検索のトリガーが消えるため、ALTER TABLE DROP COLUMN (SQLite 3.35以降) を使う
+    op.drop_column("papers", "summary_model")
+    op.drop_column("papers", "summary_prompt_version")
@@ -0,0 +1,24 @@
+"""取り込みジョブにリースの更新日時を追加
+
+処理中のジョブはワーカーが定期的にheartbeat_atを更新し、更新が途絶えたジョブのみを再実行する。
+既存の処理中のジョブはNULLのままとし、期限切れとして再実行の対象にする。
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ingestion_jobs", sa.Column("heartbeat_at", sa.DateTime()))
+
+
+def downgrade() -> None:
+    op.drop_column("ingestion_jobs", "heartbeat_at")
@@ -0,0 +1,33 @@
+"""論文コーパスの更新回数テーブルを追加
+
+検索結果キャッシュはプロセスごとに持つため、papersのトリガーで更新回数を進め、
+CLIや他のワーカープロセスで保存・再要約された論文もキャッシュの無効化に反映する。
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from database.corpus_state import create_corpus_version_triggers, drop_corpus_version_triggers
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "corpus_state",
+        sa.Column("state_id", sa.Integer(), nullable=False),
+        sa.Column("version",  sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("state_id"),
+    )
+
+    create_corpus_version_triggers(op.get_bind())
+
+
+def downgrade() -> None:
+    drop_corpus_version_triggers(op.get_bind())
+    op.drop_table("corpus_state")
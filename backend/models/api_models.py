@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 
@@ -20,11 +20,30 @@ class PaperSummaryResponse(BaseModel):
         from_attributes = True
 
 
+class PaperListItem(BaseModel):
+    """論文一覧アイテム (一覧表示用の軽量な射影)"""
+    paper_id: int
+    title: str
+    authors: Optional[str] = None
+    keywords: Optional[List[str]] = None
+    upload_date: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class PaperListResponse(BaseModel):
+    """論文一覧レスポンス"""
+    items: List[PaperListItem]
+    next_cursor: Optional[int] = None  # 次ページ取得時にcursorへ指定するpaper_id
+
+
 class SearchRequest(BaseModel):
     """検索リクエスト"""
     query: str
-    search_type: str = "keyword"  # keyword, title, author, full_text
+    search_type: str = "keyword"  # keyword, title, author, full_text, semantic, hybrid
     limit: int = 20
+    keyword_match: str = "all"  # キーワード検索の条件: all (すべて含む), any (いずれかを含む)
 
 
 class SearchResultItem(BaseModel):
@@ -46,6 +65,19 @@ class SearchResponse(BaseModel):
     query: str
     results: List[SearchResultItem]
     total_count: int
+    timings: Dict[str, float] = {}  # 処理段階ごとの所要時間 (ミリ秒)
+    keyword_counts: Dict[str, int] = {}  # キーワード検索時の検索キーワード別の論文数
+
+
+class KeywordFacet(BaseModel):
+    """キーワード別の論文数"""
+    keyword: str
+    paper_count: int
+
+
+class KeywordFacetResponse(BaseModel):
+    """キーワードファセットレスポンス"""
+    facets: List[KeywordFacet]
 
 
 class QuestionRequest(BaseModel):
@@ -60,9 +92,82 @@ class QuestionResponse(BaseModel):
     question: str
     answer: str
     paper_id: int
+    # Gemini APIを呼び出した場合の入力トークン数と、キャッシュ・切り詰めで削減できたトークン数
+    token_usage: Dict[str, int] = {}
+
+
+class BatchQuestionRequest(BaseModel):
+    """一括質問リクエスト (すべての論文にすべての質問をする)"""
+    paper_ids: List[int]
+    questions: List[str]
+    user_session: Optional[str] = None
+
+
+class BatchQuestionItem(BaseModel):
+    """一括質問の (論文, 質問) ごとの回答 (失敗した場合はdetailにエラー内容)"""
+    paper_id: int
+    question: str
+    answer: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BatchQuestionResponse(BaseModel):
+    """一括質問レスポンス"""
+    answers: List[BatchQuestionItem]
+    # Gemini APIを呼び出した分の入力トークン数・削減できたトークン数の合計
+    token_usage: Dict[str, int] = {}
+
+
+class CacheStatsResponse(BaseModel):
+    """キャッシュ統計レスポンス"""
+    answer_cache: Dict[str, Any]
+    context_cache: Dict[str, Any]
+    search_cache: Dict[str, Any]
 
 
 class HealthCheckResponse(BaseModel):
     """ヘルスチェックレスポンス"""
     status: str
-    timestamp: datetime = datetime.now()
\ No newline at end of file
+    timestamp: datetime = datetime.now()
+
+
+class IngestionJobResponse(BaseModel):
+    """論文取り込みジョブレスポンス"""
+    job_id: str
+    status: str  # pending, summarizing, saving, completed, failed
+    progress_message: Optional[str] = None
+    original_filename: str
+    paper_id: Optional[int] = None
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[PaperSummaryResponse] = None
+
+    class Config:
+        from_attributes = True
+
+
+class BatchUploadRejectedItem(BaseModel):
+    """一括アップロードで受け付けなかったファイル"""
+    filename: str
+    detail: str
+
+
+class BatchUploadResponse(BaseModel):
+    """一括アップロードレスポンス"""
+    jobs: List[IngestionJobResponse]
+    rejected: List[BatchUploadRejectedItem]
+
+
+class ResummarizationStatusResponse(BaseModel):
+    """再要約の実行状況レスポンス"""
+    running: bool
+    prompt_version: str
+    model: str
+    stale_papers: int  # 現在のプロンプト・モデル以外で要約された論文数
+    resummarized: int = 0
+    failed: int = 0
+    missing_pdf: int = 0  # PDFが保存されておらず再要約できなかった論文数
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, BIGINT, JSON, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, BIGINT, JSON, Float, ForeignKey, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -22,7 +22,14 @@ class Paper(Base):
     summary_discussion    = Column(Text)
     summary_conclusion    = Column(Text)
     keywords              = Column(JSON)
-    upload_date           = Column(DateTime, default=func.current_timestamp())
+    # 質問回答用に事前計算したコンテキスト (database.paper_contextで作成)
+    qa_context                     = Column(Text)
+    qa_context_token_count         = Column(Integer)
+    qa_context_trimmed_token_count = Column(Integer)
+    # 要約に使ったプロンプトのバージョンとモデル (変更後に古い要約の論文のみを再要約するために使う)
+    summary_prompt_version = Column(String(64))
+    summary_model          = Column(String(100))
+    upload_date           = Column(DateTime, default=func.current_timestamp(), index=True)
     file_size             = Column(BIGINT)
     file_hash             = Column(String(64), unique=True, nullable=False)
     created_at            = Column(DateTime, default=func.current_timestamp())
@@ -31,6 +38,43 @@ class Paper(Base):
     # リレーション
     search_results = relationship("SearchResult", back_populates="paper")
     qa_history = relationship("QAHistory", back_populates="paper")
+    keyword_entries = relationship("PaperKeyword", back_populates="paper", cascade="all, delete-orphan")
+    chunks = relationship("PaperChunk", back_populates="paper", cascade="all, delete-orphan")
+
+
+class PaperKeyword(Base):
+    """論文キーワードテーブル (Paper.keywordsを正規化して展開したキーワード検索用の索引)"""
+    __tablename__ = "paper_keywords"
+
+    paper_id           = Column(Integer, ForeignKey("papers.paper_id", ondelete="CASCADE"), primary_key=True)
+    keyword_normalised = Column(String(255), primary_key=True)
+
+    # リレーション
+    paper = relationship("Paper", back_populates="keyword_entries")
+
+    # キーワードから論文を引く検索・キーワード別の件数集計をインデックスのみで行う
+    __table_args__ = (
+        Index("ix_paper_keywords_keyword_paper", "keyword_normalised", "paper_id"),
+    )
+
+
+class PaperChunk(Base):
+    """論文本文チャンクテーブル (質問回答で関連箇所を検索するためのPDF本文の断片)"""
+    __tablename__ = "paper_chunks"
+
+    chunk_id    = Column(Integer, primary_key=True)
+    paper_id    = Column(Integer, ForeignKey("papers.paper_id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    page_number = Column(Integer, nullable=False)
+    content     = Column(Text, nullable=False)
+
+    # リレーション
+    paper = relationship("Paper", back_populates="chunks")
+
+    # 論文ごとのチャンクの取得・チャンクIDの範囲の取得をインデックスで行う
+    __table_args__ = (
+        Index("ux_paper_chunks_paper_chunk_index", "paper_id", "chunk_index", unique=True),
+    )
 
 
 class SearchHistory(Base):
@@ -48,13 +92,30 @@ class SearchHistory(Base):
     # リレーション
     search_results = relationship("SearchResult", back_populates="search_history")
 
+    __table_args__ = (
+        Index("ix_search_history_user_session_search_date", "user_session", "search_date"),
+        Index("ix_search_history_search_date", "search_date"),
+    )
+
+
+class SearchDailyStat(Base):
+    """検索回数の日次集計テーブル (保持期間を過ぎて削除した検索履歴を集約)"""
+    __tablename__ = "search_daily_stats"
+
+    stat_date          = Column(Date, primary_key=True)
+    search_type        = Column(String(50), primary_key=True)
+    search_count       = Column(Integer, nullable=False, default=0)
+    zero_result_count  = Column(Integer, nullable=False, default=0)
+    total_result_count = Column(Integer, nullable=False, default=0)
+    updated_at         = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
 
 class SearchResult(Base):
     """検索結果テーブル"""
     __tablename__ = "search_results"
 
     result_id        = Column(Integer, primary_key=True, index=True)
-    search_id        = Column(Integer, ForeignKey("search_history.search_id", ondelete="CASCADE"), nullable=False)
+    search_id        = Column(Integer, ForeignKey("search_history.search_id", ondelete="CASCADE"), nullable=False, index=True)
     paper_id         = Column(Integer, ForeignKey("papers.paper_id", ondelete="CASCADE"), nullable=False)
     relevance_score  = Column(Float, default=0.0)
     created_at       = Column(DateTime, default=func.current_timestamp())
@@ -69,7 +130,7 @@ class QAHistory(Base):
     __tablename__ = "qa_history"
 
     qa_id         = Column(Integer, primary_key=True, index=True)
-    paper_id      = Column(Integer, ForeignKey("papers.paper_id", ondelete="CASCADE"), nullable=False)
+    paper_id      = Column(Integer, ForeignKey("papers.paper_id", ondelete="CASCADE"), nullable=False, index=True)
     question      = Column(Text, nullable=False)
     answer        = Column(Text, nullable=False)
     question_date = Column(DateTime, default=func.current_timestamp())
@@ -77,4 +138,46 @@ class QAHistory(Base):
     created_at    = Column(DateTime, default=func.current_timestamp())
 
     # リレーション
-    paper = relationship("Paper", back_populates="qa_history")
\ No newline at end of file
+    paper = relationship("Paper", back_populates="qa_history")
+
+    __table_args__ = (
+        Index("ix_qa_history_user_session_question_date", "user_session", "question_date"),
+    )
+
+class CorpusState(Base):
+    """論文コーパスの更新回数テーブル (1行のみ。papersのトリガーが論文の追加・更新・削除と同じトランザクションで進める)"""
+    __tablename__ = "corpus_state"
+
+    state_id = Column(Integer, primary_key=True)
+    version  = Column(Integer, nullable=False, default=0)
+
+class IngestionJob(Base):
+    """論文取り込みジョブテーブル"""
+    __tablename__ = "ingestion_jobs"
+
+    job_id            = Column(String(36), primary_key=True)
+    status            = Column(String(20), nullable=False, default="pending", index=True)
+    progress_message  = Column(String(255))
+    original_filename = Column(String(255), nullable=False)
+    spool_file_path   = Column(Text, nullable=False)
+    file_hash         = Column(String(64), index=True)
+    file_size         = Column(BIGINT)
+    paper_id          = Column(Integer, ForeignKey("papers.paper_id", ondelete="SET NULL"))
+    error_message     = Column(Text)
+    attempt_count     = Column(Integer, default=0)
+    # 処理中のジョブのリース (ワーカーが定期的に更新し、途絶えたジョブのみを他のワーカー・プロセスが再実行する)
+    heartbeat_at      = Column(DateTime)
+    created_at        = Column(DateTime, default=func.current_timestamp())
+    updated_at        = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+    finished_at       = Column(DateTime)
+
+    # 同じファイルの処理中ジョブは1件のみ (同時アップロードを1つの要約に集約する)
+    __table_args__ = (
+        Index(
+            "ux_ingestion_jobs_active_file_hash",
+            "file_hash",
+            unique=True,
+            sqlite_where=text("status IN ('pending', 'summarizing', 'saving')"),
+            postgresql_where=text("status IN ('pending', 'summarizing', 'saving')")
+        ),
+    )
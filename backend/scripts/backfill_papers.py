@@ -0,0 +1,235 @@
+"""
+PDFディレクトリから論文を一括取り込みするCLI
+
+使い方 (backendディレクトリで実行):
+    python -m scripts.backfill_papers /path/to/pdfs --concurrency 8 --batch-size 50
+
+要約はGemini APIの同時実行数制限の範囲で並行実行し、保存はbatch-size件ごとに
+1トランザクションで行う。保存済みのファイルはチェックポイントファイル (JSON Lines) に
+追記されるため、中断後に同じコマンドを再実行すると未処理のファイルのみを取り込む。
+埋め込みは計算しない (起動中のサーバーがVECTOR_INDEX_BACKFILL_INTERVAL_SECONDSごとに登録する)。
+"""
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import select
+from database.connection import AsyncSessionLocal, engine
+from database.schema import run_database_migrations
+from models.database_models import Paper, PaperChunk
+from services.gemini_call_limiter import GeminiCallLimiter
+from services.gemini_service import GeminiService
+from services.paper_chunker import PaperChunker
+from services.pdf_processor import PDFProcessor
+from services.pdf_store import PDFStore
+from services.upload_spooler import hash_file
+
+
+class BackfillCheckpoint:
+    """取り込み済みファイルを記録するチェックポイント (追記のみのJSON Lines)"""
+
+    def __init__(self, checkpoint_path: str):
+        self.checkpoint_path = checkpoint_path
+
+    def load_completed_paths(self) -> Set[str]:
+        """記録済みのファイルパスを読み込み"""
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+
+        completed_paths = set()
+        with open(self.checkpoint_path, encoding="utf-8") as checkpoint_file:
+            for line in checkpoint_file:
+                # 書き込み途中で中断された最終行は無視する
+                try:
+                    completed_paths.add(json.loads(line)["path"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        return completed_paths
+
+    def record(self, entries: List[Dict[str, Any]]) -> None:
+        """処理済みファイルを追記し、ディスクに書き出す"""
+        if not entries:
+            return
+        with open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+            for entry in entries:
+                checkpoint_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+
+class PaperBackfiller:
+    """ディレクトリ内のPDFを並行要約し、バッチ単位で保存するサービス"""
+
+    def __init__(
+        self,
+        gemini_service : GeminiService,
+        pdf_processor  : PDFProcessor,
+        checkpoint     : BackfillCheckpoint,
+        concurrency    : int,
+        batch_size     : int,
+        paper_chunker  : Optional[PaperChunker] = None,
+        pdf_store      : Optional[PDFStore]     = None
+    ):
+        self.gemini_service = gemini_service
+        self.pdf_processor  = pdf_processor
+        self.checkpoint     = checkpoint
+        self.concurrency    = concurrency
+        self.batch_size     = batch_size
+        self.paper_chunker  = paper_chunker or PaperChunker()
+        self.pdf_store      = pdf_store or PDFStore()
+
+        self._pending_records: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._known_hashes: Set[str] = set()
+        self.counts = {"saved": 0, "duplicate": 0, "failed": 0, "skipped": 0}
+
+    async def run(self, pdf_directory: str) -> Dict[str, int]:
+        """ディレクトリ内の未処理PDFを取り込み、件数を返す"""
+        pdf_paths       = self._find_pdf_paths(pdf_directory)
+        completed_paths = self.checkpoint.load_completed_paths()
+        self.counts["skipped"] = sum(1 for pdf_path in pdf_paths if pdf_path in completed_paths)
+
+        async with AsyncSessionLocal() as db:
+            self._known_hashes = set((await db.scalars(select(Paper.file_hash))).all())
+
+        path_queue = asyncio.Queue()
+        for pdf_path in pdf_paths:
+            if pdf_path not in completed_paths:
+                path_queue.put_nowait(pdf_path)
+
+        await asyncio.gather(*[self._run_worker(path_queue) for _ in range(self.concurrency)])
+        await self._flush_pending_records()
+        return self.counts
+
+    def _find_pdf_paths(self, pdf_directory: str) -> List[str]:
+        """ディレクトリを再帰的に走査してPDFのパスを列挙"""
+        pdf_paths = []
+        for directory_path, _, file_names in os.walk(pdf_directory):
+            for file_name in file_names:
+                if file_name.lower().endswith(".pdf"):
+                    pdf_paths.append(os.path.abspath(os.path.join(directory_path, file_name)))
+        return sorted(pdf_paths)
+
+    async def _run_worker(self, path_queue: asyncio.Queue) -> None:
+        """キューからPDFを取り出して要約し続ける"""
+        while not path_queue.empty():
+            pdf_path = path_queue.get_nowait()
+            try:
+                await self._summarize_pdf(pdf_path)
+            except Exception as e:
+                # 失敗したファイルはチェックポイントに記録せず、次回の実行で再試行する
+                self.counts["failed"] += 1
+                print(f"[failed] {pdf_path}: {e}")
+
+    async def _summarize_pdf(self, pdf_path: str) -> None:
+        """PDFを要約・本文をチャンク分割し、保存待ちのバッチに追加"""
+        file_hash, file_size = await asyncio.to_thread(hash_file, pdf_path)
+        # 再要約に使うPDFを保存領域にコピーする (取り込み済みでPDFが未保存の論文も再要約できるようになる)
+        await asyncio.to_thread(self.pdf_store.store, pdf_path, file_hash)
+
+        # 取り込み済み・今回の実行で処理中の論文はGemini APIを呼ばない
+        if file_hash in self._known_hashes:
+            self.counts["duplicate"] += 1
+            self.checkpoint.record([{"path": pdf_path, "file_hash": file_hash, "status": "duplicate"}])
+            return
+        self._known_hashes.add(file_hash)
+
+        try:
+            summary_data, chunks = await asyncio.gather(
+                self.gemini_service.generate_paper_summary(pdf_path),
+                self._extract_chunks(pdf_path)
+            )
+        except Exception:
+            self._known_hashes.discard(file_hash)
+            raise
+
+        self._pending_records.append({
+            "path"              : pdf_path,
+            "original_filename" : os.path.basename(pdf_path),
+            "file_hash"         : file_hash,
+            "file_size"         : file_size,
+            "summary_data"      : summary_data,
+            "chunks"            : chunks,
+        })
+        if len(self._pending_records) >= self.batch_size:
+            await self._flush_pending_records()
+
+    async def _extract_chunks(self, pdf_path: str) -> List[PaperChunk]:
+        """PDF本文をチャンクに分割 (抽出できない場合は要約のみで取り込む)"""
+        try:
+            return await asyncio.to_thread(self.paper_chunker.extract_chunks, pdf_path)
+        except Exception as e:
+            print(f"[no chunks] {pdf_path}: {e}")
+            return []
+
+    async def _flush_pending_records(self) -> None:
+        """保存待ちの論文を1トランザクションで保存し、チェックポイントに記録"""
+        async with self._flush_lock:
+            paper_records, self._pending_records = self._pending_records, []
+            if not paper_records:
+                return
+
+            async with AsyncSessionLocal() as db:
+                try:
+                    papers = await self.pdf_processor.save_papers_to_database(paper_records, db)
+                    saved_pairs = list(zip(paper_records, papers))
+                except Exception:
+                    # APIからの同時アップロードと重複した場合などは1件ずつ保存して切り分ける
+                    saved_pairs = await self._save_records_individually(paper_records, db)
+
+            self.counts["saved"] += len(saved_pairs)
+            self.checkpoint.record([
+                {"path": paper_record["path"], "file_hash": paper_record["file_hash"], "paper_id": paper.paper_id}
+                for paper_record, paper in saved_pairs
+            ])
+
+    async def _save_records_individually(self, paper_records: List[Dict[str, Any]], db) -> List[tuple]:
+        """論文を1件ずつ保存し、保存できたものを返す"""
+        saved_pairs = []
+        for paper_record in paper_records:
+            try:
+                paper = await self.pdf_processor.save_paper_to_database(
+                    paper_record["original_filename"],
+                    paper_record["file_hash"],
+                    paper_record["file_size"],
+                    paper_record["summary_data"],
+                    db,
+                    paper_record["chunks"]
+                )
+                saved_pairs.append((paper_record, paper))
+            except Exception as e:
+                self.counts["failed"] += 1
+                print(f"[failed] {paper_record['path']}: {e}")
+        return saved_pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PDFディレクトリから論文を一括取り込み")
+    parser.add_argument("pdf_directory", help="PDFを格納したディレクトリ")
+    parser.add_argument("--concurrency", type=int, default=8,  help="Gemini APIの同時実行数")
+    parser.add_argument("--batch-size",  type=int, default=50, help="1トランザクションで保存する論文数")
+    parser.add_argument("--checkpoint",  default="backfill_checkpoint.jsonl", help="チェックポイントファイルのパス")
+    arguments = parser.parse_args()
+
+    run_database_migrations(engine)
+
+    gemini_service = GeminiService(
+        call_limiter=GeminiCallLimiter(max_concurrent_calls=arguments.concurrency)
+    )
+    backfiller = PaperBackfiller(
+        gemini_service = gemini_service,
+        pdf_processor  = PDFProcessor(),
+        checkpoint     = BackfillCheckpoint(arguments.checkpoint),
+        concurrency    = arguments.concurrency,
+        batch_size     = arguments.batch_size
+    )
+    counts = asyncio.run(backfiller.run(arguments.pdf_directory))
+    print(
+        f"saved={counts['saved']} duplicate={counts['duplicate']} "
+        f"failed={counts['failed']} skipped(checkpoint)={counts['skipped']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
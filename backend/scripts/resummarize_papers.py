@@ -0,0 +1,70 @@
+"""
+要約プロンプト・モデルの変更後に、古い要約の論文を保存済みのPDFから再要約するCLI
+
+使い方 (backendディレクトリで実行):
+    python -m scripts.resummarize_papers --dry-run
+    python -m scripts.resummarize_papers --concurrency 4 --requests-per-minute 30 --limit 500
+
+現在のプロンプト・モデル以外 (不明を含む) で要約された論文のみを対象とし、1件ごとに保存する。
+中断後に同じコマンドを再実行すると、再要約が済んでいない論文から再開する。
+回答キャッシュ・検索結果キャッシュはプロセスごとに持つため、APIサーバーの起動中は
+POST /resummarize を使うこと (このCLIはサーバーを停止した状態で実行する)。
+"""
+import argparse
+import asyncio
+from database.connection import AsyncSessionLocal, engine
+from database.schema import run_database_migrations
+from services.embedding_backends import create_embedding_backend
+from services.gemini_call_limiter import GeminiCallLimiter
+from services.gemini_service import GeminiService
+from services.paper_embedding_indexer import PaperEmbeddingIndexer
+from services.pdf_processor import PDFProcessor
+from services.resummarization_service import ResummarizationService
+
+
+async def run_resummarization(arguments: argparse.Namespace) -> None:
+    """再要約を実行 (--dry-runの場合は対象の論文数のみ表示)"""
+    gemini_service = GeminiService(
+        call_limiter=GeminiCallLimiter(max_concurrent_calls=arguments.concurrency)
+    )
+    paper_embedding_indexer = PaperEmbeddingIndexer(create_embedding_backend(gemini_service))
+    resummarization_service = ResummarizationService(
+        gemini_service,
+        PDFProcessor(),
+        paper_embedding_indexer = paper_embedding_indexer,
+        concurrency             = arguments.concurrency,
+        requests_per_minute     = arguments.requests_per_minute
+    )
+
+    async with AsyncSessionLocal() as db:
+        status = await resummarization_service.get_status(db)
+    print(f"prompt_version={status['prompt_version']} model={status['model']} stale_papers={status['stale_papers']}")
+    if arguments.dry_run:
+        return
+
+    # 再要約した論文の埋め込みを置き換えるため、既存のベクトルインデックスを読み込んでおく
+    await asyncio.to_thread(paper_embedding_indexer.vector_index.load)
+    try:
+        counts = await resummarization_service.run(arguments.limit)
+    finally:
+        await paper_embedding_indexer.stop()
+    print(
+        f"resummarized={counts['resummarized']} failed={counts['failed']} "
+        f"missing_pdf={counts['missing_pdf']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="古い要約の論文を保存済みのPDFから再要約")
+    parser.add_argument("--concurrency",         type=int,   default=4,    help="同時に再要約する論文数")
+    parser.add_argument("--requests-per-minute", type=float, default=30,   help="1分あたりに開始する再要約の上限 (0の場合は制限しない)")
+    parser.add_argument("--limit",               type=int,   default=None, help="今回の実行で処理する論文数の上限")
+    parser.add_argument("--dry-run",             action="store_true",      help="再要約が必要な論文数のみ表示")
+    arguments = parser.parse_args()
+
+    run_database_migrations(engine)
+    asyncio.run(run_resummarization(arguments))
+
+
+if __name__ == "__main__":
+    main()
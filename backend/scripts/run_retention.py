@@ -0,0 +1,56 @@
+"""
+検索履歴・質問履歴の保持ポリシーを適用するCLI
+
+使い方 (backendディレクトリで実行):
+    python -m scripts.run_retention
+    python -m scripts.run_retention --enable-incremental-vacuum
+
+保持期間・保持件数は環境変数 (SEARCH_HISTORY_RETENTION_DAYS など) で指定する。
+--enable-incremental-vacuumは既存のデータベースをauto_vacuum=INCREMENTALに変換する
+(VACUUMでファイル全体を書き直すため、アプリケーションを停止した状態で1回だけ実行する)。
+"""
+import argparse
+import asyncio
+from sqlalchemy import text
+from database.connection import engine
+from database.schema import run_database_migrations
+from services.retention_service import RetentionService
+
+
+def enable_incremental_vacuum() -> None:
+    """auto_vacuum=INCREMENTALを設定し、VACUUMで既存のファイルに反映"""
+    if engine.dialect.name != "sqlite":
+        print("SQLite以外のデータベースでは不要です")
+        return
+
+    # VACUUMはトランザクション内で実行できない
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        connection.execute(text("VACUUM"))
+        auto_vacuum_mode = connection.execute(text("PRAGMA auto_vacuum")).scalar()
+    print(f"auto_vacuum={auto_vacuum_mode} (2: INCREMENTAL)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="検索履歴・質問履歴の保持ポリシーを適用")
+    parser.add_argument(
+        "--enable-incremental-vacuum", action="store_true",
+        help="既存のデータベースをauto_vacuum=INCREMENTALに変換してから実行"
+    )
+    arguments = parser.parse_args()
+
+    run_database_migrations(engine)
+    if arguments.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+
+    counts = asyncio.run(RetentionService().run_once())
+    print(
+        f"search_history_deleted={counts['search_history_deleted']} "
+        f"search_results_deleted={counts['search_results_deleted']} "
+        f"qa_history_deleted={counts['qa_history_deleted']} "
+        f"vacuumed_pages={counts['vacuumed_pages']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 正規化時に末尾から取り除く記号
+TRAILING_PUNCTUATION = "?？。.!！ 　"
+
+
+def normalize_question(question: str) -> str:
+    """表記揺れを吸収するために質問文を正規化"""
+    normalized_question = unicodedata.normalize("NFKC", question).lower()
+    normalized_question = re.sub(r"\s+", " ", normalized_question)
+    return normalized_question.strip().rstrip(TRAILING_PUNCTUATION)
+
+
+class AnswerCache:
+    """質問回答のインメモリキャッシュ (TTL + LRU)"""
+
+    def __init__(
+        self,
+        max_entries : Optional[int]       = None,
+        ttl_seconds : Optional[float]     = None,
+        clock       : Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+        self._clock      = clock
+
+        # (paper_id, 正規化済み質問) -> (論文バージョン, 回答, 有効期限)
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[str, str, float]]" = OrderedDict()
+
+        self.hit_count         = 0
+        self.history_hit_count = 0
+        self.miss_count        = 0
+        self.eviction_count    = 0
+
+    def get(self, paper_id: int, paper_version: str, normalized_question: str) -> Optional[str]:
+        """キャッシュ済みの回答を取得 (期限切れ・要約更新済みの場合はNone)"""
+        cache_key = (paper_id, normalized_question)
+        entry     = self._entries.get(cache_key)
+        if entry is None:
+            return None
+
+        cached_version, answer, expires_at = entry
+        if cached_version != paper_version or expires_at <= self._clock():
+            del self._entries[cache_key]
+            return None
+
+        self._entries.move_to_end(cache_key)
+        return answer
+
+    def set(self, paper_id: int, paper_version: str, normalized_question: str, answer: str) -> None:
+        """回答をキャッシュに登録し、上限を超えた場合は最も古いものを破棄"""
+        cache_key = (paper_id, normalized_question)
+        self._entries[cache_key] = (paper_version, answer, self._clock() + self.ttl_seconds)
+        self._entries.move_to_end(cache_key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.eviction_count += 1
+
+    def invalidate_paper(self, paper_id: int) -> None:
+        """論文の要約が更新された際に、その論文の回答をすべて破棄"""
+        for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == paper_id]:
+            del self._entries[cache_key]
+
+    def record_hit(self, from_history: bool = False) -> None:
+        """ヒット数を記録"""
+        if from_history:
+            self.history_hit_count += 1
+        else:
+            self.hit_count += 1
+
+    def record_miss(self) -> None:
+        """ミス数を記録"""
+        self.miss_count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット率などの統計情報を取得"""
+        request_count = self.hit_count + self.history_hit_count + self.miss_count
+        return {
+            "entries"      : len(self._entries),
+            "max_entries"  : self.max_entries,
+            "ttl_seconds"  : self.ttl_seconds,
+            "hits"         : self.hit_count,
+            "history_hits" : self.history_hit_count,
+            "misses"       : self.miss_count,
+            "evictions"    : self.eviction_count,
+            "hit_rate"     : (self.hit_count + self.history_hit_count) / request_count if request_count else 0.0,
+        }
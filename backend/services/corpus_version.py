@@ -0,0 +1,30 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.corpus_state import CORPUS_STATE_ID
+from models.database_models import CorpusState
+
+
+class CorpusVersion:
+    """論文コーパスのバージョン (検索結果キャッシュの無効化に使う)
+
+    論文の追加・更新・削除はpapersのトリガーがデータベースの更新回数を進めるため、CLI・他のワーカープロセスでの保存も反映される。
+    埋め込みのインデックスはプロセスごとに持つため、その登録回数はこのプロセス内で数えて足し合わせる。
+    """
+
+    def __init__(self):
+        # このプロセスでの埋め込みの登録回数
+        self.value = 0
+
+    def bump(self) -> int:
+        """このプロセスの埋め込みのインデックスが更新されたことを記録し、新しい登録回数を返す"""
+        self.value += 1
+        return self.value
+
+    async def load(self, db: AsyncSession) -> int:
+        """現在のバージョンを取得 (どちらの回数も増える一方のため、合計が同じであればどちらも更新されていない)"""
+        stored_version = await db.scalar(select(CorpusState.version).where(CorpusState.state_id == CORPUS_STATE_ID))
+        return (stored_version or 0) + self.value
+
+
+# 同じプロセス内の埋め込みの登録処理と検索サービスで共有するバージョン
+default_corpus_version = CorpusVersion()
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import re
+import unicodedata
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from services.gemini_call_limiter import GeminiCallLimiter
+
+load_dotenv()
+
+
+class EmbeddingBackend(ABC):
+    """テキスト埋め込みバックエンドの基底クラス"""
+
+    # インデックスの再構築要否を判定するための識別子
+    backend_name = "base"
+    dimension    = 0
+
+    @abstractmethod
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """テキストをL2正規化済みのfloat32ベクトル (len(texts) × dimension) に変換"""
+
+    def _normalize_rows(self, vectors: np.ndarray) -> np.ndarray:
+        """各行をL2正規化 (内積 = コサイン類似度にする)"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """文字n-gramの特徴ハッシングによる決定的なローカル埋め込み (テスト・ベンチマーク用)"""
+
+    backend_name = "hashing"
+
+    def __init__(self, dimension: int = 512, ngram_sizes: tuple = (2, 3)):
+        self.dimension   = dimension
+        self.ngram_sizes = ngram_sizes
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        # CPUを使う処理のため、イベントループをブロックしないようスレッドで実行する
+        return await asyncio.to_thread(self._embed_texts, texts)
+
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """文字n-gramを特徴ハッシングしてベクトル化"""
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row_index, text in enumerate(texts):
+            normalized_text = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text).lower())
+            for ngram_size in self.ngram_sizes:
+                for start in range(max(0, len(normalized_text) - ngram_size + 1)):
+                    # プロセスごとに値が変わるhash()ではなくcrc32を使う
+                    feature_hash = zlib.crc32(normalized_text[start:start + ngram_size].encode("utf-8"))
+                    sign = 1.0 if feature_hash & 0x80000000 else -1.0
+                    vectors[row_index, feature_hash % self.dimension] += sign
+        return self._normalize_rows(vectors)
+
+
+class GeminiEmbeddingBackend(EmbeddingBackend):
+    """Gemini埋め込みAPIによる埋め込み"""
+
+    backend_name = "gemini"
+
+    # 1リクエストで埋め込むテキスト数
+    BATCH_SIZE = 100
+
+    def __init__(
+        self,
+        client,
+        call_limiter : GeminiCallLimiter,
+        model_name   : Optional[str] = None,
+        dimension    : int           = 768
+    ):
+        self.client       = client
+        self.call_limiter = call_limiter
+        self.model_name   = model_name or os.getenv("GEMINI_EMBEDDING_MODEL", "text-embedding-004")
+        self.dimension    = dimension
+        self.backend_name = f"gemini:{self.model_name}"
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        embedding_rows = []
+        for batch_start in range(0, len(texts), self.BATCH_SIZE):
+            batch_texts = texts[batch_start:batch_start + self.BATCH_SIZE]
+            response = await self.call_limiter.call(
+                lambda: self.client.aio.models.embed_content(
+                    model=self.model_name,
+                    contents=batch_texts
+                )
+            )
+            embedding_rows.extend(embedding.values for embedding in response.embeddings)
+
+        if not embedding_rows:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return self._normalize_rows(np.asarray(embedding_rows, dtype=np.float32))
+
+
+def create_embedding_backend(gemini_service) -> EmbeddingBackend:
+    """環境変数EMBEDDING_BACKENDに応じて埋め込みバックエンドを作成"""
+    backend_name = os.getenv("EMBEDDING_BACKEND", "gemini")
+    if backend_name == "hashing":
+        return HashingEmbeddingBackend()
+    return GeminiEmbeddingBackend(gemini_service.client, gemini_service.call_limiter)
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import random
+from typing import Awaitable, Callable, Optional, TypeVar
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ResultType = TypeVar("ResultType")
+
+# レート制限・一時的な過負荷を示すHTTPステータス
+RETRYABLE_STATUS_CODES = {429, 503}
+
+
+class GeminiCallLimiter:
+    """Gemini API呼び出しの同時実行数制限と指数バックオフ付きリトライ"""
+
+    def __init__(
+        self,
+        max_concurrent_calls : Optional[int]   = None,
+        max_retries          : Optional[int]   = None,
+        base_delay_seconds   : Optional[float] = None,
+        max_delay_seconds    : Optional[float] = None,
+        sleep                : Callable[[float], Awaitable[None]] = asyncio.sleep,
+        random_ratio         : Callable[[], float]                = random.random
+    ):
+        self.max_concurrent_calls = max_concurrent_calls or int(os.getenv("GEMINI_MAX_CONCURRENT_CALLS", "32"))
+        self.max_retries          = max_retries if max_retries is not None else int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+        self.base_delay_seconds   = base_delay_seconds or float(os.getenv("GEMINI_RETRY_BASE_DELAY_SECONDS", "1.0"))
+        self.max_delay_seconds    = max_delay_seconds or float(os.getenv("GEMINI_RETRY_MAX_DELAY_SECONDS", "30.0"))
+
+        self._semaphore    = asyncio.Semaphore(self.max_concurrent_calls)
+        self._sleep        = sleep
+        self._random_ratio = random_ratio
+
+        self.in_flight_calls = 0
+        self.retry_count     = 0
+
+    async def call(self, operation: Callable[[], Awaitable[ResultType]]) -> ResultType:
+        """同時実行数の枠内でoperationを実行し、レート制限エラー時はリトライ"""
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self.in_flight_calls += 1
+                try:
+                    return await operation()
+                except Exception as error:
+                    if attempt >= self.max_retries or not self._is_retryable_error(error):
+                        raise
+                finally:
+                    self.in_flight_calls -= 1
+
+            # 待機中は枠を解放し、他の呼び出しを進める
+            self.retry_count += 1
+            await self._sleep(self._calculate_backoff_delay(attempt))
+            attempt += 1
+
+    def _calculate_backoff_delay(self, attempt: int) -> float:
+        """指数バックオフ + フルジッターの待機秒数を計算"""
+        exponential_delay = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** attempt))
+        return exponential_delay * self._random_ratio()
+
+    def _is_retryable_error(self, error: Exception) -> bool:
+        """リトライ対象のエラーか判定"""
+        return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
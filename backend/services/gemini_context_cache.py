@@ -0,0 +1,146 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# キャッシュ作成が失敗し続ける場合に、モデルが非対応とみなすHTTPステータス
+UNSUPPORTED_STATUS_CODES = {400, 403, 404}
+
+# 論文ごとの作成ロックは論文IDで固定数のロックに割り当て、論文数に応じて増やさない
+CREATION_LOCK_POOL_SIZE = 64
+
+# Gemini側の有効期限より前にローカルの登録を破棄し、期限切れのキャッシュを参照しない
+EXPIRY_MARGIN_SECONDS = 60
+
+
+class GeminiContextCache:
+    """論文コンテキストのGeminiコンテキストキャッシュの管理 (登録・有効期限・LRU・統計)"""
+
+    def __init__(
+        self,
+        enabled           : Optional[bool]      = None,
+        min_tokens        : Optional[int]       = None,
+        min_questions     : Optional[int]       = None,
+        body_token_budget : Optional[int]       = None,
+        ttl_seconds       : Optional[float]     = None,
+        max_entries       : Optional[int]       = None,
+        max_failures      : Optional[int]       = None,
+        clock             : Callable[[], float] = time.monotonic
+    ):
+        self.enabled           = enabled if enabled is not None else os.getenv("QA_CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+        # Geminiのコンテキストキャッシュは最小トークン数未満では作成できない
+        self.min_tokens        = min_tokens or int(os.getenv("QA_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+        # キャッシュの保存料金がかかるため、同じ論文への質問がこの回数に達してから作成する
+        self.min_questions     = min_questions or int(os.getenv("QA_CONTEXT_CACHE_MIN_QUESTIONS", "2"))
+        # 要約のコンテキスト (QA_CONTEXT_TOKEN_BUDGET以内) だけでは最小トークン数に届かないため、本文の先頭もキャッシュに含める
+        self.body_token_budget = body_token_budget if body_token_budget is not None else int(os.getenv("QA_CONTEXT_CACHE_BODY_TOKEN_BUDGET", "8000"))
+        self.ttl_seconds       = ttl_seconds or float(os.getenv("QA_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+        self.max_entries       = max_entries or int(os.getenv("QA_CONTEXT_CACHE_MAX_ENTRIES", "100"))
+        # 400は論文ごとの内容が原因のこともあるため、非対応を示すステータスが連続した場合だけ作成を止める
+        self.max_failures      = max_failures or int(os.getenv("QA_CONTEXT_CACHE_MAX_FAILURES", "3"))
+        self._clock            = clock
+
+        # paper_id -> (論文バージョン, キャッシュ名, 有効期限)
+        self._entries: "OrderedDict[int, Tuple[str, str, float]]" = OrderedDict()
+        # (paper_id, 論文バージョン) -> 有効期限内の質問回数
+        self._question_counts: "OrderedDict[Tuple[int, str], Tuple[int, float]]" = OrderedDict()
+        # 作成に失敗した (paper_id, 論文バージョン)。要約が更新されるまで作成を再試行しない
+        self._failed_papers: "OrderedDict[Tuple[int, str], None]" = OrderedDict()
+        self._creation_locks = [asyncio.Lock() for _ in range(CREATION_LOCK_POOL_SIZE)]
+
+        self.request_count            = 0
+        self.cached_request_count     = 0
+        self.created_count            = 0
+        self.creation_failure_count   = 0
+        self.failure_streak           = 0
+        self.prompt_token_total       = 0
+        self.input_tokens_saved_total = 0
+
+    def get(self, paper_id: int, paper_version: str) -> Optional[str]:
+        """有効なキャッシュ名を取得 (期限切れ・要約更新済みの場合はNone)"""
+        entry = self._entries.get(paper_id)
+        if entry is None:
+            return None
+
+        cached_version, cache_name, expires_at = entry
+        if cached_version != paper_version or expires_at <= self._clock():
+            return None
+
+        self._entries.move_to_end(paper_id)
+        return cache_name
+
+    def should_create(self, paper_id: int, paper_version: str, context_token_count: int) -> bool:
+        """質問回数を記録し、キャッシュを作成すべきか判定"""
+        if not self.enabled or context_token_count < self.min_tokens:
+            return False
+
+        question_key = (paper_id, paper_version)
+        if question_key in self._failed_papers:
+            return False
+        question_count, expires_at = self._question_counts.get(question_key, (0, 0.0))
+        if expires_at <= self._clock():
+            question_count = 0
+        self._question_counts[question_key] = (question_count + 1, self._clock() + self.ttl_seconds)
+        self._question_counts.move_to_end(question_key)
+        while len(self._question_counts) > self.max_entries * 10:
+            self._question_counts.popitem(last=False)
+
+        return question_count + 1 >= self.min_questions
+
+    def get_creation_lock(self, paper_id: int) -> asyncio.Lock:
+        """同じ論文のキャッシュを並行して重複作成しないためのロックを取得 (別の論文とロックを共有することがある)"""
+        return self._creation_locks[paper_id % CREATION_LOCK_POOL_SIZE]
+
+    def set(self, paper_id: int, paper_version: str, cache_name: str) -> List[str]:
+        """作成したキャッシュを登録し、置き換え・上限超過で不要になったキャッシュ名を返す"""
+        stale_cache_names = self.invalidate_paper(paper_id)
+        self._entries[paper_id] = (paper_version, cache_name, self._clock() + self.ttl_seconds - EXPIRY_MARGIN_SECONDS)
+        self.created_count += 1
+        self.failure_streak = 0
+
+        while len(self._entries) > self.max_entries:
+            _, (_, evicted_cache_name, _) = self._entries.popitem(last=False)
+            stale_cache_names.append(evicted_cache_name)
+        return stale_cache_names
+
+    def invalidate_paper(self, paper_id: int) -> List[str]:
+        """論文のキャッシュ登録を破棄し、Gemini側で削除すべきキャッシュ名を返す"""
+        entry = self._entries.pop(paper_id, None)
+        return [entry[1]] if entry is not None else []
+
+    def record_creation_failure(self, paper_id: int, paper_version: str, error: Exception) -> None:
+        """作成失敗を記録し、非対応を示す失敗が別の論文で連続した場合はモデルが非対応とみなして以降のキャッシュ作成を止める"""
+        self.creation_failure_count += 1
+        if getattr(error, "code", None) not in UNSUPPORTED_STATUS_CODES:
+            return
+        self._failed_papers[(paper_id, paper_version)] = None
+        while len(self._failed_papers) > self.max_entries * 10:
+            self._failed_papers.popitem(last=False)
+        self.failure_streak += 1
+        if self.failure_streak >= self.max_failures:
+            self.enabled = False
+
+    def record_request(self, prompt_token_count: int, input_tokens_saved: int, used_cache: bool) -> None:
+        """Gemini APIへの質問1回分の入力トークン数を記録"""
+        self.request_count            += 1
+        self.cached_request_count     += 1 if used_cache else 0
+        self.prompt_token_total       += prompt_token_count
+        self.input_tokens_saved_total += input_tokens_saved
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュ利用率・削減できた入力トークン数などの統計情報を取得"""
+        return {
+            "enabled"            : self.enabled,
+            "entries"            : len(self._entries),
+            "min_tokens"         : self.min_tokens,
+            "requests"           : self.request_count,
+            "cached_requests"    : self.cached_request_count,
+            "created"            : self.created_count,
+            "creation_failures"  : self.creation_failure_count,
+            "prompt_tokens"      : self.prompt_token_total,
+            "input_tokens_saved" : self.input_tokens_saved_total,
+        }
@@ -1,79 +1,383 @@
 import google.genai as genai
+import hashlib
+import json
+import logging
 import os
-from typing import Dict, Any
+from google.genai import types
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from database.paper_context import build_paper_context, estimate_token_count
 from models.database_models import Paper
-from fastapi import UploadFile
+from services.gemini_call_limiter import GeminiCallLimiter
+from services.gemini_context_cache import GeminiContextCache
+from services.metrics import measure_stage, record_llm_tokens
+from services.paper_chunk_retriever import RetrievedChunk
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 class GeminiService:
     """Gemini API連携サービス"""
 
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY環境変数が設定されていません")
-        
-        self.client = genai.Client(api_key=api_key)
-        self.model_name = 'gemini-2.0-flash-exp'
+    def __init__(
+        self,
+        client        = None,
+        call_limiter  : Optional[GeminiCallLimiter]  = None,
+        context_cache : Optional[GeminiContextCache] = None
+    ):
+        # テスト・ベンチマークではローカルのフェイククライアントを注入できる
+        if client is None:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY環境変数が設定されていません")
+            client = genai.Client(api_key=api_key)
+
+        self.client        = client
+        self.call_limiter  = call_limiter or GeminiCallLimiter()
+        self.context_cache = context_cache or GeminiContextCache()
+        self.model_name    = 'gemini-2.0-flash-exp'
 
-    async def generate_paper_summary(self, pdf_file: UploadFile) -> Dict[str, Any]:
+    async def generate_paper_summary(self, pdf_file_path: str) -> Dict[str, Any]:
         """PDFファイルから各項目の要約を生成"""
         try:
-            # ファイル内容を読み込み
-            content = await pdf_file.read()
-            await pdf_file.seek(0)  # ポインタを先頭に戻す
-            
-            # 一時ファイルとして保存してアップロード
-            import tempfile
-            import os
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(content)
-                temp_file_path = temp_file.name
+            # PDFファイルをアップロード
+            with measure_stage("gemini", "upload_file"):
+                uploaded_file = await self.call_limiter.call(
+                    lambda: self.client.aio.files.upload(file=pdf_file_path)
+                )
             
             try:
-                # PDFファイルをアップロード
-                uploaded_file = self.client.files.upload(file=temp_file_path)
-                
                 prompt = self._create_summarization_prompt()
                 
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=[prompt, uploaded_file]
-                )
-                
-                # ファイルを削除（Geminiサーバーから）
-                self.client.files.delete(name=uploaded_file.name)
-                
-                return self._parse_summary_response(response.text)
+                with measure_stage("gemini", "generate_summary"):
+                    response = await self.call_limiter.call(
+                        lambda: self.client.aio.models.generate_content(
+                            model=self.model_name,
+                            contents=[prompt, uploaded_file]
+                        )
+                    )
             finally:
-                # 一時ファイルを削除
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+                # ファイルを削除（Geminiサーバーから）
+                await self._delete_uploaded_file(uploaded_file.name)
+            
+            usage_metadata = getattr(response, "usage_metadata", None)
+            record_llm_tokens(
+                "generate_summary",
+                getattr(usage_metadata, "prompt_token_count", None) or 0,
+                output_tokens=getattr(usage_metadata, "candidates_token_count", None) or 0
+            )
+            with measure_stage("gemini", "parse_summary"):
+                summary_data = self._parse_summary_response(response.text)
+            # 再要約の対象を判定できるよう、要約に使ったプロンプトのバージョン・モデルを保存する
+            summary_data['summary_prompt_version'] = self._get_prompt_version(prompt)
+            summary_data['summary_model']          = self.model_name
+            return summary_data
                     
         except Exception as e:
             raise Exception(f"Gemini API要約生成エラー: {str(e)}")
 
-    async def answer_question_about_paper(self, paper: Paper, question: str) -> str:
-        """論文に関する質問に回答"""
+    async def _delete_uploaded_file(self, file_name: str) -> None:
+        """アップロードしたファイルをGemini側から削除 (失敗しても要約の結果・エラーを優先し、ファイルは保存期限で消える)"""
         try:
-            # 要約データを使用して質問に回答
-            context = self._create_paper_context(paper)
-            prompt = self._create_qa_prompt(context, question)
-            
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[prompt]
+            with measure_stage("gemini", "delete_file"):
+                await self.call_limiter.call(
+                    lambda: self.client.aio.files.delete(name=file_name)
+                )
+        except Exception:
+            logger.exception("アップロードファイル削除エラー (%s)", file_name)
+
+    @property
+    def summary_prompt_version(self) -> str:
+        """現在の要約プロンプトのバージョン (プロンプトを変更すると既存の論文が再要約の対象になる)"""
+        return self._get_prompt_version(self._create_summarization_prompt())
+
+    async def invalidate_context_cache(self, paper_id: int) -> None:
+        """論文のコンテキストキャッシュを破棄し、Gemini側のキャッシュも削除 (要約の更新時に呼ぶ)"""
+        await self._delete_context_caches(self.context_cache.invalidate_paper(paper_id))
+
+    async def answer_question_about_paper(
+        self,
+        paper       : Paper,
+        question    : str,
+        token_usage : Optional[Dict[str, int]]       = None,
+        chunks      : Optional[List[RetrievedChunk]] = None,
+        body_chunks : Optional[List[RetrievedChunk]] = None
+    ) -> str:
+        """論文に関する質問に回答 (chunksを渡すと本文の抜粋も根拠にし、token_usageには入力トークン数などを格納)
+
+        body_chunksには本文の先頭を渡す。コンテキストキャッシュを作成する場合は要約のコンテキストと合わせてキャッシュする
+        """
+        try:
+            # 取り込み時に作成したコンテキストを使用する (未作成の場合のみここで作成)
+            context, context_token_count, trimmed_token_count = self._get_paper_context(paper)
+            cached_content_name, cached_context_token_count = await self._get_context_cache(
+                paper, context, context_token_count, body_chunks
+            )
+
+            question_prompt = self._create_qa_question_prompt(question, chunks)
+            # キャッシュした本文の先頭と重なる抜粋は送り直さない
+            cached_question_prompt = self._create_qa_question_prompt(question, self._exclude_cached_chunks(chunks, body_chunks))
+            with measure_stage("gemini", "answer_question"):
+                response, used_cache = await self._generate_answer(
+                    paper, context, question_prompt, cached_question_prompt, cached_content_name,
+                    lambda contents, config: self.client.aio.models.generate_content(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    )
+                )
+
+            self._record_token_usage(
+                "answer_question", response, cached_question_prompt if used_cache else question_prompt,
+                context_token_count, cached_context_token_count, trimmed_token_count, used_cache, token_usage
             )
-            
             return response.text.strip()
                 
         except Exception as e:
             raise Exception(f"Gemini API質問回答エラー: {str(e)}")
 
+    async def stream_answer_question_about_paper(
+        self,
+        paper       : Paper,
+        question    : str,
+        token_usage : Optional[Dict[str, int]]       = None,
+        chunks      : Optional[List[RetrievedChunk]] = None,
+        body_chunks : Optional[List[RetrievedChunk]] = None
+    ) -> AsyncIterator[str]:
+        """論文に関する質問への回答を生成された順に返す (token_usageには生成完了時に格納)"""
+        try:
+            context, context_token_count, trimmed_token_count = self._get_paper_context(paper)
+            cached_content_name, cached_context_token_count = await self._get_context_cache(
+                paper, context, context_token_count, body_chunks
+            )
+
+            question_prompt = self._create_qa_question_prompt(question, chunks)
+            cached_question_prompt = self._create_qa_question_prompt(question, self._exclude_cached_chunks(chunks, body_chunks))
+            # ストリーミングでは最初のチャンクを受信するまでの待ち時間を計測する
+            with measure_stage("gemini", "stream_first_chunk"):
+                (response_stream, response_chunk), used_cache = await self._generate_answer(
+                    paper, context, question_prompt, cached_question_prompt, cached_content_name,
+                    self._open_answer_stream
+                )
+        except Exception as e:
+            raise Exception(f"Gemini API質問回答エラー: {str(e)}")
+
+        last_response_chunk = None
+        try:
+            while response_chunk is not None:
+                last_response_chunk = response_chunk
+                if response_chunk.text:
+                    yield response_chunk.text
+                response_chunk = await anext(response_stream, None)
+        except Exception as e:
+            raise Exception(f"Gemini API質問回答エラー: {str(e)}")
+        finally:
+            # クライアントの切断でキャンセルされた場合も上流のストリームを閉じ、生成を打ち切る
+            await response_stream.aclose()
+
+        # 使用量はストリームの最後のチャンクに含まれる
+        self._record_token_usage(
+            "stream_answer", last_response_chunk, cached_question_prompt if used_cache else question_prompt,
+            context_token_count, cached_context_token_count, trimmed_token_count, used_cache, token_usage
+        )
+
+    async def answer_questions_about_paper(
+        self,
+        paper       : Paper,
+        questions   : List[str],
+        token_usage : Optional[Dict[str, int]]       = None,
+        chunks      : Optional[List[RetrievedChunk]] = None,
+        body_chunks : Optional[List[RetrievedChunk]] = None
+    ) -> List[str]:
+        """同じ論文への複数の質問に1回の呼び出しでまとめて回答 (質問と同じ順序で返す)"""
+        try:
+            context, context_token_count, trimmed_token_count = self._get_paper_context(paper)
+            cached_content_name, cached_context_token_count = await self._get_context_cache(
+                paper, context, context_token_count, body_chunks
+            )
+
+            question_prompt = self._create_grouped_qa_question_prompt(questions, chunks)
+            cached_question_prompt = self._create_grouped_qa_question_prompt(
+                questions, self._exclude_cached_chunks(chunks, body_chunks)
+            )
+            with measure_stage("gemini", "answer_questions"):
+                response, used_cache = await self._generate_answer(
+                    paper, context, question_prompt, cached_question_prompt, cached_content_name,
+                    lambda contents, config: self.client.aio.models.generate_content(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    ),
+                    # 回答を質問ごとに取り出せるよう、文字列のJSON配列で出力させる
+                    {
+                        "response_mime_type" : "application/json",
+                        "response_schema"    : types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+                    }
+                )
+
+            answers = json.loads(response.text)
+            if not isinstance(answers, list) or len(answers) != len(questions):
+                raise ValueError(f"回答数が質問数と一致しません (質問: {len(questions)}件)")
+
+            self._record_token_usage(
+                "answer_questions", response, cached_question_prompt if used_cache else question_prompt,
+                context_token_count, cached_context_token_count, trimmed_token_count, used_cache, token_usage
+            )
+            return [str(answer).strip() for answer in answers]
+
+        except Exception as e:
+            raise Exception(f"Gemini API一括質問回答エラー: {str(e)}")
+
+    async def _open_answer_stream(self, contents: List[Any], config: Optional[types.GenerateContentConfig]):
+        """ストリーミング生成を開始して最初のチャンクまで受信 (接続・レート制限のエラーをリトライ対象にする)"""
+        response_stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=contents,
+            config=config
+        )
+        try:
+            return response_stream, await anext(response_stream, None)
+        except BaseException:
+            await response_stream.aclose()
+            raise
+
+    async def _generate_answer(
+        self,
+        paper                  : Paper,
+        context                : str,
+        question_prompt        : str,
+        cached_question_prompt : str,
+        cached_content_name    : Optional[str],
+        generate               : Callable[[List[Any], Optional[types.GenerateContentConfig]], Awaitable[Any]],
+        config_options         : Optional[Dict[str, Any]] = None
+    ) -> Tuple[Any, bool]:
+        """キャッシュがあれば質問部分 (cached_question_prompt) のみ、なければプロンプト全体でgenerateを呼び出し、結果とキャッシュ利用有無を返す"""
+        config_options = config_options or {}
+        if cached_content_name is not None:
+            try:
+                return await self.call_limiter.call(
+                    lambda: generate(
+                        [cached_question_prompt],
+                        types.GenerateContentConfig(cached_content=cached_content_name, **config_options)
+                    )
+                ), True
+            except Exception:
+                # キャッシュがGemini側で削除・失効していた場合はコンテキストを送り直す
+                logger.exception("コンテキストキャッシュ利用エラー (paper_id=%d)", paper.paper_id)
+                await self._delete_context_caches(self.context_cache.invalidate_paper(paper.paper_id))
+
+        prompt = self._create_qa_context_prompt(context) + question_prompt
+        config = types.GenerateContentConfig(**config_options) if config_options else None
+        return await self.call_limiter.call(lambda: generate([prompt], config)), False
+
+    def _get_paper_context(self, paper: Paper) -> Tuple[str, int, int]:
+        """論文の質問回答用コンテキストと概算トークン数・予算で切り詰めたトークン数を取得"""
+        if paper.qa_context:
+            return paper.qa_context, paper.qa_context_token_count or 0, paper.qa_context_trimmed_token_count or 0
+
+        paper_context = build_paper_context(paper)
+        return paper_context.text, paper_context.token_count, paper_context.trimmed_token_count
+
+    async def _get_context_cache(
+        self,
+        paper               : Paper,
+        context             : str,
+        context_token_count : int,
+        body_chunks         : Optional[List[RetrievedChunk]]
+    ) -> Tuple[Optional[str], int]:
+        """論文コンテキスト・本文の先頭のGeminiコンテキストキャッシュ名と、キャッシュする概算トークン数を取得 (条件を満たせば作成)"""
+        # 本文の先頭は論文バージョンごとに同じため、作成済みのキャッシュにも同じチャンクが含まれる
+        cached_context_token_count = context_token_count + sum(
+            estimate_token_count(body_chunk.content) for body_chunk in body_chunks or []
+        )
+        paper_version = paper.updated_at.isoformat() if paper.updated_at else ""
+        cached_content_name = self.context_cache.get(paper.paper_id, paper_version)
+        if cached_content_name is not None:
+            return cached_content_name, cached_context_token_count
+        if not self.context_cache.should_create(paper.paper_id, paper_version, cached_context_token_count):
+            return None, cached_context_token_count
+
+        async with self.context_cache.get_creation_lock(paper.paper_id):
+            # ロック待ちの間に他の質問が作成済みであればそれを使う
+            cached_content_name = self.context_cache.get(paper.paper_id, paper_version)
+            if cached_content_name is not None:
+                return cached_content_name, cached_context_token_count
+
+            try:
+                with measure_stage("gemini", "create_context_cache"):
+                    cached_content = await self.call_limiter.call(
+                        lambda: self.client.aio.caches.create(
+                            model=self.model_name,
+                            config=types.CreateCachedContentConfig(
+                                display_name=f"paper-{paper.paper_id}",
+                                contents=[self._create_qa_context_prompt(context, body_chunks)],
+                                ttl=f"{int(self.context_cache.ttl_seconds)}s"
+                            )
+                        )
+                    )
+            except Exception as e:
+                # キャッシュを使えなくても、コンテキストを毎回送信して回答は続ける
+                self.context_cache.record_creation_failure(paper.paper_id, paper_version, e)
+                logger.exception("コンテキストキャッシュ作成エラー (paper_id=%d)", paper.paper_id)
+                return None, cached_context_token_count
+
+            await self._delete_context_caches(
+                self.context_cache.set(paper.paper_id, paper_version, cached_content.name)
+            )
+            return cached_content.name, cached_context_token_count
+
+    async def _delete_context_caches(self, cache_names: List[str]) -> None:
+        """不要になったコンテキストキャッシュをGemini側から削除 (失敗しても有効期限で消える)"""
+        for cache_name in cache_names:
+            try:
+                await self.call_limiter.call(lambda: self.client.aio.caches.delete(name=cache_name))
+            except Exception:
+                logger.exception("コンテキストキャッシュ削除エラー (%s)", cache_name)
+
+    def _record_token_usage(
+        self,
+        operation                  : str,
+        response,
+        question_prompt            : str,
+        context_token_count        : int,
+        cached_context_token_count : int,
+        trimmed_token_count        : int,
+        used_cache                 : bool,
+        token_usage                : Optional[Dict[str, int]]
+    ) -> None:
+        """入力トークン数と、コンテキストキャッシュ・予算による切り詰めで削減できたトークン数を記録"""
+        usage_metadata = getattr(response, "usage_metadata", None)
+        prompt_token_count = getattr(usage_metadata, "prompt_token_count", None)
+        cached_token_count = getattr(usage_metadata, "cached_content_token_count", None)
+
+        # usage_metadataを返さないクライアント (フェイクなど) では概算値を使う (Geminiと同じくキャッシュ分も含める)
+        if prompt_token_count is None:
+            prompt_token_count = estimate_token_count(question_prompt) + (
+                cached_context_token_count if used_cache else context_token_count
+            )
+        if cached_token_count is None:
+            cached_token_count = cached_context_token_count if used_cache else 0
+
+        input_tokens_saved = cached_token_count + trimmed_token_count
+        self.context_cache.record_request(prompt_token_count, input_tokens_saved, used_cache)
+        record_llm_tokens(
+            operation, prompt_token_count, cached_token_count,
+            getattr(usage_metadata, "candidates_token_count", None) or 0
+        )
+        if token_usage is not None:
+            token_usage.update({
+                "prompt_tokens"      : prompt_token_count,
+                "cached_tokens"      : cached_token_count,
+                "trimmed_tokens"     : trimmed_token_count,
+                "input_tokens_saved" : input_tokens_saved,
+            })
+
+    def _get_prompt_version(self, prompt: str) -> str:
+        """プロンプト本文のハッシュをバージョンとする"""
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
     def _create_summarization_prompt(self) -> str:
         """要約生成用プロンプト作成"""
         return """
@@ -95,40 +399,81 @@ class GeminiService:
 図表やグラフがある場合は、その内容も考慮して要約に反映させてください。
 """
 
-    def _create_paper_context(self, paper: Paper) -> str:
-        """論文コンテキスト作成"""
-        context_parts = [
-            f"タイトル: {paper.title}",
-            f"著者: {paper.authors or '不明'}",
-            f"アブストラクト: {paper.abstract or '不明'}",
-            f"研究背景・目的: {paper.summary_introduction or '不明'}",
-            f"研究手法: {paper.summary_methods or '不明'}",
-            f"結果: {paper.summary_results or '不明'}",
-            f"考察: {paper.summary_discussion or '不明'}",
-            f"結論: {paper.summary_conclusion or '不明'}",
-            f"キーワード: {', '.join(paper.keywords) if paper.keywords else '不明'}"
-        ]
-        return "\n\n".join(context_parts)
-
-
-    def _create_qa_prompt(self, context: str, question: str) -> str:
-        """質問回答用プロンプト作成"""
+    def _create_qa_context_prompt(self, context: str, body_chunks: Optional[List[RetrievedChunk]] = None) -> str:
+        """質問回答用プロンプトのうち論文ごとに共通の部分 (コンテキストキャッシュに保存する)"""
         return f"""
 以下は学術論文の要約情報です。この論文について質問に答えてください。
 
 論文情報:
 {context}
+{self._create_qa_body_prompt(body_chunks)}"""
 
+    def _create_qa_body_prompt(self, body_chunks: Optional[List[RetrievedChunk]]) -> str:
+        """コンテキストキャッシュに含める論文本文の先頭 (本文がない場合は空文字列)"""
+        if not body_chunks:
+            return ""
+        body = "\n\n".join(f"[p.{body_chunk.page_number}] {body_chunk.content}" for body_chunk in body_chunks)
+        return f"""
+以下は論文本文の先頭部分です ([p.N]はページ番号)。要約にない詳細はこの本文も根拠にしてください。
+
+論文本文:
+{body}
+"""
+
+    def _exclude_cached_chunks(
+        self,
+        chunks      : Optional[List[RetrievedChunk]],
+        body_chunks : Optional[List[RetrievedChunk]]
+    ) -> Optional[List[RetrievedChunk]]:
+        """本文の抜粋から、コンテキストキャッシュに全文が含まれるチャンクを除く"""
+        if not chunks or not body_chunks:
+            return chunks
+        cached_contents = {body_chunk.chunk_index: body_chunk.content for body_chunk in body_chunks}
+        return [chunk for chunk in chunks if cached_contents.get(chunk.chunk_index) != chunk.content]
+
+    def _create_qa_question_prompt(self, question: str, chunks: Optional[List[RetrievedChunk]] = None) -> str:
+        """質問回答用プロンプトのうち質問ごとに異なる部分 (本文の抜粋は質問ごとに異なるためこちらに含める)"""
+        return f"""{self._create_qa_excerpt_prompt(chunks)}
 質問: {question}
+{self._create_qa_answer_guidelines()}
+回答:
+"""
+
+    def _create_grouped_qa_question_prompt(self, questions: List[str], chunks: Optional[List[RetrievedChunk]] = None) -> str:
+        """複数の質問にまとめて回答させるプロンプトの質問部分"""
+        numbered_questions = "\n".join(
+            f"{question_number}. {question}" for question_number, question in enumerate(questions, start=1)
+        )
+        return f"""{self._create_qa_excerpt_prompt(chunks)}
+質問:
+{numbered_questions}
+{self._create_qa_answer_guidelines()}
+各質問への回答を、質問と同じ順序・同じ件数の文字列のJSON配列で出力してください。
 
+回答:
+"""
+
+    def _create_qa_excerpt_prompt(self, chunks: Optional[List[RetrievedChunk]]) -> str:
+        """質問に関連する論文本文の抜粋 (抜粋がない場合は空文字列)"""
+        if not chunks:
+            return ""
+        excerpts = "\n\n".join(f"[p.{chunk.page_number}] {chunk.content}" for chunk in chunks)
+        return f"""
+以下は質問に関連する論文本文の抜粋です ([p.N]はページ番号)。要約にない詳細はこの抜粋を根拠にしてください。
+
+本文の抜粋:
+{excerpts}
+"""
+
+    def _create_qa_answer_guidelines(self) -> str:
+        """質問回答の注意事項"""
+        return """
 回答は以下の点に注意してください:
 1. 論文の内容に基づいて正確に回答する
 2. 不明な点は「この論文からは判断できません」と明記する
 3. 専門用語は適切に説明を加える
 4. 日本語で分かりやすく回答する
 5. 根拠となる論文の部分を示す
-
-回答:
 """
 
     def _parse_summary_response(self, response_text: str) -> Dict[str, Any]:
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.sql import func
+from database.connection import AsyncSessionLocal
+from models.database_models import IngestionJob, Paper, PaperChunk
+from services.gemini_service import GeminiService
+from services.metrics import measure_stage
+from services.paper_chunker import PaperChunker
+from services.paper_embedding_indexer import PaperEmbeddingIndexer
+from services.pdf_processor import PDFProcessor
+from services.pdf_store import PDFStore
+from services.upload_spooler import UploadSpooler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+JOB_STATUS_PENDING     = "pending"
+JOB_STATUS_SUMMARIZING = "summarizing"
+JOB_STATUS_SAVING      = "saving"
+JOB_STATUS_COMPLETED   = "completed"
+JOB_STATUS_FAILED      = "failed"
+
+IN_PROGRESS_JOB_STATUSES = [JOB_STATUS_SUMMARIZING, JOB_STATUS_SAVING]
+
+
+class IngestionQueue:
+    """論文取り込みジョブの永続キューとワーカープール"""
+
+    def __init__(
+        self,
+        gemini_service          : GeminiService,
+        pdf_processor           : PDFProcessor,
+        session_factory         : async_sessionmaker              = AsyncSessionLocal,
+        worker_count            : Optional[int]                   = None,
+        poll_interval_seconds   : Optional[float]                 = None,
+        upload_directory        : Optional[str]                   = None,
+        upload_spooler          : Optional[UploadSpooler]         = None,
+        paper_embedding_indexer : Optional[PaperEmbeddingIndexer] = None,
+        paper_chunker           : Optional[PaperChunker]          = None,
+        pdf_store               : Optional[PDFStore]              = None,
+        lease_seconds           : Optional[float]                 = None
+    ):
+        self.gemini_service          = gemini_service
+        self.pdf_processor           = pdf_processor
+        self.session_factory         = session_factory
+        self.worker_count            = worker_count or int(os.getenv("INGESTION_WORKER_COUNT", "4"))
+        self.poll_interval_seconds   = poll_interval_seconds or float(os.getenv("INGESTION_POLL_INTERVAL_SECONDS", "2.0"))
+        self.upload_directory        = upload_directory or os.getenv("UPLOAD_DIRECTORY", "uploads")
+        self.upload_spooler          = upload_spooler or UploadSpooler()
+        self.paper_embedding_indexer = paper_embedding_indexer
+        self.paper_chunker           = paper_chunker or PaperChunker()
+        self.pdf_store               = pdf_store or PDFStore()
+        # 処理中のジョブのリース期間 (この間heartbeat_atが更新されないジョブは、処理したプロセスが停止したとみなして再実行する)
+        self.lease_seconds           = lease_seconds or float(os.getenv("INGESTION_LEASE_SECONDS", "300"))
+
+        self._job_available = asyncio.Event()
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """ワーカーを起動 (中断されたジョブはリースの期限切れ後に再実行される)"""
+        os.makedirs(self.upload_directory, exist_ok=True)
+
+        self._worker_tasks = [
+            asyncio.create_task(self._run_worker()) for _ in range(self.worker_count)
+        ]
+        self._job_available.set()
+
+    async def stop(self) -> None:
+        """ワーカーを停止 (処理中のジョブはリースの期限切れ後に再実行される)"""
+        for worker_task in self._worker_tasks:
+            worker_task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def enqueue_upload(self, file: UploadFile, db: AsyncSession) -> IngestionJob:
+        """アップロードされたPDFを保存し、取り込みジョブを登録"""
+        job_id          = str(uuid.uuid4())
+        spool_file_path = os.path.join(self.upload_directory, f"{job_id}.pdf")
+        # 書き込みと同時にハッシュを計算する
+        with measure_stage("ingestion", "spool_and_hash"):
+            spooled_upload = await asyncio.to_thread(self.upload_spooler.spool, file, spool_file_path)
+        file_hash       = spooled_upload.file_hash
+
+        # 取り込み済みの論文はGemini APIを呼ばずに完了済みジョブとして返す
+        existing_paper_id = await db.scalar(
+            select(Paper.paper_id).where(Paper.file_hash == file_hash)
+        )
+        if existing_paper_id is not None:
+            # PDFの保存領域の導入前に取り込んだ論文は、再アップロードされたPDFを保存して再要約できるようにする
+            await self._store_pdf(spool_file_path, file_hash)
+            job = IngestionJob(
+                job_id            = job_id,
+                status            = JOB_STATUS_COMPLETED,
+                progress_message  = "取り込み済みの論文",
+                original_filename = file.filename,
+                spool_file_path   = spool_file_path,
+                file_hash         = file_hash,
+                file_size         = spooled_upload.file_size,
+                paper_id          = existing_paper_id,
+                finished_at       = func.current_timestamp()
+            )
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+            return job
+
+        # 同じファイルを処理中のジョブがあれば、そのジョブに集約する
+        active_job = await self._find_active_job(file_hash, db)
+        if active_job is not None:
+            await asyncio.to_thread(self.upload_spooler.remove, spool_file_path)
+            return active_job
+
+        job = IngestionJob(
+            job_id            = job_id,
+            status            = JOB_STATUS_PENDING,
+            progress_message  = "要約待ち",
+            original_filename = file.filename,
+            spool_file_path   = spool_file_path,
+            file_hash         = file_hash,
+            file_size         = spooled_upload.file_size
+        )
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # 同時に登録された同一ファイルのジョブに集約する
+            await db.rollback()
+            await asyncio.to_thread(self.upload_spooler.remove, spool_file_path)
+            active_job = await self._find_active_job(file_hash, db)
+            if active_job is None:
+                raise
+            return active_job
+
+        self._job_available.set()
+        return job
+
+    async def get_job(self, job_id: str, db: AsyncSession) -> Optional[IngestionJob]:
+        """ジョブを取得"""
+        return await db.get(IngestionJob, job_id)
+
+    async def _find_active_job(self, file_hash: str, db: AsyncSession) -> Optional[IngestionJob]:
+        """同じファイルの待機中・処理中ジョブを取得"""
+        return await db.scalar(
+            select(IngestionJob).where(
+                IngestionJob.file_hash == file_hash,
+                IngestionJob.status.in_([JOB_STATUS_PENDING] + IN_PROGRESS_JOB_STATUSES)
+            )
+        )
+
+    async def _run_worker(self) -> None:
+        """ジョブを取り出して処理し続ける"""
+        while True:
+            job_id = await self._claim_next_job()
+            if job_id is None:
+                self._job_available.clear()
+                try:
+                    await asyncio.wait_for(self._job_available.wait(), timeout=self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # 状態を更新できなかったジョブはリースの期限切れ後に再実行される
+                logger.exception("取り込みジョブの処理エラー (job_id=%s)", job_id)
+                continue
+
+    async def _claim_next_job(self) -> Optional[str]:
+        """待機中またはリースの期限が切れたジョブを1件確保 (他のワーカーと競合した場合はNone)"""
+        claimable_condition = self._build_claimable_condition()
+        async with self.session_factory() as db:
+            job_id = await db.scalar(
+                select(IngestionJob.job_id)
+                .where(claimable_condition)
+                .order_by(IngestionJob.created_at)
+                .limit(1)
+            )
+            if job_id is None:
+                return None
+
+            claim_result = await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.job_id == job_id, claimable_condition)
+                .values(
+                    status           = JOB_STATUS_SUMMARIZING,
+                    progress_message = "Gemini APIで要約中",
+                    attempt_count    = IngestionJob.attempt_count + 1,
+                    heartbeat_at     = func.current_timestamp()
+                )
+            )
+            await db.commit()
+
+            # 他のワーカーが先に確保した場合は次のジョブを探させる
+            if claim_result.rowcount != 1:
+                self._job_available.set()
+                return None
+            return job_id
+
+    def _build_claimable_condition(self):
+        """確保できるジョブの条件 (待機中、またはリースを更新していたプロセスが停止した処理中のジョブ)"""
+        lease_cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.lease_seconds)
+        return or_(
+            IngestionJob.status == JOB_STATUS_PENDING,
+            and_(
+                IngestionJob.status.in_(IN_PROGRESS_JOB_STATUSES),
+                or_(IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < lease_cutoff)
+            )
+        )
+
+    async def _renew_lease(self, job_id: str) -> None:
+        """処理中のジョブのリースを定期的に更新 (ジョブの処理が終わるまで続ける)"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(
+                        update(IngestionJob)
+                        .where(IngestionJob.job_id == job_id, IngestionJob.status.in_(IN_PROGRESS_JOB_STATUSES))
+                        .values(heartbeat_at=func.current_timestamp())
+                    )
+                    await db.commit()
+            except Exception:
+                # 次回の更新で再試行する (期限までに更新できなければ他のワーカーが再実行する)
+                logger.exception("取り込みジョブのリース更新エラー (job_id=%s)", job_id)
+
+    async def _process_job(self, job_id: str) -> None:
+        """ジョブを実行 (要約生成・本文のチャンク分割 → データベース保存)"""
+        lease_task = asyncio.create_task(self._renew_lease(job_id))
+        try:
+            await self._run_job(job_id)
+        finally:
+            # リースの更新中に中断した場合も、セッションを閉じてから戻る
+            lease_task.cancel()
+            await asyncio.gather(lease_task, return_exceptions=True)
+
+    async def _run_job(self, job_id: str) -> None:
+        """要約生成・本文のチャンク分割 → データベース保存 (失敗した場合はジョブを失敗にする)"""
+        # Gemini APIの応答待ちの間はコネクションを保持しないよう、ジョブの読み取りと保存でセッションを分ける
+        async with self.session_factory() as db:
+            job = await db.get(IngestionJob, job_id)
+            spool_file_path   = job.spool_file_path
+            original_filename = job.original_filename
+            file_hash         = job.file_hash
+            file_size         = job.file_size
+
+        try:
+            # 本文の抽出はローカルで行うため、Gemini APIの応答待ちと並行して実行する
+            summary_data, chunks = await asyncio.gather(
+                self.gemini_service.generate_paper_summary(spool_file_path),
+                self._extract_chunks(spool_file_path)
+            )
+
+            async with self.session_factory() as db:
+                job = await db.get(IngestionJob, job_id)
+                await self._update_job(db, job, JOB_STATUS_SAVING, "データベースに保存中")
+                # 保存後・完了前に中断されると再起動時に再要約され、重複エラーになるため、完了は論文と同じトランザクションで更新する
+                paper = await self.pdf_processor.save_paper_to_database(
+                    original_filename, file_hash, file_size, summary_data, db, chunks,
+                    before_commit=lambda paper: self._mark_job_completed(job, paper)
+                )
+
+            await self._store_pdf(spool_file_path, file_hash)
+            await self._index_paper(paper)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            async with self.session_factory() as db:
+                job = await db.get(IngestionJob, job_id)
+                job.error_message = str(e)
+                job.finished_at   = func.current_timestamp()
+                await self._update_job(db, job, JOB_STATUS_FAILED, "失敗")
+            await asyncio.to_thread(self.upload_spooler.remove, spool_file_path)
+
+    def _mark_job_completed(self, job: IngestionJob, paper: Paper) -> None:
+        """ジョブを完了にする (コミットは論文の保存と同時に行う)"""
+        job.paper_id         = paper.paper_id
+        job.status           = JOB_STATUS_COMPLETED
+        job.progress_message = "完了"
+        job.finished_at      = func.current_timestamp()
+
+    async def _extract_chunks(self, spool_file_path: str) -> List[PaperChunk]:
+        """PDF本文をチャンクに分割 (スキャン画像のPDFなどで抽出できない場合は要約のみで取り込む)"""
+        try:
+            with measure_stage("ingestion", "extract_chunks"):
+                return await asyncio.to_thread(self.paper_chunker.extract_chunks, spool_file_path)
+        except Exception:
+            logger.exception("本文チャンク作成エラー (%s)", spool_file_path)
+            return []
+
+    async def _store_pdf(self, spool_file_path: str, file_hash: str) -> None:
+        """一時保存したPDFを再要約用の保存領域に移動 (失敗しても取り込みは完了扱い)"""
+        try:
+            await asyncio.to_thread(self.pdf_store.store, spool_file_path, file_hash, True)
+        except Exception:
+            # 保存できなかった論文は再要約の対象外になる (同じPDFを再アップロードすると保存される)
+            logger.exception("PDF保存エラー (%s)", spool_file_path)
+            await asyncio.to_thread(self.upload_spooler.remove, spool_file_path)
+
+    async def _index_paper(self, paper: Paper) -> None:
+        """セマンティック検索用の埋め込みを登録 (失敗しても取り込みは完了扱い)"""
+        if self.paper_embedding_indexer is None:
+            return
+        try:
+            with measure_stage("ingestion", "index_embedding"):
+                await self.paper_embedding_indexer.index_papers([paper])
+        except Exception:
+            # 登録できなかった論文は次回起動時のバックフィルで登録される
+            logger.exception("埋め込み登録エラー (paper_id=%d)", paper.paper_id)
+
+    async def _update_job(self, db: AsyncSession, job: IngestionJob, status: str, progress_message: str) -> None:
+        """ジョブの状態を更新"""
+        job.status           = status
+        job.progress_message = progress_message
+        await db.commit()
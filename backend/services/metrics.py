@@ -0,0 +1,236 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Tuple
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 処理段階の所要時間のバケット (Gemini APIの呼び出しは数十秒かかることがある)
+STAGE_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# SQLクエリの所要時間のバケット
+QUERY_DURATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# ラベルの種類が増えすぎないよう、これ以外のSQL文はOTHERにまとめる
+QUERY_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"}
+
+HTTP_REQUESTS = Counter(
+    "paper_app_http_requests_total",
+    "HTTPリクエスト数",
+    ["method", "route", "status_code"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "paper_app_http_request_duration_seconds",
+    "HTTPリクエストの所要時間 (ストリーミングはレスポンスの送信完了まで)",
+    ["method", "route"],
+    buckets=STAGE_DURATION_BUCKETS
+)
+STAGE_DURATION = Histogram(
+    "paper_app_stage_duration_seconds",
+    "サービス内の処理段階ごとの所要時間",
+    ["component", "stage"],
+    buckets=STAGE_DURATION_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "paper_app_stage_errors_total",
+    "例外で終了した処理段階の数",
+    ["component", "stage"]
+)
+DB_QUERY_DURATION = Histogram(
+    "paper_app_db_query_duration_seconds",
+    "SQLクエリの所要時間 (件数は_countで取得できる)",
+    ["engine", "operation"],
+    buckets=QUERY_DURATION_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "paper_app_llm_tokens_total",
+    "Gemini APIの入出力トークン数",
+    ["operation", "token_type"]
+)
+
+
+@dataclass
+class RequestMetrics:
+    """1リクエスト中に集計した値 (遅いリクエストのログに出力する)"""
+    db_query_count   : int              = 0
+    db_query_seconds : float            = 0.0
+    stage_seconds    : Dict[str, float] = field(default_factory=dict)
+
+
+# 処理中のリクエストの集計先 (リクエスト外のワーカーなどではNone)
+current_request_metrics: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "current_request_metrics", default=None
+)
+
+
+@contextmanager
+def measure_stage(component: str, stage: str) -> Iterator[None]:
+    """処理段階の所要時間をヒストグラムに記録 (リクエスト中は遅いリクエストのログにも含める)"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(component, stage).inc()
+        raise
+    finally:
+        _record_stage_seconds(component, stage, time.perf_counter() - started_at)
+
+
+def record_stage_timings(component: str, timings: Dict[str, float]) -> None:
+    """計測済みの所要時間 ("<段階名>_ms"形式のミリ秒) をヒストグラムに記録"""
+    for timing_name, elapsed_milliseconds in timings.items():
+        _record_stage_seconds(component, timing_name.removesuffix("_ms"), elapsed_milliseconds / 1000)
+
+
+def _record_stage_seconds(component: str, stage: str, elapsed_seconds: float) -> None:
+    """処理段階の所要時間をヒストグラムとリクエストの集計に加算"""
+    STAGE_DURATION.labels(component, stage).observe(elapsed_seconds)
+    request_metrics = current_request_metrics.get()
+    if request_metrics is not None:
+        stage_name = f"{component}.{stage}"
+        request_metrics.stage_seconds[stage_name] = request_metrics.stage_seconds.get(stage_name, 0.0) + elapsed_seconds
+
+
+def record_llm_tokens(operation: str, prompt_tokens: int, cached_tokens: int = 0, output_tokens: int = 0) -> None:
+    """Gemini API呼び出し1回分のトークン数を記録"""
+    LLM_TOKENS.labels(operation, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(operation, "cached").inc(cached_tokens)
+    LLM_TOKENS.labels(operation, "output").inc(output_tokens)
+
+
+def install_query_metrics(engine: Engine, engine_name: str) -> None:
+    """SQLクエリの件数・所要時間を記録するイベントを登録 (非同期エンジンはsync_engineを渡す)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(connection, cursor, statement, parameters, context, executemany):
+        # 失敗したクエリの開始時刻が残らないよう、ステートメントごとの実行コンテキストに保持する
+        if context is not None:
+            context.query_started_at = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(connection, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, "query_started_at", None)
+        if started_at is None:
+            return
+        elapsed_seconds = time.perf_counter() - started_at
+
+        statement_words = statement.split(None, 1)
+        operation = statement_words[0].upper() if statement_words else "OTHER"
+        if operation not in QUERY_OPERATIONS:
+            operation = "OTHER"
+        DB_QUERY_DURATION.labels(engine_name, operation).observe(elapsed_seconds)
+
+        request_metrics = current_request_metrics.get()
+        if request_metrics is not None:
+            request_metrics.db_query_count   += 1
+            request_metrics.db_query_seconds += elapsed_seconds
+
+
+class CacheStatsCollector:
+    """各キャッシュのget_stats()の数値をスクレイプ時に読み取るコレクター"""
+
+    def __init__(self, caches: Dict[str, Any]):
+        self.caches = caches
+
+    def collect(self):
+        cache_stat = GaugeMetricFamily(
+            "paper_app_cache_stat",
+            "キャッシュの統計情報 (GET /cache-statsと同じ値。累計値を含む)",
+            labels=["cache", "stat"]
+        )
+        for cache_name, cache in self.caches.items():
+            for stat_name, stat_value in cache.get_stats().items():
+                # boolはint扱いになるため0/1で出力される。数値以外は出力しない
+                if isinstance(stat_value, (int, float)):
+                    cache_stat.add_metric([cache_name, stat_name], float(stat_value))
+        yield cache_stat
+
+
+def register_cache_stats(caches: Dict[str, Any]) -> None:
+    """キャッシュの統計情報を/metricsに出力するよう登録"""
+    REGISTRY.register(CacheStatsCollector(caches))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheusのテキスト形式でメトリクスを出力 (本文, Content-Type)"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class RequestMetricsMiddleware:
+    """リクエスト数・所要時間を記録し、遅いリクエストの内訳をログに出力するASGIミドルウェア"""
+
+    def __init__(self, app, slow_request_threshold_ms: Optional[float] = None):
+        self.app = app
+        # 0の場合は遅いリクエストのログを出力しない
+        self.slow_request_threshold_ms = (
+            slow_request_threshold_ms if slow_request_threshold_ms is not None
+            else float(os.getenv("SLOW_REQUEST_LOG_THRESHOLD_MS", "0"))
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_metrics = RequestMetrics()
+        context_token   = current_request_metrics.set(request_metrics)
+        started_at      = time.perf_counter()
+        status_code     = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request_metrics.reset(context_token)
+            elapsed_seconds = time.perf_counter() - started_at
+            route = self._get_route_template(scope)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(scope["method"], route).observe(elapsed_seconds)
+
+            if 0 < self.slow_request_threshold_ms <= elapsed_seconds * 1000:
+                self._log_slow_request(scope, route, status_code, elapsed_seconds, request_metrics)
+
+    def _get_route_template(self, scope) -> str:
+        """ラベルに使うルートのパステンプレート (パスパラメータで種類が増えないようにする)"""
+        route = scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    def _log_slow_request(
+        self,
+        scope,
+        route           : str,
+        status_code     : int,
+        elapsed_seconds : float,
+        request_metrics : RequestMetrics
+    ) -> None:
+        """しきい値を超えたリクエストの処理段階・SQLクエリの内訳を1行のJSONで出力"""
+        slow_request = {
+            "method"         : scope["method"],
+            "path"           : scope["path"],
+            "route"          : route,
+            "status_code"    : status_code,
+            "duration_ms"    : round(elapsed_seconds * 1000, 1),
+            "db_query_count" : request_metrics.db_query_count,
+            "db_query_ms"    : round(request_metrics.db_query_seconds * 1000, 1),
+            "stages_ms"      : {
+                stage_name: round(stage_seconds * 1000, 1)
+                for stage_name, stage_seconds in request_metrics.stage_seconds.items()
+            },
+        }
+        logger.warning("遅いリクエスト: %s", json.dumps(slow_request, ensure_ascii=False))
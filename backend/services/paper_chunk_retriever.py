@@ -0,0 +1,190 @@
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import case, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.full_text_index import TRIGRAM_MINIMUM_TERM_LENGTH, paper_chunks_fts_table, quote_full_text_term
+from database.paper_context import estimate_token_count, truncate_to_token_budget
+from models.database_models import PaperChunk
+
+load_dotenv()
+
+# 質問から検索語として取り出す文字の並び (漢字・カタカナ・英数字の連続。助詞などのひらがなは区切りとして扱う)
+QUERY_TERM_PATTERN = re.compile(r"[々〆一-鿿㐀-䶿]+|[ァ-ヺー]+|[A-Za-z0-9][A-Za-z0-9\-]*")
+
+# 日本語の検索語の最小文字数 (1文字の漢字は一致するチャンクが多すぎるため使わない)
+MINIMUM_WIDE_TERM_LENGTH = 2
+
+# ほぼすべてのチャンクに現れ、関連箇所の絞り込みに役立たない語
+QUERY_STOPWORDS = {
+    "論文", "本論文", "研究", "本研究", "内容", "説明", "具体的",
+    "the", "and", "for", "with", "what", "which", "how", "why", "does", "this", "that", "are", "was", "paper",
+}
+
+# trigramで索引化できない短い検索語が1つ含まれるチャンクに加えるスコア
+SHORT_TERM_SCORE = 1.0
+
+# 予算の残りがこの概算トークン数未満の場合は、切り詰めた短い抜粋を追加しない
+MINIMUM_EXCERPT_TOKENS = 50
+
+
+@dataclass
+class RetrievedChunk:
+    """質問に関連する論文本文の抜粋"""
+    chunk_index     : int
+    page_number     : int
+    content         : str
+    relevance_score : float
+
+
+class PaperChunkRetriever:
+    """論文本文チャンクから質問に関連する箇所を検索 (全文検索インデックスのBM25スコア順)"""
+
+    def __init__(self, top_k: Optional[int] = None, token_budget: Optional[int] = None):
+        # 0を指定すると本文の抜粋を使わず、要約のみで回答する
+        self.top_k        = top_k if top_k is not None else int(os.getenv("QA_CHUNK_TOP_K", "4"))
+        self.token_budget = token_budget or int(os.getenv("QA_CHUNK_TOKEN_BUDGET", "2000"))
+
+    def extract_query_terms(self, question: str) -> List[str]:
+        """質問から検索語を取り出す (重複・ストップワードを除く)"""
+        query_terms = []
+        for term in QUERY_TERM_PATTERN.findall(unicodedata.normalize("NFKC", question)):
+            term = term.lower()
+            if term in QUERY_STOPWORDS or term in query_terms:
+                continue
+            if term.isascii() and len(term) < TRIGRAM_MINIMUM_TERM_LENGTH:
+                continue
+            if not term.isascii() and len(term) < MINIMUM_WIDE_TERM_LENGTH:
+                continue
+            query_terms.append(term)
+        return query_terms
+
+    async def retrieve(self, paper_id: int, questions: List[str], db: AsyncSession) -> List[RetrievedChunk]:
+        """質問に関連するチャンクを上位top_k件・token_budget以内で本文の順に取得 (チャンクがない論文は空)"""
+        query_terms = []
+        for question in questions:
+            query_terms += [term for term in self.extract_query_terms(question) if term not in query_terms]
+        if self.top_k <= 0 or not query_terms:
+            return []
+
+        # 1つの論文のチャンクは同じトランザクションで連続したIDで保存されるため、ID範囲で全文検索の対象を絞り込む
+        first_chunk_id, last_chunk_id = (await db.execute(
+            select(func.min(PaperChunk.chunk_id), func.max(PaperChunk.chunk_id))
+            .where(PaperChunk.paper_id == paper_id)
+        )).one()
+        if first_chunk_id is None:
+            return []
+
+        if db.bind.dialect.name == "sqlite":
+            indexed_terms = [term for term in query_terms if len(term) >= TRIGRAM_MINIMUM_TERM_LENGTH]
+            short_terms   = [term for term in query_terms if len(term) <  TRIGRAM_MINIMUM_TERM_LENGTH]
+        else:
+            indexed_terms, short_terms = [], query_terms
+
+        chunk_scores: Dict[int, float] = {}
+        if indexed_terms:
+            await self._add_full_text_scores(chunk_scores, paper_id, first_chunk_id, last_chunk_id, indexed_terms, db)
+        if short_terms:
+            await self._add_short_term_scores(chunk_scores, paper_id, short_terms, db)
+        if not chunk_scores:
+            return []
+
+        top_chunk_ids = sorted(chunk_scores, key=lambda chunk_id: chunk_scores[chunk_id], reverse=True)[:self.top_k]
+        chunk_rows = (await db.execute(
+            select(PaperChunk.chunk_id, PaperChunk.chunk_index, PaperChunk.page_number, PaperChunk.content)
+            .where(PaperChunk.chunk_id.in_(top_chunk_ids))
+        )).all()
+        chunk_rows_by_id = {chunk_row.chunk_id: chunk_row for chunk_row in chunk_rows}
+
+        # 関連度の高い順に予算を割り当て、プロンプトでは本文の順に並べる
+        retrieved_chunks = []
+        remaining_budget = self.token_budget
+        for chunk_id in top_chunk_ids:
+            if remaining_budget < MINIMUM_EXCERPT_TOKENS:
+                break
+            chunk_row = chunk_rows_by_id[chunk_id]
+            content   = truncate_to_token_budget(chunk_row.content, remaining_budget)
+            remaining_budget -= estimate_token_count(content)
+            retrieved_chunks.append(RetrievedChunk(
+                chunk_index     = chunk_row.chunk_index,
+                page_number     = chunk_row.page_number,
+                content         = content,
+                relevance_score = chunk_scores[chunk_id]
+            ))
+        return sorted(retrieved_chunks, key=lambda retrieved_chunk: retrieved_chunk.chunk_index)
+
+    async def get_leading_chunks(self, paper_id: int, token_budget: int, db: AsyncSession) -> List[RetrievedChunk]:
+        """論文本文の先頭からtoken_budget以内のチャンクを本文の順に取得 (コンテキストキャッシュに含める本文)"""
+        if token_budget < MINIMUM_EXCERPT_TOKENS:
+            return []
+
+        # 予算を満たすのに必要な最大件数だけ読み込む (短いチャンクでもMINIMUM_EXCERPT_TOKENS程度はある)
+        chunk_rows = (await db.execute(
+            select(PaperChunk.chunk_index, PaperChunk.page_number, PaperChunk.content)
+            .where(PaperChunk.paper_id == paper_id)
+            .order_by(PaperChunk.chunk_index)
+            .limit(token_budget // MINIMUM_EXCERPT_TOKENS + 1)
+        )).all()
+
+        leading_chunks   = []
+        remaining_budget = token_budget
+        for chunk_row in chunk_rows:
+            if remaining_budget < MINIMUM_EXCERPT_TOKENS:
+                break
+            content = truncate_to_token_budget(chunk_row.content, remaining_budget)
+            remaining_budget -= estimate_token_count(content)
+            leading_chunks.append(RetrievedChunk(
+                chunk_index     = chunk_row.chunk_index,
+                page_number     = chunk_row.page_number,
+                content         = content,
+                relevance_score = 0.0
+            ))
+        return leading_chunks
+
+    async def _add_full_text_scores(
+        self,
+        chunk_scores   : Dict[int, float],
+        paper_id       : int,
+        first_chunk_id : int,
+        last_chunk_id  : int,
+        indexed_terms  : List[str],
+        db             : AsyncSession
+    ) -> None:
+        """いずれかの検索語を含むチャンクのBM25スコアをchunk_scoresに加算"""
+        # bm25()は小さいほど関連度が高いため、符号を反転してスコアとする
+        bm25_score = literal_column("bm25(paper_chunks_fts)")
+        match_expression = " OR ".join(quote_full_text_term(term) for term in indexed_terms)
+        result = await db.execute(
+            select(PaperChunk.chunk_id, -bm25_score)
+            .select_from(paper_chunks_fts_table)
+            .join(PaperChunk, PaperChunk.chunk_id == paper_chunks_fts_table.c.rowid)
+            .where(text("paper_chunks_fts MATCH :match_expression").bindparams(match_expression=match_expression))
+            .where(paper_chunks_fts_table.c.rowid.between(first_chunk_id, last_chunk_id))
+            .where(PaperChunk.paper_id == paper_id)
+        )
+        for chunk_id, relevance_score in result.all():
+            chunk_scores[chunk_id] = chunk_scores.get(chunk_id, 0.0) + float(relevance_score)
+
+    async def _add_short_term_scores(
+        self,
+        chunk_scores : Dict[int, float],
+        paper_id     : int,
+        short_terms  : List[str],
+        db           : AsyncSession
+    ) -> None:
+        """trigramで索引化できない短い検索語を含むチャンクに、含まれる語の数に応じたスコアを加算"""
+        # 検索対象は1つの論文のチャンクのみのため、部分一致で数える
+        matched_term_count = sum(
+            case((func.lower(PaperChunk.content).contains(term, autoescape=True), 1), else_=0)
+            for term in short_terms
+        )
+        result = await db.execute(
+            select(PaperChunk.chunk_id, matched_term_count)
+            .where(PaperChunk.paper_id == paper_id)
+        )
+        for chunk_id, term_count in result.all():
+            if term_count:
+                chunk_scores[chunk_id] = chunk_scores.get(chunk_id, 0.0) + term_count * SHORT_TERM_SCORE
@@ -0,0 +1,88 @@
+import os
+import re
+from typing import List, Optional
+from dotenv import load_dotenv
+from pypdf import PdfReader
+from models.database_models import PaperChunk
+
+load_dotenv()
+
+# 連続する空白・改行
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 改行で分かれた日本語の文を連結するため、全角文字同士の間の空白を除く
+WIDE_CHARACTER_SPACE_PATTERN = re.compile(r"(?<=[　-ヿ㐀-䶿一-鿿＀-￯]) (?=[　-ヿ㐀-䶿一-鿿＀-￯])")
+
+# チャンクの末尾にする文の区切り (区切り文字の直後で分割する)
+SENTENCE_DELIMITERS = ["。", "．", "！", "？", ". ", "! ", "? "]
+
+
+class PaperChunker:
+    """PDF本文のページごとのテキスト抽出とチャンク分割"""
+
+    def __init__(
+        self,
+        chunk_characters         : Optional[int] = None,
+        overlap_characters       : Optional[int] = None,
+        minimum_chunk_characters : Optional[int] = None
+    ):
+        self.chunk_characters         = chunk_characters or int(os.getenv("PAPER_CHUNK_CHARACTERS", "1000"))
+        # チャンクの境界をまたぐ記述も検索できるよう、前のチャンクの末尾を重複させる
+        self.overlap_characters       = overlap_characters if overlap_characters is not None else int(os.getenv("PAPER_CHUNK_OVERLAP_CHARACTERS", "150"))
+        # ページ番号・ヘッダーのみのページなど、短すぎるテキストはチャンクにしない
+        self.minimum_chunk_characters = minimum_chunk_characters or int(os.getenv("PAPER_CHUNK_MINIMUM_CHARACTERS", "20"))
+
+    def extract_chunks(self, pdf_file_path: str) -> List[PaperChunk]:
+        """PDFファイルから本文を抽出してチャンクに分割 (同期処理のため、非同期処理からはasyncio.to_threadで呼ぶ)"""
+        try:
+            pdf_reader = PdfReader(pdf_file_path)
+            page_texts = [page.extract_text() or "" for page in pdf_reader.pages]
+        except Exception as e:
+            raise Exception(f"PDF本文抽出エラー: {str(e)}")
+        return self.split_page_texts(page_texts)
+
+    def split_page_texts(self, page_texts: List[str]) -> List[PaperChunk]:
+        """ページごとのテキストをチャンクに分割 (チャンクはページをまたがない)"""
+        chunks = []
+        for page_number, page_text in enumerate(page_texts, start=1):
+            for chunk_text in self._split_text(self._normalize_text(page_text)):
+                if len(chunk_text) < self.minimum_chunk_characters:
+                    continue
+                chunks.append(PaperChunk(
+                    chunk_index=len(chunks),
+                    page_number=page_number,
+                    content=chunk_text
+                ))
+        return chunks
+
+    def _normalize_text(self, page_text: str) -> str:
+        """PDFの改行・連続する空白を1つの空白にまとめる"""
+        normalized_text = WHITESPACE_PATTERN.sub(" ", page_text).strip()
+        return WIDE_CHARACTER_SPACE_PATTERN.sub("", normalized_text)
+
+    def _split_text(self, text: str) -> List[str]:
+        """テキストをchunk_characters以内のチャンクに分割 (できるだけ文の区切りで分割する)"""
+        chunk_texts = []
+        chunk_start = 0
+        while chunk_start < len(text):
+            chunk_end = min(chunk_start + self.chunk_characters, len(text))
+            if chunk_end < len(text):
+                # チャンクの後半に文の区切りがあればそこで分割する
+                sentence_end = self._find_sentence_end(text, chunk_start + self.chunk_characters // 2, chunk_end)
+                if sentence_end is not None:
+                    chunk_end = sentence_end
+
+            chunk_texts.append(text[chunk_start:chunk_end].strip())
+            if chunk_end >= len(text):
+                break
+            chunk_start = max(chunk_end - self.overlap_characters, chunk_start + 1)
+        return chunk_texts
+
+    def _find_sentence_end(self, text: str, search_start: int, search_end: int) -> Optional[int]:
+        """search_startからsearch_endの範囲で最後の文の区切りの直後の位置を探す (ない場合はNone)"""
+        sentence_ends = []
+        for delimiter in SENTENCE_DELIMITERS:
+            delimiter_position = text.rfind(delimiter, search_start, search_end)
+            if delimiter_position != -1:
+                sentence_ends.append(delimiter_position + len(delimiter.rstrip()))
+        return max(sentence_ends) if sentence_ends else None
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.connection import AsyncSessionLocal
+from models.database_models import Paper
+from services.corpus_version import CorpusVersion, default_corpus_version
+from services.embedding_backends import EmbeddingBackend
+from services.vector_index import VectorIndex
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 埋め込み対象テキストの最大文字数
+MAX_EMBEDDING_TEXT_LENGTH = 8000
+
+
+class PaperEmbeddingIndexer:
+    """論文の埋め込み計算とベクトルインデックスの管理サービス"""
+
+    def __init__(
+        self,
+        embedding_backend         : EmbeddingBackend,
+        vector_index              : Optional[VectorIndex] = None,
+        session_factory           : async_sessionmaker    = AsyncSessionLocal,
+        save_threshold            : Optional[int]         = None,
+        batch_size                : int                   = 32,
+        corpus_version            : CorpusVersion         = default_corpus_version,
+        backfill_interval_seconds : Optional[float]       = None
+    ):
+        self.embedding_backend = embedding_backend
+        self.vector_index      = vector_index or VectorIndex(
+            os.getenv("VECTOR_INDEX_DIRECTORY", "vector_index"),
+            embedding_backend.backend_name,
+            embedding_backend.dimension
+        )
+        self.session_factory   = session_factory
+        self.save_threshold    = save_threshold or int(os.getenv("VECTOR_INDEX_SAVE_THRESHOLD", "256"))
+        self.batch_size        = batch_size
+        self.corpus_version    = corpus_version
+        # CLIなど別プロセスで取り込まれた論文を登録する間隔 (0で起動時のみ)
+        self.backfill_interval_seconds = (
+            backfill_interval_seconds if backfill_interval_seconds is not None
+            else float(os.getenv("VECTOR_INDEX_BACKFILL_INTERVAL_SECONDS", "60"))
+        )
+
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._periodic_backfill_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """インデックスを読み込み、未登録の論文のバックフィルを開始"""
+        await asyncio.to_thread(self.vector_index.load)
+        self._backfill_task = asyncio.create_task(self.backfill_missing_papers())
+        if self.backfill_interval_seconds > 0:
+            self._periodic_backfill_task = asyncio.create_task(self._run_periodic_backfill())
+
+    async def wait_for_backfill(self) -> None:
+        """起動時のバックフィルの完了を待つ"""
+        if self._backfill_task is not None:
+            await asyncio.gather(self._backfill_task, return_exceptions=True)
+
+    async def stop(self) -> None:
+        """バックフィルを停止し、未保存の差分を書き出す"""
+        backfill_tasks = [task for task in (self._backfill_task, self._periodic_backfill_task) if task is not None]
+        for backfill_task in backfill_tasks:
+            backfill_task.cancel()
+        await asyncio.gather(*backfill_tasks, return_exceptions=True)
+        if self.vector_index.pending_count:
+            await asyncio.to_thread(self.vector_index.save)
+
+    async def _run_periodic_backfill(self) -> None:
+        """起動時のバックフィルの完了後、別プロセスで取り込まれた論文を定期的に登録"""
+        await self.wait_for_backfill()
+        while True:
+            await asyncio.sleep(self.backfill_interval_seconds)
+            try:
+                await self.backfill_missing_papers()
+            except Exception:
+                # 次回の実行で登録し直す
+                logger.exception("埋め込みの定期バックフィルエラー")
+
+    async def index_papers(self, papers: List[Paper], bump_corpus_version: bool = True) -> None:
+        """論文の埋め込みを計算してインデックスに登録 (bump_corpus_version=Falseの場合は呼び出し側で検索結果キャッシュを無効化する)"""
+        if not papers:
+            return
+
+        embeddings = await self.embedding_backend.embed_texts(
+            [self.build_paper_text(paper) for paper in papers]
+        )
+        self.vector_index.upsert([paper.paper_id for paper in papers], embeddings)
+        # セマンティック・ハイブリッド検索の結果が変わるため、検索結果キャッシュを無効化する
+        if bump_corpus_version:
+            self.corpus_version.bump()
+
+        if self.vector_index.pending_count >= self.save_threshold:
+            await asyncio.to_thread(self.vector_index.save)
+
+    async def backfill_missing_papers(self) -> None:
+        """インデックスに未登録の論文 (CLI取り込み分・既存データ) の埋め込みを計算"""
+        async with self.session_factory() as db:
+            all_paper_ids = (await db.scalars(select(Paper.paper_id))).all()
+        missing_paper_ids = sorted(set(all_paper_ids) - self.vector_index.get_paper_ids())
+
+        # 検索結果キャッシュはバッチごとではなく、保存の間隔 (save_threshold件) ごとにまとめて無効化する
+        unpublished_paper_count = 0
+        try:
+            for batch_start in range(0, len(missing_paper_ids), self.batch_size):
+                batch_paper_ids = missing_paper_ids[batch_start:batch_start + self.batch_size]
+                # 埋め込みの計算中にコネクションを保持しないよう、バッチごとに読み込んでセッションを閉じる
+                async with self.session_factory() as db:
+                    papers = (await db.scalars(
+                        select(Paper).where(Paper.paper_id.in_(batch_paper_ids))
+                    )).all()
+                await self.index_papers(list(papers), bump_corpus_version=False)
+
+                unpublished_paper_count += len(papers)
+                if unpublished_paper_count >= self.save_threshold:
+                    self.corpus_version.bump()
+                    unpublished_paper_count = 0
+        finally:
+            if unpublished_paper_count:
+                self.corpus_version.bump()
+
+        if self.vector_index.pending_count:
+            await asyncio.to_thread(self.vector_index.save)
+
+    async def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """クエリとコサイン類似度の高い論文を (paper_id, score) のリストで返す"""
+        query_embedding = (await self.embedding_backend.embed_texts([query]))[0]
+        return await asyncio.to_thread(self.vector_index.search, query_embedding, top_k)
+
+    def build_paper_text(self, paper: Paper) -> str:
+        """埋め込み対象のテキスト (タイトル・アブストラクト・各要約) を作成"""
+        text_parts = [
+            paper.title,
+            paper.abstract,
+            paper.summary_introduction,
+            paper.summary_methods,
+            paper.summary_results,
+            paper.summary_discussion,
+            paper.summary_conclusion,
+        ]
+        return "\n".join(text_part for text_part in text_parts if text_part)[:MAX_EMBEDDING_TEXT_LENGTH]
@@ -1,60 +1,150 @@
-import hashlib
-from typing import Dict, Any
-from fastapi import UploadFile
-from sqlalchemy.orm import Session
-from models.database_models import Paper
+from typing import Callable, Dict, Any, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.keyword_index import build_paper_keywords
+from database.paper_context import apply_paper_context
+from models.database_models import Paper, PaperChunk
+from services.metrics import measure_stage
 
 
 class PDFProcessor:
     """PDF処理サービス"""
 
-
     async def save_paper_to_database(
         self,
-        file: UploadFile,
+        original_filename: str,
+        file_hash: str,
+        file_size: int,
         summary_data: Dict[str, Any],
-        db: Session
+        db: AsyncSession,
+        chunks: Optional[List[PaperChunk]] = None,
+        before_commit: Optional[Callable[[Paper], None]] = None
     ) -> Paper:
-        """論文データをデータベースに保存"""
+        """論文データ (本文チャンクを含む) をデータベースに保存
+
+        before_commitは論文IDの採番後・コミット前に呼び出す (取り込みジョブの完了などを論文と同じトランザクションで更新する)
+        """
         try:
-            # ファイル内容を読み込み（ハッシュ計算用のみ）
-            content = await file.read()
-            
-            # ファイルハッシュを計算
-            file_hash = hashlib.sha256(content).hexdigest()
-            
             # 既存の論文をチェック
-            existing_paper = db.query(Paper).filter(Paper.file_hash == file_hash).first()
+            with measure_stage("pdf_processor", "check_duplicate"):
+                existing_paper = await db.scalar(
+                    select(Paper).where(Paper.file_hash == file_hash)
+                )
             if existing_paper:
                 raise Exception("この論文は既にアップロードされています")
             
             # データベースに保存
-            paper = Paper(
-                original_filename=file.filename,
-                title=summary_data.get('title', 'タイトル不明'),
-                authors=summary_data.get('authors'),
-                abstract=summary_data.get('abstract'),
-                summary_introduction=summary_data.get('summary_introduction'),
-                summary_methods=summary_data.get('summary_methods'),
-                summary_results=summary_data.get('summary_results'),
-                summary_discussion=summary_data.get('summary_discussion'),
-                summary_conclusion=summary_data.get('summary_conclusion'),
-                keywords=summary_data.get('keywords', []),
-                file_size=len(content),
-                file_hash=file_hash
-            )
+            with measure_stage("pdf_processor", "build_paper"):
+                paper = self._build_paper(original_filename, file_hash, file_size, summary_data, chunks)
             
             db.add(paper)
-            db.commit()
-            db.refresh(paper)
+            if before_commit is not None:
+                await db.flush()
+                before_commit(paper)
+            with measure_stage("pdf_processor", "commit"):
+                await db.commit()
+            await db.refresh(paper)
             
             return paper
             
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise Exception(f"論文保存エラー: {str(e)}")
 
-    def _calculate_file_hash(self, content: bytes) -> str:
-        """ファイルハッシュを計算"""
-        return hashlib.sha256(content).hexdigest()
+    async def save_papers_to_database(
+        self,
+        paper_records: List[Dict[str, Any]],
+        db: AsyncSession
+    ) -> List[Paper]:
+        """複数の論文データを1トランザクションでデータベースに保存"""
+        try:
+            with measure_stage("pdf_processor", "build_papers"):
+                papers = [
+                    self._build_paper(
+                        paper_record['original_filename'],
+                        paper_record['file_hash'],
+                        paper_record['file_size'],
+                        paper_record['summary_data'],
+                        paper_record.get('chunks')
+                    )
+                    for paper_record in paper_records
+                ]
+            
+            db.add_all(papers)
+            with measure_stage("pdf_processor", "commit_batch"):
+                await db.commit()
+            
+            return papers
+            
+        except Exception as e:
+            await db.rollback()
+            raise Exception(f"論文一括保存エラー: {str(e)}")
+
+    async def update_paper_summary(
+        self,
+        paper_id: int,
+        summary_data: Dict[str, Any],
+        db: AsyncSession,
+        chunks: Optional[List[PaperChunk]] = None
+    ) -> Paper:
+        """既存の論文の要約を置き換える (chunksを指定した場合は本文チャンクも置き換える)"""
+        try:
+            paper = await db.scalar(
+                select(Paper)
+                .where(Paper.paper_id == paper_id)
+                .options(selectinload(Paper.keyword_entries), selectinload(Paper.chunks))
+            )
+            if paper is None:
+                raise Exception("論文が見つかりません")
+
+            self._apply_summary(paper, summary_data)
+            if chunks:
+                paper.chunks = chunks
+
+            # updated_atが更新されるため、回答キャッシュ・QA履歴の古い回答は再利用されなくなる
+            with measure_stage("pdf_processor", "commit_summary_update"):
+                await db.commit()
+            await db.refresh(paper)
+
+            return paper
+
+        except Exception as e:
+            await db.rollback()
+            raise Exception(f"論文要約更新エラー: {str(e)}")
+
+    def _build_paper(
+        self,
+        original_filename: str,
+        file_hash: str,
+        file_size: int,
+        summary_data: Dict[str, Any],
+        chunks: Optional[List[PaperChunk]] = None
+    ) -> Paper:
+        """要約データから論文レコードを作成 (キーワード索引・本文チャンクも同じトランザクションで保存される)"""
+        paper = Paper(
+            original_filename=original_filename,
+            chunks=chunks or [],
+            file_size=file_size,
+            file_hash=file_hash
+        )
+        self._apply_summary(paper, summary_data)
+        return paper
 
+    def _apply_summary(self, paper: Paper, summary_data: Dict[str, Any]) -> None:
+        """要約データを論文レコードに設定 (キーワード索引・質問回答用のコンテキストも作り直す)"""
+        keywords = summary_data.get('keywords', [])
+        paper.title = summary_data.get('title', 'タイトル不明')
+        paper.authors = summary_data.get('authors')
+        paper.abstract = summary_data.get('abstract')
+        paper.summary_introduction = summary_data.get('summary_introduction')
+        paper.summary_methods = summary_data.get('summary_methods')
+        paper.summary_results = summary_data.get('summary_results')
+        paper.summary_discussion = summary_data.get('summary_discussion')
+        paper.summary_conclusion = summary_data.get('summary_conclusion')
+        paper.keywords = keywords
+        paper.keyword_entries = build_paper_keywords(keywords)
+        paper.summary_prompt_version = summary_data.get('summary_prompt_version')
+        paper.summary_model = summary_data.get('summary_model')
+        # 質問回答のたびに組み立てないよう、コンテキストを取り込み時に作成しておく
+        apply_paper_context(paper)
@@ -0,0 +1,45 @@
+import os
+import shutil
+import uuid
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class PDFStore:
+    """取り込んだPDFをfile_hashで参照する保存領域 (再要約・本文チャンクの再作成に使う)"""
+
+    def __init__(self, store_directory: Optional[str] = None):
+        self.store_directory = store_directory or os.getenv("PDF_STORE_DIRECTORY", "pdf_store")
+
+    def get_path(self, file_hash: str) -> str:
+        """PDFの保存先のパス (1ディレクトリのファイル数が増えすぎないよう、ハッシュの先頭2文字で分ける)"""
+        return os.path.join(self.store_directory, file_hash[:2], f"{file_hash}.pdf")
+
+    def exists(self, file_hash: str) -> bool:
+        """PDFが保存済みか判定"""
+        return os.path.exists(self.get_path(file_hash))
+
+    def store(self, source_file_path: str, file_hash: str, move: bool = False) -> str:
+        """PDFを保存して保存先のパスを返す (同じ内容のPDFが保存済みの場合は保存しない。ブロッキングI/Oのためスレッドで実行すること)"""
+        stored_file_path = self.get_path(file_hash)
+        if os.path.exists(stored_file_path):
+            if move:
+                os.unlink(source_file_path)
+            return stored_file_path
+
+        # 書き込み途中のファイルを参照しないよう、一時ファイルに書き出してから置き換える
+        os.makedirs(os.path.dirname(stored_file_path), exist_ok=True)
+        temporary_file_path = f"{stored_file_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if move:
+                shutil.move(source_file_path, temporary_file_path)
+            else:
+                shutil.copyfile(source_file_path, temporary_file_path)
+            os.replace(temporary_file_path, stored_file_path)
+        except Exception:
+            if os.path.exists(temporary_file_path):
+                os.unlink(temporary_file_path)
+            raise
+        return stored_file_path
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.database_models import Paper, QAHistory
+from services.answer_cache import AnswerCache, normalize_question
+from services.gemini_service import GeminiService
+from services.paper_chunk_retriever import PaperChunkRetriever, RetrievedChunk
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionAnswerService:
+    """論文への質問回答サービス (回答キャッシュ・QA履歴の再利用・本文の関連箇所の検索)"""
+
+    def __init__(
+        self,
+        gemini_service       : GeminiService,
+        answer_cache         : Optional[AnswerCache]         = None,
+        history_lookup_limit : Optional[int]                 = None,
+        chunk_retriever      : Optional[PaperChunkRetriever] = None
+    ):
+        self.gemini_service       = gemini_service
+        self.answer_cache         = answer_cache or AnswerCache()
+        self.history_lookup_limit = history_lookup_limit or int(os.getenv("ANSWER_HISTORY_LOOKUP_LIMIT", "200"))
+        self.chunk_retriever      = chunk_retriever or PaperChunkRetriever()
+
+    async def answer_question(
+        self,
+        paper        : Paper,
+        question     : str,
+        user_session : Optional[str],
+        db           : AsyncSession,
+        token_usage  : Optional[Dict[str, int]] = None
+    ) -> str:
+        """質問に回答し、QA履歴に保存 (Gemini APIを呼び出した場合はtoken_usageに入力トークン数を格納)"""
+        normalized_question = normalize_question(question)
+        paper_version       = self._get_paper_version(paper)
+
+        answer = self.answer_cache.get(paper.paper_id, paper_version, normalized_question)
+        if answer is not None:
+            self.answer_cache.record_hit()
+        else:
+            answer = await self._find_answer_in_history(paper, normalized_question, db)
+            if answer is not None:
+                self.answer_cache.record_hit(from_history=True)
+            else:
+                self.answer_cache.record_miss()
+                chunks      = await self.chunk_retriever.retrieve(paper.paper_id, [question], db)
+                body_chunks = await self._get_body_chunks(paper, db)
+                # 回答の生成中にコネクションを保持しないよう、読み取りを終えてからGemini APIを呼び出す
+                await self._release_connection(db, [paper])
+                answer = await self.gemini_service.answer_question_about_paper(
+                    paper, question, token_usage, chunks, body_chunks
+                )
+            self.answer_cache.set(paper.paper_id, paper_version, normalized_question, answer)
+
+        await self._save_qa_history(paper, question, answer, user_session, db)
+        return answer
+
+    async def stream_answer(
+        self,
+        paper        : Paper,
+        question     : str,
+        user_session : Optional[str],
+        db           : AsyncSession,
+        token_usage  : Optional[Dict[str, int]] = None
+    ) -> AsyncIterator[str]:
+        """質問への回答を生成された順に返し、生成が完了したらQA履歴に保存 (途中でキャンセルされた場合は保存しない)"""
+        normalized_question = normalize_question(question)
+        paper_version       = self._get_paper_version(paper)
+
+        # キャッシュ・QA履歴にある回答は一度に返す
+        answer = self.answer_cache.get(paper.paper_id, paper_version, normalized_question)
+        if answer is not None:
+            self.answer_cache.record_hit()
+        else:
+            answer = await self._find_answer_in_history(paper, normalized_question, db)
+            if answer is not None:
+                self.answer_cache.record_hit(from_history=True)
+
+        if answer is not None:
+            yield answer
+        else:
+            self.answer_cache.record_miss()
+            chunks      = await self.chunk_retriever.retrieve(paper.paper_id, [question], db)
+            body_chunks = await self._get_body_chunks(paper, db)
+            # 生成中にコネクションを保持しないよう、履歴・本文検索の読み取りトランザクションを終了しておく
+            await self._release_connection(db, [paper])
+
+            answer_chunks = []
+            async for answer_chunk in self.gemini_service.stream_answer_question_about_paper(
+                paper, question, token_usage, chunks, body_chunks
+            ):
+                answer_chunks.append(answer_chunk)
+                yield answer_chunk
+            answer = "".join(answer_chunks).strip()
+
+        self.answer_cache.set(paper.paper_id, paper_version, normalized_question, answer)
+
+        await self._save_qa_history(paper, question, answer, user_session, db)
+
+    async def answer_questions_in_batch(
+        self,
+        papers       : List[Paper],
+        questions    : List[str],
+        user_session : Optional[str],
+        db           : AsyncSession,
+        token_usage  : Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """複数の論文への複数の質問に回答し、(論文, 質問) ごとの回答・エラーを返す
+
+        キャッシュ・QA履歴にない質問は論文ごとに1回の呼び出しにまとめ、論文間は並行に処理する。
+        """
+        # キャッシュ・QA履歴の確認、本文の関連箇所の検索はセッションを共有するため論文ごとに順に行う
+        answers_by_paper     = {}
+        chunks_by_paper      = {}
+        body_chunks_by_paper = {}
+        for paper in papers:
+            answers_by_paper[paper.paper_id] = await self._find_reusable_answers(paper, questions, db)
+            unanswered_questions = [question for question in questions if question not in answers_by_paper[paper.paper_id]]
+            if unanswered_questions:
+                chunks_by_paper[paper.paper_id]      = await self.chunk_retriever.retrieve(paper.paper_id, unanswered_questions, db)
+                body_chunks_by_paper[paper.paper_id] = await self._get_body_chunks(paper, db)
+
+        # 質問ごとの回答し直しを含め、生成中はコネクションを保持しない (QA履歴は生成後にまとめて保存する)
+        if chunks_by_paper:
+            await self._release_connection(db, papers)
+
+        paper_results = await asyncio.gather(*[
+            self._answer_unanswered_questions(
+                paper, questions, answers_by_paper[paper.paper_id],
+                chunks_by_paper.get(paper.paper_id, []), body_chunks_by_paper.get(paper.paper_id, [])
+            )
+            for paper in papers
+        ])
+
+        answer_items = []
+        for paper, (errors_by_question, paper_token_usage) in zip(papers, paper_results):
+            if token_usage is not None:
+                self._add_token_usage(token_usage, paper_token_usage)
+            for question in questions:
+                answer = answers_by_paper[paper.paper_id].get(question)
+                answer_items.append({
+                    "paper_id" : paper.paper_id,
+                    "question" : question,
+                    "answer"   : answer,
+                    "detail"   : errors_by_question.get(question),
+                })
+                if answer is not None:
+                    db.add(QAHistory(
+                        paper_id=paper.paper_id,
+                        question=question,
+                        answer=answer,
+                        user_session=user_session
+                    ))
+
+        # 回答できた質問のQA履歴をまとめて保存
+        await db.commit()
+        return answer_items
+
+    async def _find_reusable_answers(
+        self,
+        paper     : Paper,
+        questions : List[str],
+        db        : AsyncSession
+    ) -> Dict[str, str]:
+        """キャッシュ・QA履歴から再利用できる回答を探す (質問 -> 回答)"""
+        paper_version = self._get_paper_version(paper)
+        answers       = {}
+        unanswered_questions = []
+        for question in questions:
+            answer = self.answer_cache.get(paper.paper_id, paper_version, normalize_question(question))
+            if answer is not None:
+                self.answer_cache.record_hit()
+                answers[question] = answer
+            else:
+                unanswered_questions.append(question)
+
+        if unanswered_questions:
+            history_answers = await self._find_answers_in_history(
+                paper, [normalize_question(question) for question in unanswered_questions], db
+            )
+            for question in unanswered_questions:
+                answer = history_answers.get(normalize_question(question))
+                if answer is not None:
+                    self.answer_cache.record_hit(from_history=True)
+                    self.answer_cache.set(paper.paper_id, paper_version, normalize_question(question), answer)
+                    answers[question] = answer
+        return answers
+
+    async def _answer_unanswered_questions(
+        self,
+        paper       : Paper,
+        questions   : List[str],
+        answers     : Dict[str, str],
+        chunks      : List[RetrievedChunk],
+        body_chunks : List[RetrievedChunk]
+    ) -> Tuple[Dict[str, str], Dict[str, int]]:
+        """未回答の質問をGemini APIで回答してanswersに追加し、(質問 -> エラー, 使用トークン数) を返す"""
+        unanswered_questions = [question for question in questions if question not in answers]
+        errors_by_question   = {}
+        paper_token_usage    = {}
+        if not unanswered_questions:
+            return errors_by_question, paper_token_usage
+
+        for _ in unanswered_questions:
+            self.answer_cache.record_miss()
+
+        generated_answers = None
+        if len(unanswered_questions) > 1:
+            try:
+                generated_answers = await self.gemini_service.answer_questions_about_paper(
+                    paper, unanswered_questions, paper_token_usage, chunks, body_chunks
+                )
+            except Exception:
+                # まとめた回答を解釈できない場合などは質問ごとに回答し直す
+                logger.exception("一括質問回答エラー (paper_id=%d、質問ごとに再実行します)", paper.paper_id)
+
+        if generated_answers is None:
+            question_token_usages = [{} for _ in unanswered_questions]
+            generated_answers = await asyncio.gather(*[
+                self.gemini_service.answer_question_about_paper(paper, question, question_token_usage, chunks, body_chunks)
+                for question, question_token_usage in zip(unanswered_questions, question_token_usages)
+            ], return_exceptions=True)
+            for question, generated_answer in zip(unanswered_questions, generated_answers):
+                if isinstance(generated_answer, Exception):
+                    errors_by_question[question] = str(generated_answer)
+            for question_token_usage in question_token_usages:
+                self._add_token_usage(paper_token_usage, question_token_usage)
+
+        paper_version = self._get_paper_version(paper)
+        for question, answer in zip(unanswered_questions, generated_answers):
+            if isinstance(answer, str):
+                answers[question] = answer
+                self.answer_cache.set(paper.paper_id, paper_version, normalize_question(question), answer)
+        return errors_by_question, paper_token_usage
+
+    async def _release_connection(self, db: AsyncSession, papers: List[Paper]) -> None:
+        """読み取りトランザクションを終了してコネクションをプールに返す (QA履歴の保存時は改めて取得する)
+
+        ロールバックで論文の属性が失効しないよう、論文は読み込んだ属性を保ったままセッションから切り離す。
+        """
+        for paper in papers:
+            if paper in db:
+                db.expunge(paper)
+        await db.rollback()
+
+    async def _get_body_chunks(self, paper: Paper, db: AsyncSession) -> List[RetrievedChunk]:
+        """コンテキストキャッシュに含める本文の先頭を取得 (キャッシュが無効な場合は空)"""
+        context_cache = self.gemini_service.context_cache
+        if not context_cache.enabled:
+            return []
+        return await self.chunk_retriever.get_leading_chunks(paper.paper_id, context_cache.body_token_budget, db)
+
+    def _add_token_usage(self, total_token_usage: Dict[str, int], token_usage: Dict[str, int]) -> None:
+        """呼び出しごとのトークン数を合計に加算"""
+        for usage_name, token_count in token_usage.items():
+            total_token_usage[usage_name] = total_token_usage.get(usage_name, 0) + token_count
+
+    async def _save_qa_history(
+        self,
+        paper        : Paper,
+        question     : str,
+        answer       : str,
+        user_session : Optional[str],
+        db           : AsyncSession
+    ) -> None:
+        """QA履歴を保存"""
+        qa_record = QAHistory(
+            paper_id=paper.paper_id,
+            question=question,
+            answer=answer,
+            user_session=user_session
+        )
+        db.add(qa_record)
+        await db.commit()
+
+    async def _find_answer_in_history(
+        self,
+        paper               : Paper,
+        normalized_question : str,
+        db                  : AsyncSession
+    ) -> Optional[str]:
+        """現在の要約に対して過去に回答済みの同じ質問をQA履歴から探す"""
+        answers = await self._find_answers_in_history(paper, [normalized_question], db)
+        return answers.get(normalized_question)
+
+    async def _find_answers_in_history(
+        self,
+        paper                : Paper,
+        normalized_questions : List[str],
+        db                   : AsyncSession
+    ) -> Dict[str, str]:
+        """現在の要約に対して過去に回答済みの質問をQA履歴から探す (正規化済み質問 -> 最新の回答)"""
+        result = await db.execute(
+            select(QAHistory.question, QAHistory.answer, QAHistory.question_date)
+            .where(QAHistory.paper_id == paper.paper_id)
+            .order_by(QAHistory.qa_id.desc())
+            .limit(self.history_lookup_limit)
+        )
+        answers = {}
+        for past_question, past_answer, question_date in result.all():
+            # 要約更新前の回答は再利用しない
+            if paper.updated_at is not None and question_date is not None and question_date < paper.updated_at:
+                continue
+            normalized_past_question = normalize_question(past_question)
+            if normalized_past_question in normalized_questions and normalized_past_question not in answers:
+                answers[normalized_past_question] = past_answer
+        return answers
+
+    def _get_paper_version(self, paper: Paper) -> str:
+        """要約の更新を検知するための論文バージョン"""
+        return paper.updated_at.isoformat() if paper.updated_at else ""
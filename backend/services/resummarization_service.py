@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import exists, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from database.connection import AsyncSessionLocal
+from models.database_models import Paper, PaperChunk
+from services.answer_cache import AnswerCache
+from services.gemini_service import GeminiService
+from services.metrics import measure_stage
+from services.paper_chunker import PaperChunker
+from services.paper_embedding_indexer import PaperEmbeddingIndexer
+from services.pdf_processor import PDFProcessor
+from services.pdf_store import PDFStore
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class ResummarizationService:
+    """要約プロンプト・モデルの変更後に、古い要約の論文のみを保存済みのPDFから再要約するサービス"""
+
+    def __init__(
+        self,
+        gemini_service          : GeminiService,
+        pdf_processor           : PDFProcessor,
+        pdf_store               : Optional[PDFStore]              = None,
+        paper_chunker           : Optional[PaperChunker]          = None,
+        paper_embedding_indexer : Optional[PaperEmbeddingIndexer] = None,
+        answer_cache            : Optional[AnswerCache]           = None,
+        session_factory         : async_sessionmaker              = AsyncSessionLocal,
+        concurrency             : Optional[int]                   = None,
+        requests_per_minute     : Optional[float]                 = None,
+        batch_size              : Optional[int]                   = None
+    ):
+        self.gemini_service          = gemini_service
+        self.pdf_processor           = pdf_processor
+        self.pdf_store               = pdf_store or PDFStore()
+        self.paper_chunker           = paper_chunker or PaperChunker()
+        self.paper_embedding_indexer = paper_embedding_indexer
+        self.answer_cache            = answer_cache
+        self.session_factory         = session_factory
+        self.concurrency             = concurrency or int(os.getenv("RESUMMARIZE_CONCURRENCY", "4"))
+        # 取り込み・質問回答のGemini API呼び出しを圧迫しないよう、要約の開始間隔を制限する (0の場合は制限しない)
+        self.requests_per_minute     = requests_per_minute if requests_per_minute is not None else float(os.getenv("RESUMMARIZE_REQUESTS_PER_MINUTE", "30"))
+        self.batch_size              = batch_size or int(os.getenv("RESUMMARIZE_BATCH_SIZE", "100"))
+
+        self._run_task: Optional[asyncio.Task] = None
+        self._rate_limit_lock = asyncio.Lock()
+        self._next_start_at   = 0.0
+        self.counts: Dict[str, int] = {"resummarized": 0, "failed": 0, "missing_pdf": 0}
+        self.started_at: Optional[datetime]  = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def is_running(self) -> bool:
+        """再要約を実行中か"""
+        return self._run_task is not None and not self._run_task.done()
+
+    async def start(self, limit: Optional[int] = None) -> bool:
+        """再要約をバックグラウンドで開始 (実行中の場合は開始せずFalseを返す)"""
+        if self.is_running:
+            return False
+        self._run_task = asyncio.create_task(self._run_in_background(limit))
+        return True
+
+    async def stop(self) -> None:
+        """再要約を停止 (再要約済みの論文は保存されているため、次回は残りの論文から再開する)"""
+        if self._run_task is not None:
+            self._run_task.cancel()
+            await asyncio.gather(self._run_task, return_exceptions=True)
+            self._run_task = None
+
+    async def get_status(self, db: AsyncSession) -> Dict[str, Any]:
+        """実行状況と再要約が必要な論文数を取得"""
+        stale_paper_count = await db.scalar(
+            select(func.count()).select_from(Paper).where(self._build_stale_condition())
+        )
+        return {
+            "running"        : self.is_running,
+            "prompt_version" : self.gemini_service.summary_prompt_version,
+            "model"          : self.gemini_service.model_name,
+            "stale_papers"   : stale_paper_count,
+            "started_at"     : self.started_at,
+            "finished_at"    : self.finished_at,
+            **self.counts,
+        }
+
+    async def run(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """古い要約の論文をpaper_id順に再要約し、件数を返す (limitを指定した場合はその件数まで)"""
+        self.counts      = {"resummarized": 0, "failed": 0, "missing_pdf": 0}
+        self.started_at  = datetime.now(timezone.utc)
+        self.finished_at = None
+        semaphore        = asyncio.Semaphore(self.concurrency)
+        last_paper_id    = 0
+        remaining        = limit
+
+        async def resummarize_with_limit(paper_row) -> None:
+            async with semaphore:
+                await self._resummarize_paper(paper_row.paper_id, paper_row.file_hash, paper_row.has_chunks)
+
+        # 失敗した論文は古いまま残り、次回の実行で再試行される (同じ実行中はpaper_idが進むため繰り返さない)
+        while remaining is None or remaining > 0:
+            batch_size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            async with self.session_factory() as db:
+                paper_rows = (await db.execute(
+                    select(
+                        Paper.paper_id,
+                        Paper.file_hash,
+                        exists().where(PaperChunk.paper_id == Paper.paper_id).label("has_chunks")
+                    )
+                    .where(self._build_stale_condition(), Paper.paper_id > last_paper_id)
+                    .order_by(Paper.paper_id)
+                    .limit(batch_size)
+                )).all()
+            if not paper_rows:
+                break
+
+            await asyncio.gather(*[resummarize_with_limit(paper_row) for paper_row in paper_rows])
+            last_paper_id = paper_rows[-1].paper_id
+            if remaining is not None:
+                remaining -= len(paper_rows)
+
+        self.finished_at = datetime.now(timezone.utc)
+        return self.counts
+
+    async def _run_in_background(self, limit: Optional[int]) -> None:
+        """バックグラウンド実行 (エラーはログに出力する)"""
+        try:
+            await self.run(limit)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("再要約エラー")
+
+    def _build_stale_condition(self):
+        """現在のプロンプト・モデル以外 (不明を含む) で要約された論文の条件"""
+        return or_(
+            Paper.summary_prompt_version.is_(None),
+            Paper.summary_prompt_version != self.gemini_service.summary_prompt_version,
+            Paper.summary_model.is_(None),
+            Paper.summary_model != self.gemini_service.model_name
+        )
+
+    async def _resummarize_paper(self, paper_id: int, file_hash: str, has_chunks: bool) -> None:
+        """保存済みのPDFから論文を再要約し、関連するキャッシュ・埋め込みを更新"""
+        pdf_file_path = self.pdf_store.get_path(file_hash)
+        if not await asyncio.to_thread(os.path.exists, pdf_file_path):
+            # PDFの保存領域の導入前に取り込んだ論文は、同じPDFを再アップロードすると対象になる
+            self.counts["missing_pdf"] += 1
+            return
+
+        try:
+            await self._wait_for_rate_limit()
+            # 本文チャンクはプロンプトに依存しないため、チャンクのない論文 (チャンク導入前の論文) のみ作成する
+            if has_chunks:
+                summary_data, chunks = await self.gemini_service.generate_paper_summary(pdf_file_path), []
+            else:
+                summary_data, chunks = await asyncio.gather(
+                    self.gemini_service.generate_paper_summary(pdf_file_path),
+                    self._extract_chunks(pdf_file_path)
+                )
+            async with self.session_factory() as db:
+                paper = await self.pdf_processor.update_paper_summary(paper_id, summary_data, db, chunks)
+                await self._refresh_derived_data(paper)
+            self.counts["resummarized"] += 1
+
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.counts["failed"] += 1
+            logger.exception("再要約エラー (paper_id=%d)", paper_id)
+
+    async def _wait_for_rate_limit(self) -> None:
+        """requests_per_minuteを超えないよう、前回の開始から一定間隔を空ける"""
+        if self.requests_per_minute <= 0:
+            return
+        async with self._rate_limit_lock:
+            current_time        = time.monotonic()
+            wait_seconds        = self._next_start_at - current_time
+            self._next_start_at = max(current_time, self._next_start_at) + 60 / self.requests_per_minute
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+
+    async def _extract_chunks(self, pdf_file_path: str) -> List[PaperChunk]:
+        """PDF本文をチャンクに分割 (抽出できない場合は要約のみ更新する)"""
+        try:
+            with measure_stage("resummarization", "extract_chunks"):
+                return await asyncio.to_thread(self.paper_chunker.extract_chunks, pdf_file_path)
+        except Exception:
+            logger.exception("本文チャンク作成エラー (%s)", pdf_file_path)
+            return []
+
+    async def _refresh_derived_data(self, paper: Paper) -> None:
+        """要約から作られる回答キャッシュ・コンテキストキャッシュ・埋め込みを更新 (検索結果キャッシュは保存時に無効化される)"""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_paper(paper.paper_id)
+        await self.gemini_service.invalidate_context_cache(paper.paper_id)
+
+        if self.paper_embedding_indexer is None:
+            return
+        try:
+            with measure_stage("resummarization", "index_embedding"):
+                await self.paper_embedding_indexer.index_papers([paper])
+        except Exception:
+            # 要約の更新は完了扱いとし、埋め込みは古いまま残る
+            logger.exception("埋め込み登録エラー (paper_id=%d)", paper.paper_id)
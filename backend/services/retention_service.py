@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from database.connection import AsyncSessionLocal
+from models.database_models import QAHistory, SearchDailyStat, SearchHistory, SearchResult
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA auto_vacuumの値 (INCREMENTALの場合のみincremental_vacuumで領域を返却できる)
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class RetentionService:
+    """検索履歴・質問履歴の保持期間・保持件数を超えた行の集約・削除サービス"""
+
+    def __init__(
+        self,
+        session_factory          : async_sessionmaker = AsyncSessionLocal,
+        search_retention_days    : Optional[int]      = None,
+        search_max_rows          : Optional[int]      = None,
+        qa_retention_days        : Optional[int]      = None,
+        qa_max_rows              : Optional[int]      = None,
+        batch_size               : Optional[int]      = None,
+        batch_pause_seconds      : Optional[float]    = None,
+        incremental_vacuum_pages : Optional[int]      = None,
+        interval_seconds         : Optional[float]    = None
+    ):
+        # 0を指定したポリシーは無効
+        self.session_factory          = session_factory
+        self.search_retention_days    = self._setting(search_retention_days, "SEARCH_HISTORY_RETENTION_DAYS", 90)
+        self.search_max_rows          = self._setting(search_max_rows, "SEARCH_HISTORY_MAX_ROWS", 1000000)
+        self.qa_retention_days        = self._setting(qa_retention_days, "QA_HISTORY_RETENTION_DAYS", 365)
+        self.qa_max_rows              = self._setting(qa_max_rows, "QA_HISTORY_MAX_ROWS", 0)
+        self.batch_size               = batch_size or int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+        self.batch_pause_seconds      = batch_pause_seconds if batch_pause_seconds is not None else float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", "0.05"))
+        self.incremental_vacuum_pages = self._setting(incremental_vacuum_pages, "RETENTION_INCREMENTAL_VACUUM_PAGES", 2000)
+        self.interval_seconds         = interval_seconds or float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+
+        self._retention_task: Optional[asyncio.Task] = None
+
+    def _setting(self, value: Optional[int], environment_name: str, default: int) -> int:
+        """引数 (未指定時は環境変数) から整数の設定値を取得"""
+        return value if value is not None else int(os.getenv(environment_name, str(default)))
+
+    async def start(self) -> None:
+        """定期実行タスクを起動"""
+        self._retention_task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self) -> None:
+        """定期実行タスクを停止"""
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            await asyncio.gather(self._retention_task, return_exceptions=True)
+            self._retention_task = None
+
+    async def _run_periodically(self) -> None:
+        """interval_secondsごとに保持ポリシーを適用"""
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("履歴削除エラー")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """保持ポリシーを1回適用し、集約・削除した件数を返す"""
+        counts = {"search_history_deleted": 0, "search_results_deleted": 0, "qa_history_deleted": 0}
+
+        async with self.session_factory() as db:
+            search_id_limit = await self._find_expired_id_limit(
+                db, SearchHistory.search_id, SearchHistory.search_date, self.search_retention_days, self.search_max_rows
+            )
+            while search_id_limit is not None:
+                deleted_counts = await self._roll_up_and_delete_searches(db, search_id_limit)
+                if not deleted_counts["search_history_deleted"]:
+                    break
+                counts["search_history_deleted"] += deleted_counts["search_history_deleted"]
+                counts["search_results_deleted"] += deleted_counts["search_results_deleted"]
+                await asyncio.sleep(self.batch_pause_seconds)
+
+            qa_id_limit = await self._find_expired_id_limit(
+                db, QAHistory.qa_id, QAHistory.question_date, self.qa_retention_days, self.qa_max_rows
+            )
+            while qa_id_limit is not None:
+                deleted_count = await self._delete_qa_history(db, qa_id_limit)
+                if not deleted_count:
+                    break
+                counts["qa_history_deleted"] += deleted_count
+                await asyncio.sleep(self.batch_pause_seconds)
+
+            counts["vacuumed_pages"] = await self._run_incremental_vacuum(db)
+
+        return counts
+
+    async def _find_expired_id_limit(
+        self,
+        db             : AsyncSession,
+        id_column,
+        date_column,
+        retention_days : int,
+        max_rows       : int
+    ) -> Optional[int]:
+        """保持期間・保持件数のいずれかを超えた行のIDの上限を取得 (対象がない場合はNone)"""
+        id_limits = []
+
+        if retention_days > 0:
+            # 日時はCURRENT_TIMESTAMPと同じくUTCで保存されている
+            cutoff_date = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days)
+            id_limits.append(await db.scalar(
+                select(func.max(id_column)).where(date_column < cutoff_date)
+            ))
+
+        if max_rows > 0:
+            # 新しい方からmax_rows件を残し、それより古い行を対象にする
+            id_limits.append(await db.scalar(
+                select(id_column).order_by(id_column.desc()).offset(max_rows).limit(1)
+            ))
+
+        id_limits = [id_limit for id_limit in id_limits if id_limit is not None]
+        return max(id_limits) if id_limits else None
+
+    async def _roll_up_and_delete_searches(self, db: AsyncSession, search_id_limit: int) -> Dict[str, int]:
+        """最も古い検索履歴batch_size件を日次集計に加算してから削除 (1トランザクション)"""
+        try:
+            expired_searches = (await db.execute(
+                select(
+                    SearchHistory.search_id,
+                    SearchHistory.search_date,
+                    SearchHistory.search_type,
+                    SearchHistory.result_count
+                )
+                .where(SearchHistory.search_id <= search_id_limit)
+                .order_by(SearchHistory.search_id)
+                .limit(self.batch_size)
+            )).all()
+            if not expired_searches:
+                return {"search_history_deleted": 0, "search_results_deleted": 0}
+
+            await self._add_to_daily_stats(db, expired_searches)
+
+            search_ids = [expired_search.search_id for expired_search in expired_searches]
+            search_results_result = await db.execute(
+                delete(SearchResult).where(SearchResult.search_id.in_(search_ids))
+            )
+            await db.execute(delete(SearchHistory).where(SearchHistory.search_id.in_(search_ids)))
+            await db.commit()
+
+            return {
+                "search_history_deleted" : len(search_ids),
+                "search_results_deleted" : search_results_result.rowcount,
+            }
+
+        except Exception as e:
+            await db.rollback()
+            raise Exception(f"検索履歴削除エラー: {str(e)}")
+
+    async def _add_to_daily_stats(self, db: AsyncSession, expired_searches: List) -> None:
+        """検索履歴を (日付, 検索タイプ) ごとに集計して日次集計テーブルに加算"""
+        daily_counts = defaultdict(lambda: {"search_count": 0, "zero_result_count": 0, "total_result_count": 0})
+        for expired_search in expired_searches:
+            search_date  = expired_search.search_date or datetime.now(timezone.utc).replace(tzinfo=None)
+            result_count = expired_search.result_count or 0
+            daily_count  = daily_counts[(search_date.date(), expired_search.search_type)]
+            daily_count["search_count"]       += 1
+            daily_count["zero_result_count"]  += 1 if result_count == 0 else 0
+            daily_count["total_result_count"] += result_count
+
+        for (stat_date, search_type), daily_count in daily_counts.items():
+            daily_stat = await db.get(SearchDailyStat, (stat_date, search_type))
+            if daily_stat is None:
+                db.add(SearchDailyStat(stat_date=stat_date, search_type=search_type, **daily_count))
+            else:
+                daily_stat.search_count       += daily_count["search_count"]
+                daily_stat.zero_result_count  += daily_count["zero_result_count"]
+                daily_stat.total_result_count += daily_count["total_result_count"]
+
+    async def _delete_qa_history(self, db: AsyncSession, qa_id_limit: int) -> int:
+        """最も古い質問履歴batch_size件を削除 (1トランザクション)"""
+        try:
+            expired_qa_ids = (await db.scalars(
+                select(QAHistory.qa_id)
+                .where(QAHistory.qa_id <= qa_id_limit)
+                .order_by(QAHistory.qa_id)
+                .limit(self.batch_size)
+            )).all()
+            if not expired_qa_ids:
+                return 0
+
+            await db.execute(delete(QAHistory).where(QAHistory.qa_id.in_(expired_qa_ids)))
+            await db.commit()
+            return len(expired_qa_ids)
+
+        except Exception as e:
+            await db.rollback()
+            raise Exception(f"質問履歴削除エラー: {str(e)}")
+
+    async def _run_incremental_vacuum(self, db: AsyncSession) -> int:
+        """削除で空いたページをincremental_vacuumでファイルから返却し、返却したページ数を返す"""
+        if db.bind.dialect.name != "sqlite" or self.incremental_vacuum_pages <= 0:
+            return 0
+
+        auto_vacuum_mode = await db.scalar(text("PRAGMA auto_vacuum"))
+        if auto_vacuum_mode != AUTO_VACUUM_INCREMENTAL:
+            return 0
+
+        free_pages_before = await db.scalar(text("PRAGMA freelist_count"))
+        await db.commit()
+        # 一度に返却するページ数を制限し、書き込みロックを長時間保持しない
+        # (通常のexecuteでは1ステップで止まり1ページしか返却されないため、executescriptで最後まで実行する)
+        raw_connection = await (await db.connection()).get_raw_connection()
+        await raw_connection.driver_connection.executescript(
+            f"PRAGMA incremental_vacuum({int(self.incremental_vacuum_pages)});"
+        )
+        free_pages_after = await db.scalar(text("PRAGMA freelist_count"))
+        return free_pages_before - free_pages_after
@@ -0,0 +1,140 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from models.api_models import SearchResultItem
+
+load_dotenv()
+
+# 検索結果1件あたりの、文字列以外 (オブジェクト・数値・日時) のおおよそのメモリ量(バイト)
+RESULT_ITEM_OVERHEAD_BYTES = 600
+
+# キャッシュエントリ1件あたりの、結果以外 (キー・リスト・辞書) のおおよそのメモリ量(バイト)
+ENTRY_OVERHEAD_BYTES = 400
+
+SearchCacheKey = Tuple[str, str, int, str]
+
+
+class SearchCache:
+    """検索結果のインメモリキャッシュ (コーパスのバージョンで無効化、メモリ量・件数の上限付きLRU)"""
+
+    def __init__(
+        self,
+        enabled     : Optional[bool] = None,
+        max_entries : Optional[int]  = None,
+        max_bytes   : Optional[int]  = None
+    ):
+        self.enabled     = enabled if enabled is not None else os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+        self.max_entries = max_entries or int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+        self.max_bytes   = max_bytes or int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+        # 検索キー -> (検索結果, キーワード別の論文数, 見積もりメモリ量)
+        self._entries: "OrderedDict[SearchCacheKey, Tuple[List[SearchResultItem], Dict[str, int], int]]" = OrderedDict()
+        # キャッシュ中の結果を作成した時点のコーパスのバージョン
+        self._corpus_version = 0
+        self._total_bytes    = 0
+
+        self.hit_count          = 0
+        self.miss_count         = 0
+        self.eviction_count     = 0
+        self.invalidation_count = 0
+
+    def build_key(self, query: str, search_type: str, limit: int, keyword_match: str) -> SearchCacheKey:
+        """検索条件からキャッシュキーを作成
+
+        全角・半角や空白の違いでも検索タイプによっては結果が変わるため (キーワードの区切りの改行など)、クエリは正規化せずにそのまま使う
+        """
+        return (query, search_type, limit, keyword_match)
+
+    def get(
+        self,
+        cache_key      : SearchCacheKey,
+        corpus_version : int
+    ) -> Optional[Tuple[List[SearchResultItem], Dict[str, int]]]:
+        """キャッシュ済みの検索結果を取得 (コーパスが更新済みの場合はNone)"""
+        if not self.enabled:
+            return None
+
+        self._invalidate_if_stale(corpus_version)
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            self.miss_count += 1
+            return None
+
+        self._entries.move_to_end(cache_key)
+        self.hit_count += 1
+        search_results, keyword_counts, _ = entry
+        return list(search_results), dict(keyword_counts)
+
+    def set(
+        self,
+        cache_key      : SearchCacheKey,
+        corpus_version : int,
+        search_results : List[SearchResultItem],
+        keyword_counts : Dict[str, int]
+    ) -> None:
+        """検索結果を登録し、上限を超えた場合は最も長く使われていないものから破棄"""
+        # 検索中にコーパスが更新された場合、その結果は登録しない
+        if not self.enabled or corpus_version < self._corpus_version:
+            return
+        self._invalidate_if_stale(corpus_version)
+
+        entry_bytes = self._estimate_entry_bytes(cache_key, search_results, keyword_counts)
+        if entry_bytes > self.max_bytes:
+            return
+
+        self._remove(cache_key)
+        self._entries[cache_key] = (list(search_results), dict(keyword_counts), entry_bytes)
+        self._total_bytes += entry_bytes
+
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            evicted_key = next(iter(self._entries))
+            self._remove(evicted_key)
+            self.eviction_count += 1
+
+    def _invalidate_if_stale(self, corpus_version: int) -> None:
+        """コーパスが更新されていれば、それ以前の検索結果をすべて破棄"""
+        if corpus_version == self._corpus_version:
+            return
+        if self._entries:
+            self.invalidation_count += 1
+        self._entries.clear()
+        self._total_bytes    = 0
+        self._corpus_version = corpus_version
+
+    def _remove(self, cache_key: SearchCacheKey) -> None:
+        """エントリを削除してメモリ量の合計から差し引く"""
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self._total_bytes -= entry[2]
+
+    def _estimate_entry_bytes(
+        self,
+        cache_key      : SearchCacheKey,
+        search_results : List[SearchResultItem],
+        keyword_counts : Dict[str, int]
+    ) -> int:
+        """エントリのおおよそのメモリ量を文字列長から見積もる"""
+        string_length = len(cache_key[0]) + sum(len(keyword) for keyword in keyword_counts)
+        for search_result in search_results:
+            string_length += len(search_result.title or "") + len(search_result.authors or "") + len(search_result.abstract or "")
+            string_length += sum(len(keyword) for keyword in search_result.keywords or [])
+        # CPythonの文字列は日本語を含むと1文字あたり2バイト以上になる
+        return ENTRY_OVERHEAD_BYTES + len(search_results) * RESULT_ITEM_OVERHEAD_BYTES + string_length * 2
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット率・メモリ使用量などの統計情報を取得"""
+        request_count = self.hit_count + self.miss_count
+        return {
+            "enabled"        : self.enabled,
+            "entries"        : len(self._entries),
+            "max_entries"    : self.max_entries,
+            "bytes"          : self._total_bytes,
+            "max_bytes"      : self.max_bytes,
+            "corpus_version" : self._corpus_version,
+            "hits"           : self.hit_count,
+            "misses"         : self.miss_count,
+            "evictions"      : self.eviction_count,
+            "invalidations"  : self.invalidation_count,
+            "hit_rate"       : self.hit_count / request_count if request_count else 0.0,
+        }
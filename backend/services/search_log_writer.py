@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database.connection import AsyncSessionLocal
+from models.database_models import SearchHistory, SearchResult
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SearchLogEntry:
+    """書き込み待ちの検索履歴"""
+    search_query : str
+    search_type  : str
+    user_session : str
+    result_count : int
+    search_date  : datetime
+    # (paper_id, relevance_score) のリスト (サンプリング対象外の場合は空)
+    results      : List[Tuple[int, float]] = field(default_factory=list)
+
+
+class SearchLogWriter:
+    """検索履歴・検索結果をバッファリングし、一括INSERTで書き込むサービス"""
+
+    def __init__(
+        self,
+        session_factory        : async_sessionmaker  = AsyncSessionLocal,
+        enabled                : Optional[bool]      = None,
+        result_sample_rate     : Optional[float]     = None,
+        batch_size             : Optional[int]       = None,
+        flush_interval_seconds : Optional[float]     = None,
+        max_buffered_entries   : Optional[int]       = None,
+        random_ratio           : Callable[[], float] = random.random
+    ):
+        self.session_factory        = session_factory
+        self.enabled                = enabled if enabled is not None else os.getenv("SEARCH_LOG_ENABLED", "true").lower() == "true"
+        self.result_sample_rate     = result_sample_rate if result_sample_rate is not None else float(os.getenv("SEARCH_RESULT_LOG_SAMPLE_RATE", "1.0"))
+        self.batch_size             = batch_size or int(os.getenv("SEARCH_LOG_BATCH_SIZE", "200"))
+        self.flush_interval_seconds = flush_interval_seconds or float(os.getenv("SEARCH_LOG_FLUSH_INTERVAL_SECONDS", "1.0"))
+        self.max_buffered_entries   = max_buffered_entries or int(os.getenv("SEARCH_LOG_MAX_BUFFERED_ENTRIES", "10000"))
+        self._random_ratio          = random_ratio
+
+        self._buffer: List[SearchLogEntry] = []
+        self._flush_requested = asyncio.Event()
+        self._flush_lock      = asyncio.Lock()
+        self._writer_task: Optional[asyncio.Task] = None
+
+        self.written_count      = 0
+        self.dropped_count      = 0
+        self.failed_flush_count = 0
+
+    def record(
+        self,
+        search_query : str,
+        search_type  : str,
+        user_session : str,
+        results      : List[Tuple[int, float]]
+    ) -> None:
+        """検索履歴をバッファに追加 (データベースには書き込まない)"""
+        if not self.enabled:
+            return
+
+        # 書き込みが追いつかない場合は、メモリを使い切らないよう新しい履歴を破棄する
+        if len(self._buffer) >= self.max_buffered_entries:
+            self.dropped_count += 1
+            return
+
+        self._buffer.append(SearchLogEntry(
+            search_query = search_query,
+            search_type  = search_type,
+            user_session = user_session,
+            result_count = len(results),
+            # CURRENT_TIMESTAMPと同じくUTCで記録する
+            search_date  = datetime.now(timezone.utc).replace(tzinfo=None),
+            results      = results if self._random_ratio() < self.result_sample_rate else []
+        ))
+        if len(self._buffer) >= self.batch_size:
+            self._flush_requested.set()
+
+    async def start(self) -> None:
+        """定期書き込みタスクを起動"""
+        if self.enabled:
+            self._writer_task = asyncio.create_task(self._run_writer())
+
+    async def stop(self) -> None:
+        """定期書き込みタスクを停止し、残りの履歴を書き込む"""
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+            self._writer_task = None
+        await self.flush()
+
+    async def _run_writer(self) -> None:
+        """件数または時間の閾値に達するたびにバッファを書き込む"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """バッファ内の検索履歴・検索結果を1トランザクションで書き込む"""
+        async with self._flush_lock:
+            entries, self._buffer = self._buffer, []
+            if not entries:
+                return
+
+            async with self.session_factory() as db:
+                try:
+                    search_histories = [
+                        SearchHistory(
+                            search_query = entry.search_query,
+                            search_type  = entry.search_type,
+                            result_count = entry.result_count,
+                            search_date  = entry.search_date,
+                            user_session = entry.user_session
+                        )
+                        for entry in entries
+                    ]
+                    # 複数行INSERT (RETURNING) でsearch_idを採番する
+                    db.add_all(search_histories)
+                    await db.flush()
+
+                    search_result_rows = [
+                        {"search_id": search_history.search_id, "paper_id": paper_id, "relevance_score": relevance_score}
+                        for search_history, entry in zip(search_histories, entries)
+                        for paper_id, relevance_score in entry.results
+                    ]
+                    if search_result_rows:
+                        await db.execute(insert(SearchResult), search_result_rows)
+
+                    await db.commit()
+                    self.written_count += len(entries)
+
+                except Exception:
+                    # 検索履歴の書き込み失敗で検索を止めないよう、このバッチは破棄する
+                    await db.rollback()
+                    self.failed_flush_count += 1
+                    self.dropped_count      += len(entries)
+                    logger.exception("検索履歴書き込みエラー (%d件を破棄)", len(entries))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """書き込み件数などの統計情報を取得"""
+        return {
+            "enabled"            : self.enabled,
+            "result_sample_rate" : self.result_sample_rate,
+            "buffered"           : len(self._buffer),
+            "written"            : self.written_count,
+            "dropped"            : self.dropped_count,
+            "failed_flushes"     : self.failed_flush_count,
+        }
@@ -1,141 +1,459 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import text, or_, and_
-from typing import List, Dict, Any
-from models.database_models import Paper, SearchHistory, SearchResult
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text, or_, func, literal_column
+from typing import List, Dict, Any, Awaitable, Optional, Tuple
+from collections import defaultdict
+from dotenv import load_dotenv
+from database.full_text_index import (
+    FULL_TEXT_INDEX_COLUMNS,
+    TRIGRAM_MINIMUM_TERM_LENGTH,
+    papers_fts_table,
+    quote_full_text_term
+)
+from database.keyword_index import normalize_keyword, normalize_keywords
+from models.database_models import Paper, PaperKeyword, SearchHistory
 from models.api_models import SearchResultItem
+from services.corpus_version import CorpusVersion, default_corpus_version
+from services.metrics import record_stage_timings
+from services.paper_embedding_indexer import PaperEmbeddingIndexer
+from services.search_cache import SearchCache
+from services.search_log_writer import SearchLogWriter
+import asyncio
+import os
+import re
+import time
 import uuid
 
+load_dotenv()
+
+# キーワード検索で複数のキーワードを区切る文字 (含まない場合は空白で区切る)
+KEYWORD_DELIMITER_PATTERN = re.compile(r"[,、，\n]+")
+
 
 class SearchService:
     """論文検索サービス"""
 
+    # 対応する検索タイプ (それ以外はキーワード検索として扱う)
+    SEARCH_TYPES = ("keyword", "title", "author", "full_text", "semantic", "hybrid")
+
+    # BM25のフィールド別重み (papers_ftsのカラム順に適用される)
+    FIELD_WEIGHTS = {
+        "title"                : 10.0,
+        "authors"              : 1.0,
+        "abstract"             : 5.0,
+        "keywords"             : 8.0,
+        "summary_introduction" : 2.0,
+        "summary_methods"      : 2.0,
+        "summary_results"      : 2.0,
+        "summary_discussion"   : 1.5,
+        "summary_conclusion"   : 2.0,
+    }
+
+    def __init__(
+        self,
+        paper_embedding_indexer : Optional[PaperEmbeddingIndexer] = None,
+        search_log_writer       : Optional[SearchLogWriter]       = None,
+        rrf_k                   : Optional[int]                   = None,
+        hybrid_candidate_count  : Optional[int]                   = None,
+        lexical_weight          : Optional[float]                 = None,
+        semantic_weight         : Optional[float]                 = None,
+        search_cache            : Optional[SearchCache]           = None,
+        corpus_version          : CorpusVersion                   = default_corpus_version
+    ):
+        self.paper_embedding_indexer = paper_embedding_indexer
+        self.search_log_writer       = search_log_writer
+        self.search_cache            = search_cache or SearchCache()
+        self.corpus_version          = corpus_version
+        # Reciprocal Rank Fusionの定数k (大きいほど下位の順位の寄与が相対的に大きくなる)
+        self.rrf_k                   = rrf_k or int(os.getenv("HYBRID_RRF_K", "60"))
+        self.hybrid_candidate_count  = hybrid_candidate_count or int(os.getenv("HYBRID_CANDIDATE_COUNT", "100"))
+        self.lexical_weight          = lexical_weight or float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+        self.semantic_weight         = semantic_weight or float(os.getenv("HYBRID_SEMANTIC_WEIGHT", "1.0"))
+
     async def search_papers(
         self,
         query: str,
         search_type: str = "keyword",
         limit: int = 20,
-        db: Session = None
+        db: AsyncSession = None,
+        timings: Optional[Dict[str, float]] = None,
+        keyword_match: str = "all",
+        keyword_counts: Optional[Dict[str, int]] = None
     ) -> List[SearchResultItem]:
-        """論文を検索"""
+        """論文を検索 (timings・keyword_countsを渡すと所要時間 (ミリ秒)・キーワード別の論文数を書き込む)"""
+        timings        = timings if timings is not None else {}
+        keyword_counts = keyword_counts if keyword_counts is not None else {}
         try:
-            # 検索履歴を保存
-            search_session = str(uuid.uuid4())
-            search_history = SearchHistory(
-                search_query=query,
-                search_type=search_type,
-                user_session=search_session
-            )
-            db.add(search_history)
-            db.commit()
-            db.refresh(search_history)
-            
-            # 検索タイプに応じて検索実行
-            papers = []
+            # 同じ検索条件の結果は、論文が追加・更新されるまでキャッシュから返す
+            cache_started_at = time.perf_counter()
+            cache_key        = self.search_cache.build_key(query, search_type, limit, keyword_match)
+            corpus_version   = await self.corpus_version.load(db)
+            cached_search    = self.search_cache.get(cache_key, corpus_version)
+            timings["cache_ms"] = self._elapsed_milliseconds(cache_started_at)
+            if cached_search is not None:
+                search_results, cached_keyword_counts = cached_search
+                keyword_counts.update(cached_keyword_counts)
+                self._record_search_log(
+                    query, search_type,
+                    [(search_result.paper_id, search_result.relevance_score) for search_result in search_results]
+                )
+                return search_results
+
+            # 検索タイプに応じて検索実行 (読み取りのみ)
+            search_started_at = time.perf_counter()
+            scored_papers = []
             if search_type == "keyword":
-                papers = await self._search_by_keywords(query, limit, db)
+                scored_papers = await self._search_by_keywords(query, limit, db, keyword_match, keyword_counts)
             elif search_type == "title":
-                papers = await self._search_by_title(query, limit, db)
+                scored_papers = await self._search_by_title(query, limit, db)
             elif search_type == "author":
-                papers = await self._search_by_author(query, limit, db)
+                scored_papers = await self._search_by_author(query, limit, db)
             elif search_type == "full_text":
-                papers = await self._search_full_text(query, limit, db)
+                scored_papers = await self._search_full_text(query, limit, db)
+            elif search_type == "semantic":
+                scored_papers = await self._search_semantic(query, limit, db)
+            elif search_type == "hybrid":
+                scored_papers = await self._search_hybrid(query, limit, db, timings)
             else:
-                papers = await self._search_by_keywords(query, limit, db)
-            
-            # 検索結果数を更新
-            search_history.result_count = len(papers)
-            db.commit()
+                scored_papers = await self._search_by_keywords(query, limit, db, keyword_match, keyword_counts)
+            timings["search_ms"] = self._elapsed_milliseconds(search_started_at)
             
-            # 検索結果を保存
-            for paper in papers:
-                search_result = SearchResult(
-                    search_id=search_history.search_id,
-                    paper_id=paper.paper_id,
-                    relevance_score=1.0  # 簡易的なスコア
-                )
-                db.add(search_result)
-            db.commit()
+            self._record_search_log(
+                query, search_type, [(paper.paper_id, relevance_score) for paper, relevance_score in scored_papers]
+            )
             
             # レスポンス形式に変換
-            return [
+            search_results = [
                 SearchResultItem(
                     paper_id=paper.paper_id,
                     title=paper.title,
                     authors=paper.authors,
                     abstract=paper.abstract,
                     keywords=paper.keywords,
-                    relevance_score=1.0,
+                    relevance_score=relevance_score,
                     upload_date=paper.upload_date
                 )
-                for paper in papers
+                for paper, relevance_score in scored_papers
             ]
+            self.search_cache.set(cache_key, corpus_version, search_results, keyword_counts)
+            return search_results
             
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise Exception(f"論文検索エラー: {str(e)}")
+        finally:
+            # メトリクスのラベルが増えすぎないよう、未対応の検索タイプはkeywordとして記録する
+            metrics_search_type = search_type if search_type in self.SEARCH_TYPES else "keyword"
+            record_stage_timings(f"search_{metrics_search_type}", timings)
 
-    async def _search_by_keywords(self, query: str, limit: int, db: Session) -> List[Paper]:
-        """キーワードで検索"""
-        search_terms = [term.strip() for term in query.split() if term.strip()]
-        
-        conditions = []
-        for term in search_terms:
-            keyword_condition = text(f"'{term}' = ANY(keywords)")
-            title_condition = Paper.title.ilike(f"%{term}%")
-            abstract_condition = Paper.abstract.ilike(f"%{term}%")
-            
-            conditions.append(or_(keyword_condition, title_condition, abstract_condition))
-        
-        if not conditions:
+    def _record_search_log(self, query: str, search_type: str, results: List[Tuple[int, float]]) -> None:
+        """検索履歴・検索結果をバッファに積み、バックグラウンドでまとめて書き込む"""
+        if self.search_log_writer is not None:
+            self.search_log_writer.record(
+                search_query=query,
+                search_type=search_type,
+                user_session=str(uuid.uuid4()),
+                results=results
+            )
+
+    async def _search_by_keywords(
+        self,
+        query          : str,
+        limit          : int,
+        db             : AsyncSession,
+        keyword_match  : str                      = "all",
+        keyword_counts : Optional[Dict[str, int]] = None
+    ) -> List[Tuple[Paper, float]]:
+        """キーワード索引 (paper_keywords) で検索 (all: すべて含む, any: いずれかを含む)"""
+        search_keywords = self._split_search_keywords(query)
+        if not search_keywords:
             return []
-        
-        query_filter = and_(*conditions) if len(conditions) > 1 else conditions[0]
-        
-        return db.query(Paper).filter(query_filter).limit(limit).all()
 
-    async def _search_by_title(self, query: str, limit: int, db: Session) -> List[Paper]:
+        # 区切り文字のない複数語のクエリ (「graph neural networks」など) は、まずクエリ全体を1つのキーワードとして検索し、
+        # 一致する論文がない場合のみ空白で区切った各語で検索する
+        if len(search_keywords) > 1 and not KEYWORD_DELIMITER_PATTERN.search(query):
+            whole_query_keyword_counts = {}
+            scored_papers = await self._search_by_keyword_list(
+                [normalize_keyword(query)], limit, db, keyword_match, whole_query_keyword_counts
+            )
+            if scored_papers:
+                if keyword_counts is not None:
+                    keyword_counts.update(whole_query_keyword_counts)
+                return scored_papers
+
+        return await self._search_by_keyword_list(search_keywords, limit, db, keyword_match, keyword_counts)
+
+    async def _search_by_keyword_list(
+        self,
+        search_keywords : List[str],
+        limit           : int,
+        db              : AsyncSession,
+        keyword_match   : str                      = "all",
+        keyword_counts  : Optional[Dict[str, int]] = None
+    ) -> List[Tuple[Paper, float]]:
+        """正規化済みキーワードで検索し、一致したキーワード数・BM25スコアの順に並べる"""
+        # 検索キーワードごとの論文数 (絞り込み前)
+        if keyword_counts is not None:
+            count_result = await db.execute(
+                select(PaperKeyword.keyword_normalised, func.count())
+                .where(PaperKeyword.keyword_normalised.in_(search_keywords))
+                .group_by(PaperKeyword.keyword_normalised)
+            )
+            matched_counts = dict(count_result.all())
+            keyword_counts.update({
+                search_keyword: matched_counts.get(search_keyword, 0)
+                for search_keyword in search_keywords
+            })
+
+        # 索引上で論文ごとに一致したキーワード数を集計してから論文と結合する
+        matched_papers = (
+            select(PaperKeyword.paper_id, func.count().label("matched_keyword_count"))
+            .where(PaperKeyword.keyword_normalised.in_(search_keywords))
+            .group_by(PaperKeyword.paper_id)
+        )
+        if keyword_match != "any":
+            matched_papers = matched_papers.having(func.count() == len(search_keywords))
+        matched_papers = matched_papers.subquery()
+
+        paper_query = (
+            select(Paper, matched_papers.c.matched_keyword_count)
+            .join(matched_papers, matched_papers.c.paper_id == Paper.paper_id)
+        )
+        # 一致したキーワード数が同じ論文は、タイトル・要約などでのキーワードのBM25スコア順に並べる
+        indexed_keywords = [keyword for keyword in search_keywords if len(keyword) >= TRIGRAM_MINIMUM_TERM_LENGTH]
+        if indexed_keywords:
+            bm25_scores = self._build_keyword_bm25_scores(indexed_keywords)
+            paper_query = (
+                paper_query
+                .outerjoin(bm25_scores, bm25_scores.c.paper_id == Paper.paper_id)
+                .order_by(
+                    matched_papers.c.matched_keyword_count.desc(),
+                    func.coalesce(bm25_scores.c.bm25_score, 0.0).desc(),
+                    Paper.paper_id.desc()
+                )
+            )
+        else:
+            paper_query = paper_query.order_by(matched_papers.c.matched_keyword_count.desc(), Paper.paper_id.desc())
+
+        result = await db.execute(paper_query.limit(limit))
+        return [
+            (paper, matched_keyword_count / len(search_keywords))
+            for paper, matched_keyword_count in result.all()
+        ]
+
+    def _build_keyword_bm25_scores(self, indexed_keywords: List[str]):
+        """キーワードに一致する論文ごとのBM25スコア (大きいほど関連度が高い) の共通テーブル式"""
+        # bm25()は小さいほど関連度が高いため、符号を反転してスコアとする
+        bm25_score = literal_column(f"bm25(papers_fts, {self._bm25_weight_arguments()})")
+        match_expression = " OR ".join(quote_full_text_term(keyword) for keyword in indexed_keywords)
+        return (
+            select(papers_fts_table.c.rowid.label("paper_id"), (-bm25_score).label("bm25_score"))
+            .select_from(papers_fts_table)
+            .where(text("papers_fts MATCH :keyword_match_expression").bindparams(keyword_match_expression=match_expression))
+            # rowidでの絞り込みやサブクエリの展開はMATCHを論文ごとに再評価させるため、一度だけ評価して実体化する
+            .cte("keyword_bm25_scores")
+            .prefix_with("MATERIALIZED")
+        )
+
+    async def _search_by_title(self, query: str, limit: int, db: AsyncSession) -> List[Tuple[Paper, float]]:
         """タイトルで検索"""
-        return db.query(Paper).filter(
-            Paper.title.ilike(f"%{query}%")
-        ).limit(limit).all()
+        return await self._search_full_text_index(
+            self._as_phrase_terms(query), ["title"], limit, db
+        )
 
-    async def _search_by_author(self, query: str, limit: int, db: Session) -> List[Paper]:
+    async def _search_by_author(self, query: str, limit: int, db: AsyncSession) -> List[Tuple[Paper, float]]:
         """著者名で検索"""
-        return db.query(Paper).filter(
-            Paper.authors.ilike(f"%{query}%")
-        ).limit(limit).all()
+        return await self._search_full_text_index(
+            self._as_phrase_terms(query), ["authors"], limit, db
+        )
 
-    async def _search_full_text(self, query: str, limit: int, db: Session) -> List[Paper]:
+    async def _search_full_text(self, query: str, limit: int, db: AsyncSession) -> List[Tuple[Paper, float]]:
         """全文検索"""
-        search_terms = [term.strip() for term in query.split() if term.strip()]
-        
-        conditions = []
-        for term in search_terms:
-            conditions.append(
-                or_(
-                    Paper.title.ilike(f"%{term}%"),
-                    Paper.authors.ilike(f"%{term}%"),
-                    Paper.abstract.ilike(f"%{term}%"),
-                    Paper.summary_introduction.ilike(f"%{term}%"),
-                    Paper.summary_methods.ilike(f"%{term}%"),
-                    Paper.summary_results.ilike(f"%{term}%"),
-                    Paper.summary_discussion.ilike(f"%{term}%"),
-                    Paper.summary_conclusion.ilike(f"%{term}%")
-                )
-            )
-        
-        if not conditions:
+        search_terms = self._split_search_terms(query)
+        return await self._search_full_text_index(
+            search_terms, FULL_TEXT_INDEX_COLUMNS, limit, db
+        )
+
+    async def _search_semantic(self, query: str, limit: int, db: AsyncSession) -> List[Tuple[Paper, float]]:
+        """埋め込みのコサイン類似度で検索"""
+        if self.paper_embedding_indexer is None:
+            raise Exception("セマンティック検索が有効になっていません")
+
+        scored_paper_ids = await self.paper_embedding_indexer.search(query, limit)
+        return await self._load_scored_papers(scored_paper_ids, {}, db)
+
+    async def _search_hybrid(
+        self,
+        query   : str,
+        limit   : int,
+        db      : AsyncSession,
+        timings : Dict[str, float]
+    ) -> List[Tuple[Paper, float]]:
+        """全文検索とセマンティック検索を並行実行し、Reciprocal Rank Fusionで統合"""
+        if self.paper_embedding_indexer is None:
+            return await self._search_full_text(query, limit, db)
+
+        # 統合後の上位limit件が候補から漏れないよう、各検索では多めに候補を取得する
+        candidate_count = max(limit, self.hybrid_candidate_count)
+        # クエリの埋め込み・ベクトル検索はデータベースを使わないため、全文検索と同じセッションで並行実行できる
+        lexical_results, semantic_results = await asyncio.gather(
+            self._measure(self._search_full_text(query, candidate_count, db), timings, "lexical_ms"),
+            self._measure(self.paper_embedding_indexer.search(query, candidate_count), timings, "semantic_ms")
+        )
+
+        fusion_started_at = time.perf_counter()
+        fused_scores = defaultdict(float)
+        for rank, (paper, _) in enumerate(lexical_results, start=1):
+            fused_scores[paper.paper_id] += self.lexical_weight / (self.rrf_k + rank)
+        for rank, (paper_id, _) in enumerate(semantic_results, start=1):
+            fused_scores[paper_id] += self.semantic_weight / (self.rrf_k + rank)
+
+        top_paper_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:limit]
+        fused_results = await self._load_scored_papers(
+            [(paper_id, fused_scores[paper_id]) for paper_id in top_paper_ids],
+            {paper.paper_id: paper for paper, _ in lexical_results},
+            db
+        )
+        timings["fusion_ms"] = self._elapsed_milliseconds(fusion_started_at)
+        return fused_results
+
+    async def _load_scored_papers(
+        self,
+        scored_paper_ids : List[Tuple[int, float]],
+        papers_by_id     : Dict[int, Paper],
+        db               : AsyncSession
+    ) -> List[Tuple[Paper, float]]:
+        """(paper_id, score) の順序を保ったまま論文を取得 (取得済みの論文は再取得しない)"""
+        missing_paper_ids = [paper_id for paper_id, _ in scored_paper_ids if paper_id not in papers_by_id]
+        if missing_paper_ids:
+            papers = await db.scalars(select(Paper).where(Paper.paper_id.in_(missing_paper_ids)))
+            papers_by_id = {**papers_by_id, **{paper.paper_id: paper for paper in papers}}
+
+        # 削除済みの論文は除外する
+        return [
+            (papers_by_id[paper_id], score)
+            for paper_id, score in scored_paper_ids
+            if paper_id in papers_by_id
+        ]
+
+    async def _measure(self, operation: Awaitable, timings: Dict[str, float], timing_name: str):
+        """処理の所要時間 (ミリ秒) を記録"""
+        started_at = time.perf_counter()
+        try:
+            return await operation
+        finally:
+            timings[timing_name] = self._elapsed_milliseconds(started_at)
+
+    def _elapsed_milliseconds(self, started_at: float) -> float:
+        """開始時刻からの経過時間 (ミリ秒)"""
+        return round((time.perf_counter() - started_at) * 1000, 3)
+
+    def _split_search_keywords(self, query: str) -> List[str]:
+        """検索クエリを正規化済みキーワードに分割
+
+        カンマ・読点・改行を含む場合はそれらで区切り (空白を含むキーワードを指定できる)、
+        含まない場合は従来どおり空白で区切る。
+        """
+        if KEYWORD_DELIMITER_PATTERN.search(query):
+            return normalize_keywords(KEYWORD_DELIMITER_PATTERN.split(query))
+        return normalize_keywords(query.split())
+
+    def _split_search_terms(self, query: str) -> List[str]:
+        """検索クエリを空白区切りの検索語に分割"""
+        return [term.strip() for term in query.split() if term.strip()]
+
+    def _as_phrase_terms(self, query: str) -> List[str]:
+        """検索クエリ全体を1つのフレーズとして扱う"""
+        phrase = query.strip()
+        return [phrase] if phrase else []
+
+    async def _search_full_text_index(
+        self,
+        search_terms : List[str],
+        column_names : List[str],
+        limit        : int,
+        db           : AsyncSession
+    ) -> List[Tuple[Paper, float]]:
+        """全文検索インデックス (FTS5) で全検索語を含む論文をBM25スコア順に検索"""
+        if not search_terms:
             return []
-        
-        query_filter = and_(*conditions) if len(conditions) > 1 else conditions[0]
-        
-        return db.query(Paper).filter(query_filter).limit(limit).all()
 
-    async def get_search_history(self, user_session: str, db: Session) -> List[Dict[str, Any]]:
+        indexed_terms = [term for term in search_terms if len(term) >= TRIGRAM_MINIMUM_TERM_LENGTH]
+        short_terms   = [term for term in search_terms if len(term) <  TRIGRAM_MINIMUM_TERM_LENGTH]
+
+        if indexed_terms:
+            # bm25()は小さいほど関連度が高いため、符号を反転してスコアとする
+            bm25_score = literal_column(f"bm25(papers_fts, {self._bm25_weight_arguments()})")
+            paper_query = select(Paper, -bm25_score)
+        else:
+            bm25_score = None
+            paper_query = select(Paper, literal_column("0.0"))
+
+        paper_query = paper_query.join(
+            papers_fts_table, papers_fts_table.c.rowid == Paper.paper_id
+        )
+
+        if indexed_terms:
+            match_expression = "{%s} : (%s)" % (
+                " ".join(column_names),
+                " AND ".join(quote_full_text_term(term) for term in indexed_terms)
+            )
+            paper_query = paper_query.where(
+                text("papers_fts MATCH :match_expression").bindparams(match_expression=match_expression)
+            )
+
+        # trigramで索引化できない短い検索語は、索引テーブル上の部分一致で絞り込む
+        for term in short_terms:
+            like_pattern = "%" + self._escape_like_pattern(term) + "%"
+            paper_query = paper_query.where(or_(*[
+                papers_fts_table.c[column_name].like(like_pattern, escape="\\")
+                for column_name in column_names
+            ]))
+
+        # ORDER BY + LIMITによりSQLite側で上位limit件のみを保持する
+        if bm25_score is not None:
+            paper_query = paper_query.order_by(bm25_score)
+        else:
+            paper_query = paper_query.order_by(Paper.upload_date.desc())
+
+        result = await db.execute(paper_query.limit(limit))
+        return [
+            (paper, float(relevance_score))
+            for paper, relevance_score in result.all()
+        ]
+
+    def _bm25_weight_arguments(self) -> str:
+        """bm25()に渡すカラム順の重み引数を作成"""
+        return ", ".join(
+            repr(float(self.FIELD_WEIGHTS.get(column_name, 1.0)))
+            for column_name in FULL_TEXT_INDEX_COLUMNS
+        )
+
+    def _escape_like_pattern(self, term: str) -> str:
+        """LIKEのワイルドカード文字をエスケープ"""
+        return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    async def get_keyword_facets(self, limit: int, db: AsyncSession) -> List[Dict[str, Any]]:
+        """論文数の多いキーワードを取得"""
+        paper_count = func.count().label("paper_count")
+        result = await db.execute(
+            select(PaperKeyword.keyword_normalised, paper_count)
+            .group_by(PaperKeyword.keyword_normalised)
+            .order_by(paper_count.desc(), PaperKeyword.keyword_normalised)
+            .limit(limit)
+        )
+        return [
+            {"keyword": keyword, "paper_count": keyword_paper_count}
+            for keyword, keyword_paper_count in result.all()
+        ]
+
+    async def get_search_history(self, user_session: str, db: AsyncSession) -> List[Dict[str, Any]]:
         """検索履歴を取得"""
-        history = db.query(SearchHistory).filter(
-            SearchHistory.user_session == user_session
-        ).order_by(SearchHistory.search_date.desc()).limit(20).all()
+        result = await db.execute(
+            select(SearchHistory).where(
+                SearchHistory.user_session == user_session
+            ).order_by(SearchHistory.search_date.desc()).limit(20)
+        )
+        history = result.scalars().all()
         
         return [
             {
@@ -0,0 +1,43 @@
+import asyncio
+import json
+from typing import Any, AsyncGenerator, TypeVar
+from starlette.requests import Request
+
+ItemType = TypeVar("ItemType")
+
+# クライアントの切断を確認する間隔(秒)
+DISCONNECT_POLL_INTERVAL_SECONDS = 0.5
+
+
+def format_server_sent_event(event_name: str, data: Any) -> str:
+    """Server-Sent Eventsの1イベントを作成 (データは改行を含まないようJSONで送る)"""
+    return f"event: {event_name}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def iterate_until_disconnected(
+    http_request          : Request,
+    source                : AsyncGenerator[ItemType, None],
+    poll_interval_seconds : float = DISCONNECT_POLL_INTERVAL_SECONDS
+) -> AsyncGenerator[ItemType, None]:
+    """sourceを読み進め、クライアントが切断した時点でsourceの処理をキャンセルして終了"""
+    # 次の要素を待つ間 (Gemini APIの生成待ちなど) も切断を検知できるよう、別タスクで読み進める
+    next_item_task = None
+    try:
+        while True:
+            next_item_task = asyncio.ensure_future(anext(source))
+            while not next_item_task.done():
+                await asyncio.wait({next_item_task}, timeout=poll_interval_seconds)
+                if not next_item_task.done() and await http_request.is_disconnected():
+                    return
+
+            try:
+                item = next_item_task.result()
+            except StopAsyncIteration:
+                return
+            next_item_task = None
+            yield item
+    finally:
+        if next_item_task is not None and not next_item_task.done():
+            next_item_task.cancel()
+            await asyncio.gather(next_item_task, return_exceptions=True)
+        await source.aclose()
@@ -0,0 +1,72 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import UploadFile
+
+load_dotenv()
+
+# 1回に読み書きするチャンクサイズ (アップロード1件あたりのメモリ使用量の上限)
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> Tuple[str, int]:
+    """ディスク上のファイルをチャンク単位で読み、SHA-256とサイズを計算"""
+    file_hasher = hashlib.sha256()
+    file_size   = 0
+    with open(file_path, "rb") as source_file:
+        while chunk := source_file.read(SPOOL_CHUNK_SIZE):
+            file_size += len(chunk)
+            file_hasher.update(chunk)
+    return file_hasher.hexdigest(), file_size
+
+
+class UploadTooLargeError(Exception):
+    """アップロードサイズ上限超過エラー"""
+
+
+@dataclass
+class SpooledUpload:
+    """ディスクに書き出したアップロードファイル"""
+    file_path : str
+    file_hash : str
+    file_size : int
+
+
+class UploadSpooler:
+    """アップロードファイルをチャンク単位でディスクに書き出すサービス"""
+
+    def __init__(self, max_upload_size_bytes: Optional[int] = None):
+        self.max_upload_size_bytes = max_upload_size_bytes or int(os.getenv("MAX_UPLOAD_SIZE_MB", "100")) * 1024 * 1024
+
+    def spool(self, file: UploadFile, spool_file_path: str) -> SpooledUpload:
+        """1パスで書き出し・SHA-256・サイズ計算を行う (ブロッキングI/Oのためスレッドで実行すること)"""
+        file_hasher = hashlib.sha256()
+        file_size   = 0
+
+        file.file.seek(0)
+        try:
+            with open(spool_file_path, "wb") as spool_file:
+                while chunk := file.file.read(SPOOL_CHUNK_SIZE):
+                    file_size += len(chunk)
+                    if file_size > self.max_upload_size_bytes:
+                        raise UploadTooLargeError(
+                            f"ファイルサイズが上限 ({self.max_upload_size_bytes // (1024 * 1024)}MB) を超えています"
+                        )
+                    file_hasher.update(chunk)
+                    spool_file.write(chunk)
+        except Exception:
+            self.remove(spool_file_path)
+            raise
+
+        return SpooledUpload(
+            file_path = spool_file_path,
+            file_hash = file_hasher.hexdigest(),
+            file_size = file_size
+        )
+
+    def remove(self, spool_file_path: str) -> None:
+        """書き出したファイルを削除"""
+        if os.path.exists(spool_file_path):
+            os.unlink(spool_file_path)
@@ -0,0 +1,345 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 圧縮時に保存済みの行列から一度に読み込む行数 (行列全体をメモリに載せない)
+COMPACTION_BLOCK_ROWS = 4096
+
+
+class VectorIndex:
+    """論文埋め込みのベクトルインデックス (メモリマップしたfloat32行列 + 差分)
+
+    保存済みの行列は読み取り専用でメモリマップし、追加・更新・削除はメモリ上の差分に反映する。
+    save()では前回の保存以降の操作を差分ログに追記し、差分ログが行列に対して大きくなった場合のみ
+    差分を統合した行列を新しい世代のファイルに書き出す (圧縮)。メタデータの置き換えで世代を切り替えるため、
+    書き出し途中で中断されても直前の世代を読み込める。
+    """
+
+    EMBEDDINGS_FILE_NAME = "embeddings-{generation}.npy"
+    PAPER_IDS_FILE_NAME  = "paper_ids-{generation}.npy"
+    DELTA_FILE_NAME      = "delta-{generation}.bin"
+    METADATA_FILE_NAME   = "metadata.json"
+    GENERATION_FILE_PATTERN = re.compile(r"^(?:embeddings|paper_ids|delta)-(\d+)\.(?:npy|bin)$")
+
+    def __init__(
+        self,
+        index_directory        : str,
+        backend_name           : str,
+        dimension              : int,
+        compaction_ratio       : float = 0.5,
+        compaction_min_records : int   = 4096
+    ):
+        self.index_directory = index_directory
+        self.backend_name    = backend_name
+        self.dimension       = dimension
+        # 差分ログの記録数が「行列の行数 × compaction_ratio」とcompaction_min_recordsの大きい方を超えたら圧縮する
+        self.compaction_ratio       = compaction_ratio
+        self.compaction_min_records = compaction_min_records
+
+        self._lock      = threading.Lock()
+        # 差分ログへの追記・圧縮は同時に1つのみ実行する (検索・登録は_lockのみで並行に行える)
+        self._save_lock = threading.Lock()
+        self._delta_record_dtype = np.dtype([
+            ("paper_id",  "<i8"),
+            ("removed",   "?"),
+            ("embedding", "<f4", (dimension,)),
+        ])
+
+        self._generation         = 0
+        # 保存済みの行列がない (または読み込めなかった) 場合は、次回の保存で圧縮して新しい世代を作る
+        self._needs_compaction   = True
+        self._delta_record_count = 0
+        self._base_embeddings    = np.zeros((0, dimension), dtype=np.float32)
+        self._base_paper_ids     = np.zeros(0, dtype=np.int64)
+        self._base_positions     : Dict[int, int]        = {}
+        self._removed_positions  : Set[int]              = set()
+        self._delta_embeddings   : Dict[int, np.ndarray] = {}
+        # 差分ログに未保存の操作 (paper_id, 埋め込み。削除の場合はNone)
+        self._unsaved_operations : List[Tuple[int, Optional[np.ndarray]]] = []
+
+    @property
+    def pending_count(self) -> int:
+        """未保存の追加・更新・削除件数"""
+        return len(self._unsaved_operations)
+
+    def load(self) -> None:
+        """保存済みのインデックスを読み込み (埋め込み方式が異なる・ファイルが壊れている場合は空で開始)"""
+        metadata_path = os.path.join(self.index_directory, self.METADATA_FILE_NAME)
+        if not os.path.exists(metadata_path):
+            return
+
+        try:
+            with open(metadata_path, encoding="utf-8") as metadata_file:
+                metadata = json.load(metadata_file)
+        except (OSError, ValueError) as e:
+            logger.warning("ベクトルインデックスのメタデータを読み込めないため、空のインデックスで開始します: %s", e)
+            return
+        if metadata.get("backend_name") != self.backend_name or metadata.get("dimension") != self.dimension:
+            return
+
+        generation  = metadata.get("generation")
+        paper_count = metadata.get("paper_count")
+        if not isinstance(generation, int) or not isinstance(paper_count, int):
+            logger.warning("ベクトルインデックスのメタデータに世代・論文数がないため、空のインデックスで開始します")
+            return
+        # 読み込めなかった場合も、次回の圧縮では既存のファイルと重ならない世代に書き出す
+        self._generation = generation
+
+        try:
+            base_embeddings = np.load(self._get_file_path(self.EMBEDDINGS_FILE_NAME, generation), mmap_mode="r")
+            base_paper_ids  = np.load(self._get_file_path(self.PAPER_IDS_FILE_NAME, generation))
+            delta_records   = self._read_delta_records(generation)
+        except (OSError, ValueError) as e:
+            logger.warning("ベクトルインデックスを読み込めないため、空のインデックスで開始します: %s", e)
+            return
+
+        # 埋め込みと論文IDの行数がずれていると検索結果の論文を取り違えるため、一致しない場合は使わない
+        if base_embeddings.shape != (paper_count, self.dimension) or base_paper_ids.shape != (paper_count,):
+            logger.warning(
+                "ベクトルインデックスの行数が一致しないため、空のインデックスで開始します "
+                "(paper_count=%d, embeddings=%s, paper_ids=%s)",
+                paper_count, base_embeddings.shape, base_paper_ids.shape
+            )
+            return
+
+        with self._lock:
+            self._set_base_locked(generation, base_embeddings, base_paper_ids)
+            for delta_record in delta_records:
+                self._apply_locked(
+                    int(delta_record["paper_id"]),
+                    None if delta_record["removed"] else np.array(delta_record["embedding"], dtype=np.float32)
+                )
+            self._delta_record_count = len(delta_records)
+            self._unsaved_operations = []
+        self._remove_stale_files(generation)
+
+    def get_paper_ids(self) -> Set[int]:
+        """インデックス済みの論文IDを取得"""
+        with self._lock:
+            removed_paper_ids = {int(self._base_paper_ids[position]) for position in self._removed_positions}
+            return (set(self._base_positions) - removed_paper_ids) | set(self._delta_embeddings)
+
+    def upsert(self, paper_ids: Iterable[int], embeddings: np.ndarray) -> None:
+        """論文の埋め込みを追加・更新"""
+        with self._lock:
+            for paper_id, embedding in zip(paper_ids, embeddings):
+                embedding = np.asarray(embedding, dtype=np.float32)
+                self._apply_locked(int(paper_id), embedding)
+                self._unsaved_operations.append((int(paper_id), embedding))
+
+    def remove(self, paper_id: int) -> None:
+        """論文の埋め込みを削除"""
+        with self._lock:
+            self._apply_locked(paper_id, None)
+            self._unsaved_operations.append((paper_id, None))
+
+    def _apply_locked(self, paper_id: int, embedding: Optional[np.ndarray]) -> None:
+        """ロック取得済みの状態で論文の埋め込みを置き換え (Noneの場合は削除。同じ操作を重ねても結果は同じ)"""
+        base_position = self._base_positions.get(paper_id)
+        if base_position is not None:
+            self._removed_positions.add(base_position)
+        self._delta_embeddings.pop(paper_id, None)
+        if embedding is not None:
+            self._delta_embeddings[paper_id] = embedding
+
+    def search(self, query_embedding: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """コサイン類似度の上位top_k件を (paper_id, score) のリストで返す"""
+        # 行列積の間に登録 (イベントループ上で実行される) を止めないよう、ロック中は参照の取得のみを行う
+        # (保存済みの行列・論文IDは置き換えのみで書き換えないため、差分・削除位置のみをコピーする)
+        with self._lock:
+            base_embeddings   = self._base_embeddings
+            base_paper_ids    = self._base_paper_ids
+            removed_positions = np.fromiter(self._removed_positions, dtype=np.int64, count=len(self._removed_positions))
+            delta_paper_ids   = np.fromiter(self._delta_embeddings.keys(), dtype=np.int64, count=len(self._delta_embeddings))
+            delta_embeddings  = list(self._delta_embeddings.values())
+
+        score_blocks    = []
+        paper_id_blocks = []
+
+        if len(base_paper_ids):
+            base_scores = np.asarray(base_embeddings @ query_embedding, dtype=np.float32)
+            if len(removed_positions):
+                base_scores[removed_positions] = -np.inf
+            score_blocks.append(base_scores)
+            paper_id_blocks.append(base_paper_ids)
+
+        if delta_embeddings:
+            score_blocks.append(np.vstack(delta_embeddings) @ query_embedding)
+            paper_id_blocks.append(delta_paper_ids)
+
+        if not score_blocks:
+            return []
+
+        scores    = np.concatenate(score_blocks)
+        paper_ids = np.concatenate(paper_id_blocks)
+
+        # argpartitionで上位k件のみを部分ソートする (O(N))
+        top_k = min(top_k, len(scores))
+        top_positions = np.argpartition(-scores, top_k - 1)[:top_k]
+        top_positions = top_positions[np.argsort(-scores[top_positions])]
+
+        return [
+            (int(paper_ids[position]), float(scores[position]))
+            for position in top_positions
+            if np.isfinite(scores[position])
+        ]
+
+    def save(self) -> None:
+        """前回の保存以降の操作を差分ログに追記 (差分ログが大きくなった場合は行列を書き直して圧縮)"""
+        with self._save_lock:
+            with self._lock:
+                unsaved_operations = self._unsaved_operations
+                self._unsaved_operations = []
+                compaction_threshold = max(self.compaction_min_records, len(self._base_paper_ids) * self.compaction_ratio)
+                needs_compaction = (
+                    self._needs_compaction
+                    or self._delta_record_count + len(unsaved_operations) > compaction_threshold
+                )
+
+            try:
+                os.makedirs(self.index_directory, exist_ok=True)
+                if needs_compaction:
+                    self._compact()
+                elif unsaved_operations:
+                    self._append_delta_records(unsaved_operations)
+            except BaseException:
+                # 書き出せなかった操作は次回の保存で書き出す
+                with self._lock:
+                    self._unsaved_operations = unsaved_operations + self._unsaved_operations
+                raise
+
+    def _append_delta_records(self, operations: List[Tuple[int, Optional[np.ndarray]]]) -> None:
+        """操作を差分ログの末尾に追記"""
+        delta_records = np.zeros(len(operations), dtype=self._delta_record_dtype)
+        for record_position, (paper_id, embedding) in enumerate(operations):
+            delta_records[record_position]["paper_id"] = paper_id
+            delta_records[record_position]["removed"]  = embedding is None
+            if embedding is not None:
+                delta_records[record_position]["embedding"] = embedding
+
+        delta_path = self._get_file_path(self.DELTA_FILE_NAME, self._generation)
+        with open(delta_path, "ab") as delta_file:
+            # 前回の追記が途中で失敗していた場合は、書きかけの記録を切り捨ててから追記する
+            delta_file.truncate(self._delta_record_count * self._delta_record_dtype.itemsize)
+            delta_file.write(delta_records.tobytes())
+            delta_file.flush()
+            os.fsync(delta_file.fileno())
+
+        with self._lock:
+            self._delta_record_count += len(delta_records)
+
+    def _compact(self) -> None:
+        """差分を統合した行列を新しい世代のファイルに書き出し、メタデータを置き換えて切り替える"""
+        with self._lock:
+            base_embeddings  = self._base_embeddings
+            keep_mask        = np.ones(len(self._base_paper_ids), dtype=bool)
+            if self._removed_positions:
+                keep_mask[list(self._removed_positions)] = False
+            delta_paper_ids  = np.fromiter(self._delta_embeddings.keys(), dtype=np.int64)
+            delta_embeddings = list(self._delta_embeddings.values())
+            merged_paper_ids = np.concatenate([self._base_paper_ids[keep_mask], delta_paper_ids])
+            generation       = self._generation + 1
+
+        # 行列の読み込み・書き出しは検索・登録を止めないよう、ロックの外で行う
+        self._write_atomically(
+            self.EMBEDDINGS_FILE_NAME.format(generation=generation),
+            lambda path: self._write_merged_embeddings(path, base_embeddings, keep_mask, delta_embeddings)
+        )
+        self._write_atomically(
+            self.PAPER_IDS_FILE_NAME.format(generation=generation),
+            lambda path: np.save(path, merged_paper_ids)
+        )
+        # メタデータの置き換えで新しい世代に切り替わる (それまでに中断された場合は直前の世代を読み込む)
+        self._write_atomically(
+            self.METADATA_FILE_NAME,
+            lambda path: self._write_metadata(path, generation, len(merged_paper_ids))
+        )
+
+        merged_embeddings = np.load(self._get_file_path(self.EMBEDDINGS_FILE_NAME, generation), mmap_mode="r")
+        with self._lock:
+            self._set_base_locked(generation, merged_embeddings, merged_paper_ids)
+            self._delta_record_count = 0
+            self._needs_compaction   = False
+            # 圧縮中の追加・削除を反映し直す (圧縮前に反映済みの操作が含まれていても結果は同じ)
+            for paper_id, embedding in self._unsaved_operations:
+                self._apply_locked(paper_id, embedding)
+        self._remove_stale_files(generation)
+
+    def _write_merged_embeddings(
+        self,
+        embeddings_file,
+        base_embeddings  : np.ndarray,
+        keep_mask        : np.ndarray,
+        delta_embeddings : List[np.ndarray]
+    ) -> None:
+        """残す行と差分を統合した行列を、保存済みの行列をブロックごとに読みながら書き出す"""
+        row_count = int(keep_mask.sum()) + len(delta_embeddings)
+        np.lib.format.write_array_header_1_0(embeddings_file, {
+            "descr"         : np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+            "fortran_order" : False,
+            "shape"         : (row_count, self.dimension),
+        })
+        for block_start in range(0, len(keep_mask), COMPACTION_BLOCK_ROWS):
+            block_keep_mask  = keep_mask[block_start:block_start + COMPACTION_BLOCK_ROWS]
+            block_embeddings = np.asarray(base_embeddings[block_start:block_start + COMPACTION_BLOCK_ROWS], dtype=np.float32)
+            embeddings_file.write(np.ascontiguousarray(block_embeddings[block_keep_mask]).tobytes())
+        if delta_embeddings:
+            embeddings_file.write(np.vstack(delta_embeddings).astype(np.float32).tobytes())
+
+    def _set_base_locked(self, generation: int, base_embeddings: np.ndarray, base_paper_ids: np.ndarray) -> None:
+        """ロック取得済みの状態で保存済みの行列を置き換え、差分を空にする"""
+        self._generation        = generation
+        self._needs_compaction  = False
+        self._base_embeddings   = base_embeddings
+        self._base_paper_ids    = base_paper_ids
+        self._base_positions    = {int(paper_id): position for position, paper_id in enumerate(base_paper_ids)}
+        self._removed_positions = set()
+        self._delta_embeddings  = {}
+
+    def _read_delta_records(self, generation: int) -> np.ndarray:
+        """差分ログを読み込み (追記途中で中断された末尾の書きかけの記録は無視する)"""
+        delta_path = self._get_file_path(self.DELTA_FILE_NAME, generation)
+        if not os.path.exists(delta_path):
+            return np.zeros(0, dtype=self._delta_record_dtype)
+        record_count = os.path.getsize(delta_path) // self._delta_record_dtype.itemsize
+        return np.fromfile(delta_path, dtype=self._delta_record_dtype, count=record_count)
+
+    def _remove_stale_files(self, generation: int) -> None:
+        """現在の世代以外のファイル・書き出し途中の一時ファイルを削除 (削除できなくても次回に再試行する)"""
+        for file_name in os.listdir(self.index_directory):
+            file_match = self.GENERATION_FILE_PATTERN.match(file_name)
+            if file_name.endswith(".tmp") or (file_match and int(file_match.group(1)) != generation):
+                try:
+                    os.unlink(os.path.join(self.index_directory, file_name))
+                except OSError as e:
+                    logger.warning("古いベクトルインデックスのファイルを削除できません (%s): %s", file_name, e)
+
+    def _get_file_path(self, file_name: str, generation: int) -> str:
+        """世代ごとのファイルのパス"""
+        return os.path.join(self.index_directory, file_name.format(generation=generation))
+
+    def _write_atomically(self, file_name: str, write_file) -> None:
+        """一時ファイルに書き出してから置き換える"""
+        target_path    = os.path.join(self.index_directory, file_name)
+        temporary_path = target_path + ".tmp"
+        with open(temporary_path, "wb") as temporary_file:
+            write_file(temporary_file)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.replace(temporary_path, target_path)
+
+    def _write_metadata(self, metadata_file, generation: int, paper_count: int) -> None:
+        """インデックスのメタデータを書き出し"""
+        metadata = {
+            "backend_name" : self.backend_name,
+            "dimension"    : self.dimension,
+            "generation"   : generation,
+            "paper_count"  : paper_count,
+        }
+        metadata_file.write(json.dumps(metadata).encode("utf-8"))
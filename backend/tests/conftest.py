@@ -0,0 +1,20 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from database.schema import run_database_migrations
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """マイグレーションを適用した一時データベースのセッションファクトリ (テストごとに作成)"""
+    database_path = tmp_path / "papers.db"
+    engine = create_engine(f"sqlite:///{database_path}")
+    run_database_migrations(engine)
+    engine.dispose()
+
+    # テストごとにasyncio.runでイベントループが変わるため、コネクションをプールしない
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+    yield async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    asyncio.run(async_engine.dispose())
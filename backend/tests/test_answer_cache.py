@@ -0,0 +1,63 @@
+from services.answer_cache import AnswerCache, normalize_question
+
+
+class FakeClock:
+    """テストから時刻を進められる時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_question_absorbs_width_case_and_trailing_punctuation():
+    assert normalize_question("ＢＥＲＴの  Attention は？") == normalize_question("bertの attention は")
+
+
+def test_answer_expires_after_ttl():
+    clock        = FakeClock()
+    answer_cache = AnswerCache(max_entries=10, ttl_seconds=60, clock=clock)
+    answer_cache.set(1, "v1", "question", "answer")
+
+    clock.now = 59
+    assert answer_cache.get(1, "v1", "question") == "answer"
+
+    clock.now = 60
+    assert answer_cache.get(1, "v1", "question") is None
+    assert answer_cache.get_stats()["entries"] == 0
+
+
+def test_answer_for_updated_paper_version_is_discarded():
+    answer_cache = AnswerCache(max_entries=10, ttl_seconds=60, clock=FakeClock())
+    answer_cache.set(1, "v1", "question", "old answer")
+
+    # 要約が更新されると論文のバージョンが変わり、古い回答は返さない
+    assert answer_cache.get(1, "v2", "question") is None
+    assert answer_cache.get(1, "v1", "question") is None
+
+
+def test_least_recently_used_answer_is_evicted():
+    answer_cache = AnswerCache(max_entries=2, ttl_seconds=60, clock=FakeClock())
+    answer_cache.set(1, "v1", "first", "answer 1")
+    answer_cache.set(1, "v1", "second", "answer 2")
+    # 参照された回答は最近使われたものとして残る
+    assert answer_cache.get(1, "v1", "first") == "answer 1"
+
+    answer_cache.set(1, "v1", "third", "answer 3")
+
+    assert answer_cache.get(1, "v1", "second") is None
+    assert answer_cache.get(1, "v1", "first") == "answer 1"
+    assert answer_cache.get(1, "v1", "third") == "answer 3"
+    assert answer_cache.get_stats()["evictions"] == 1
+
+
+def test_invalidate_paper_discards_only_that_paper():
+    answer_cache = AnswerCache(max_entries=10, ttl_seconds=60, clock=FakeClock())
+    answer_cache.set(1, "v1", "question", "answer 1")
+    answer_cache.set(2, "v1", "question", "answer 2")
+
+    answer_cache.invalidate_paper(1)
+
+    assert answer_cache.get(1, "v1", "question") is None
+    assert answer_cache.get(2, "v1", "question") == "answer 2"
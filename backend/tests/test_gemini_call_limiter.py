@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from benchmarks.fake_gemini_client import FakeGeminiClient, FakeGeminiError
+from services.gemini_call_limiter import GeminiCallLimiter
+
+
+class RecordingSleep:
+    """バックオフの待機秒数を記録し、実際には待機しないsleep"""
+
+    def __init__(self):
+        self.delays = []
+
+    async def __call__(self, delay_seconds: float) -> None:
+        self.delays.append(delay_seconds)
+
+
+def create_call_limiter(**options) -> GeminiCallLimiter:
+    options = {"base_delay_seconds": 1.0, "max_delay_seconds": 30.0, "random_ratio": lambda: 1.0, **options}
+    return GeminiCallLimiter(**options)
+
+
+def create_failing_operation(client: FakeGeminiClient, errors):
+    """errorsを順に発生させた後、フェイククライアントで生成する呼び出し"""
+    remaining_errors = list(errors)
+
+    async def operation():
+        if remaining_errors:
+            client.call_count += 1
+            raise remaining_errors.pop(0)
+        return await client.aio.models.generate_content(model="fake", contents=["質問: テスト"])
+
+    return operation
+
+
+def test_call_limiter_caps_concurrent_calls():
+    client       = FakeGeminiClient(latency_seconds=0.01)
+    call_limiter = create_call_limiter(max_concurrent_calls=2)
+    peak_in_flight_calls = 0
+
+    async def operation():
+        nonlocal peak_in_flight_calls
+        peak_in_flight_calls = max(peak_in_flight_calls, call_limiter.in_flight_calls)
+        return await client.aio.models.generate_content(model="fake", contents=["質問: テスト"])
+
+    async def call_concurrently():
+        return await asyncio.gather(*[call_limiter.call(operation) for _ in range(8)])
+
+    responses = asyncio.run(call_concurrently())
+
+    assert len(responses) == 8
+    assert peak_in_flight_calls == 2
+    assert call_limiter.in_flight_calls == 0
+
+
+@pytest.mark.parametrize("status_code", [429, 503])
+def test_call_limiter_retries_rate_limit_errors_with_exponential_backoff(status_code):
+    client       = FakeGeminiClient(latency_seconds=0)
+    sleep        = RecordingSleep()
+    call_limiter = create_call_limiter(sleep=sleep, max_retries=5)
+    operation    = create_failing_operation(client, [FakeGeminiError(status_code, "fake") for _ in range(3)])
+
+    response = asyncio.run(call_limiter.call(operation))
+
+    assert response.text
+    assert client.call_count == 4
+    assert call_limiter.retry_count == 3
+    assert sleep.delays == [1.0, 2.0, 4.0]
+
+
+def test_call_limiter_caps_backoff_delay_and_gives_up_after_max_retries():
+    client       = FakeGeminiClient(latency_seconds=0)
+    sleep        = RecordingSleep()
+    call_limiter = create_call_limiter(sleep=sleep, max_retries=3, max_delay_seconds=3.0)
+    operation    = create_failing_operation(client, [FakeGeminiError(429, "fake") for _ in range(10)])
+
+    with pytest.raises(FakeGeminiError):
+        asyncio.run(call_limiter.call(operation))
+
+    assert client.call_count == 4
+    assert sleep.delays == [1.0, 2.0, 3.0]
+
+
+@pytest.mark.parametrize("error", [FakeGeminiError(400, "INVALID_ARGUMENT (fake)"), ValueError("fake")])
+def test_call_limiter_does_not_retry_other_errors(error):
+    client       = FakeGeminiClient(latency_seconds=0)
+    sleep        = RecordingSleep()
+    call_limiter = create_call_limiter(sleep=sleep)
+    operation    = create_failing_operation(client, [error])
+
+    with pytest.raises(type(error)):
+        asyncio.run(call_limiter.call(operation))
+
+    assert client.call_count == 1
+    assert call_limiter.retry_count == 0
+    assert sleep.delays == []
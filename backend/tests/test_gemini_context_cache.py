@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime
+from typing import Any, List
+from benchmarks.fake_gemini_client import FakeGeminiClient, FakeGeminiError
+from models.database_models import Paper
+from services.gemini_context_cache import CREATION_LOCK_POOL_SIZE, GeminiContextCache
+from services.gemini_service import GeminiService
+from services.paper_chunk_retriever import RetrievedChunk
+
+# 要約のコンテキストはQA_CONTEXT_TOKEN_BUDGET (3000) 以内に収まる
+SUMMARY_CONTEXT = "要約" * 1200
+
+
+class RecordingModels:
+    """生成の呼び出しのcontents・configを記録するフェイクのmodels"""
+
+    def __init__(self, models):
+        self.models = models
+        self.calls: List[Any] = []
+
+    async def generate_content(self, model: str, contents: List[Any], config: Any = None):
+        self.calls.append((contents, config))
+        return await self.models.generate_content(model, contents, config)
+
+
+def create_gemini_service():
+    client = FakeGeminiClient(latency_seconds=0, file_latency_seconds=0)
+    recording_models = RecordingModels(client.aio.models)
+    client.aio.models = recording_models
+    # 最小トークン数・質問回数などは既定値のまま使う
+    gemini_service = GeminiService(client=client, context_cache=GeminiContextCache(enabled=True))
+    return gemini_service, client, recording_models
+
+
+def create_paper() -> Paper:
+    return Paper(
+        paper_id                       = 1,
+        qa_context                     = SUMMARY_CONTEXT,
+        qa_context_token_count         = len(SUMMARY_CONTEXT),
+        qa_context_trimmed_token_count = 0,
+        updated_at                     = datetime(2026, 1, 1)
+    )
+
+
+def create_body_chunks() -> List[RetrievedChunk]:
+    return [
+        RetrievedChunk(chunk_index=chunk_index, page_number=chunk_index // 2 + 1, content=f"本文{chunk_index}" * 400, relevance_score=0.0)
+        for chunk_index in range(4)
+    ]
+
+
+def test_context_cache_is_created_with_body_chunks_and_reused():
+    gemini_service, client, recording_models = create_gemini_service()
+    paper       = create_paper()
+    body_chunks = create_body_chunks()
+    # 1つ目の抜粋はキャッシュした本文の先頭と同じため、キャッシュ利用時は送り直さない
+    chunks = [body_chunks[0], RetrievedChunk(chunk_index=10, page_number=8, content="関連する抜粋", relevance_score=1.0)]
+
+    async def ask_questions():
+        token_usages = []
+        for question in ["手法は?", "結果は?", "課題は?"]:
+            token_usage = {}
+            await gemini_service.answer_question_about_paper(paper, question, token_usage, chunks, body_chunks)
+            token_usages.append(token_usage)
+        return token_usages
+
+    token_usages = asyncio.run(ask_questions())
+
+    # 1回目はキャッシュを作成せず、2回目に作成して3回目は同じキャッシュを使う
+    assert client.aio.caches.created_count == 1
+    assert token_usages[0]["cached_tokens"] == 0
+    assert token_usages[1]["cached_tokens"] > 0
+    assert token_usages[2]["cached_tokens"] > 0
+    assert [config.cached_content if config else None for _, config in recording_models.calls] == [
+        None, "cachedContents/fake-1", "cachedContents/fake-1"
+    ]
+
+    first_prompt  = recording_models.calls[0][0][0]
+    cached_prompt = recording_models.calls[2][0][0]
+    assert SUMMARY_CONTEXT in first_prompt
+    assert SUMMARY_CONTEXT not in cached_prompt
+    assert body_chunks[0].content not in cached_prompt
+    assert "関連する抜粋" in cached_prompt
+    assert gemini_service.context_cache.get_stats()["cached_requests"] == 2
+
+
+def test_context_cache_is_not_created_below_minimum_tokens():
+    gemini_service, client, recording_models = create_gemini_service()
+    paper = create_paper()
+
+    async def ask_questions():
+        for question in ["手法は?", "結果は?", "課題は?"]:
+            await gemini_service.answer_question_about_paper(paper, question)
+
+    asyncio.run(ask_questions())
+
+    # 要約のコンテキストだけでは最小トークン数に届かない
+    assert client.aio.caches.created_count == 0
+    assert all(config is None for _, config in recording_models.calls)
+
+
+def test_context_cache_is_recreated_after_paper_update():
+    gemini_service, client, _ = create_gemini_service()
+    paper       = create_paper()
+    body_chunks = create_body_chunks()
+
+    async def ask_questions():
+        for question in ["手法は?", "結果は?"]:
+            await gemini_service.answer_question_about_paper(paper, question, body_chunks=body_chunks)
+        # 要約を更新すると論文バージョンが変わり、古いキャッシュは使わない
+        paper.updated_at = datetime(2026, 2, 1)
+        for question in ["手法は?", "結果は?"]:
+            await gemini_service.answer_question_about_paper(paper, question, body_chunks=body_chunks)
+
+    asyncio.run(ask_questions())
+
+    assert client.aio.caches.created_count == 2
+
+
+def test_failed_paper_is_not_retried_and_caching_stops_only_after_consecutive_failures():
+    context_cache = GeminiContextCache(enabled=True, min_tokens=1, min_questions=1, max_failures=2)
+    assert context_cache.should_create(1, "v1", 10)
+
+    context_cache.record_creation_failure(1, "v1", FakeGeminiError(400, "INVALID_ARGUMENT (fake)"))
+
+    # 失敗した論文は要約が更新されるまで再試行せず、他の論文ではキャッシュを作成し続ける
+    assert not context_cache.should_create(1, "v1", 10)
+    assert context_cache.should_create(1, "v2", 10)
+    assert context_cache.should_create(2, "v1", 10)
+
+    # 作成に成功すると連続失敗の回数は数え直す
+    context_cache.set(2, "v1", "cachedContents/fake-1")
+    context_cache.record_creation_failure(3, "v1", FakeGeminiError(404, "NOT_FOUND (fake)"))
+    assert context_cache.enabled
+
+    context_cache.record_creation_failure(4, "v1", FakeGeminiError(403, "PERMISSION_DENIED (fake)"))
+    assert not context_cache.enabled
+    assert context_cache.get_stats()["creation_failures"] == 3
+
+
+def test_creation_locks_do_not_grow_with_paper_count():
+    context_cache = GeminiContextCache(enabled=True)
+    creation_locks = {id(context_cache.get_creation_lock(paper_id)) for paper_id in range(1000)}
+
+    assert context_cache.get_creation_lock(5) is context_cache.get_creation_lock(5)
+    assert len(creation_locks) == CREATION_LOCK_POOL_SIZE
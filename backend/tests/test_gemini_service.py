@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from benchmarks.fake_gemini_client import FakeGeminiClient, FakeGeminiError
+from services.gemini_call_limiter import GeminiCallLimiter
+from services.gemini_service import GeminiService
+
+
+def create_gemini_service(client: FakeGeminiClient) -> GeminiService:
+    return GeminiService(client=client, call_limiter=GeminiCallLimiter(max_retries=0))
+
+
+def create_failing_file_deletion(client: FakeGeminiClient) -> None:
+    async def delete(name: str, **kwargs) -> None:
+        raise FakeGeminiError(500, "INTERNAL (fake)")
+    client.aio.files.delete = delete
+
+
+def test_summary_is_returned_when_file_deletion_fails(caplog):
+    client = FakeGeminiClient(latency_seconds=0, file_latency_seconds=0)
+    create_failing_file_deletion(client)
+
+    summary_data = asyncio.run(create_gemini_service(client).generate_paper_summary("paper.pdf"))
+
+    assert summary_data["title"]
+    assert "アップロードファイル削除エラー" in caplog.text
+
+
+def test_summary_error_is_not_masked_by_file_deletion_error():
+    client = FakeGeminiClient(latency_seconds=0, file_latency_seconds=0)
+    create_failing_file_deletion(client)
+
+    async def generate_content(model, contents, config=None):
+        raise FakeGeminiError(400, "INVALID_ARGUMENT (fake)")
+    client.aio.models.generate_content = generate_content
+
+    with pytest.raises(Exception, match="INVALID_ARGUMENT"):
+        asyncio.run(create_gemini_service(client).generate_paper_summary("paper.pdf"))
@@ -0,0 +1,182 @@
+import asyncio
+import io
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi import UploadFile
+from benchmarks.fake_gemini_client import FakeGeminiClient, FakeGeminiError
+from benchmarks.synthetic_corpus import build_synthetic_pdf
+from models.database_models import IngestionJob, Paper
+from services.gemini_call_limiter import GeminiCallLimiter
+from services.gemini_service import GeminiService
+from services.ingestion_queue import (
+    JOB_STATUS_COMPLETED,
+    JOB_STATUS_FAILED,
+    JOB_STATUS_PENDING,
+    JOB_STATUS_SUMMARIZING,
+    IngestionQueue
+)
+from services.pdf_processor import PDFProcessor
+from services.pdf_store import PDFStore
+
+LEASE_SECONDS = 60
+
+
+def create_ingestion_queue(session_factory, tmp_path, client: FakeGeminiClient = None) -> IngestionQueue:
+    client = client or FakeGeminiClient(latency_seconds=0, file_latency_seconds=0)
+    return IngestionQueue(
+        GeminiService(client=client, call_limiter=GeminiCallLimiter(max_retries=0)),
+        PDFProcessor(),
+        session_factory       = session_factory,
+        worker_count          = 1,
+        poll_interval_seconds = 0.01,
+        upload_directory      = str(tmp_path / "uploads"),
+        pdf_store             = PDFStore(str(tmp_path / "pdf_store")),
+        lease_seconds         = LEASE_SECONDS
+    )
+
+
+def add_job(session_factory, job_id: str, status: str, heartbeat_at=None) -> None:
+    async def add():
+        async with session_factory() as db:
+            db.add(IngestionJob(
+                job_id            = job_id,
+                status            = status,
+                original_filename = f"{job_id}.pdf",
+                spool_file_path   = f"{job_id}.pdf",
+                file_hash         = f"hash-{job_id}",
+                attempt_count     = 1 if status != JOB_STATUS_PENDING else 0,
+                heartbeat_at      = heartbeat_at
+            ))
+            await db.commit()
+    asyncio.run(add())
+
+
+def get_job(session_factory, job_id: str) -> IngestionJob:
+    async def get():
+        async with session_factory() as db:
+            return await db.get(IngestionJob, job_id)
+    return asyncio.run(get())
+
+
+def get_paper(session_factory, paper_id: int) -> Paper:
+    async def get():
+        async with session_factory() as db:
+            return await db.get(Paper, paper_id)
+    return asyncio.run(get())
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_upload(session_factory, ingestion_queue: IngestionQueue, pdf_bytes: bytes, filename: str = "paper.pdf") -> IngestionJob:
+    async def enqueue():
+        os.makedirs(ingestion_queue.upload_directory, exist_ok=True)
+        async with session_factory() as db:
+            return await ingestion_queue.enqueue_upload(UploadFile(io.BytesIO(pdf_bytes), filename=filename), db)
+    return asyncio.run(enqueue())
+
+
+def process_next_job(ingestion_queue: IngestionQueue) -> str:
+    async def process():
+        job_id = await ingestion_queue._claim_next_job()
+        await ingestion_queue._process_job(job_id)
+        return job_id
+    return asyncio.run(process())
+
+
+def test_uploaded_job_is_summarized_and_completed(session_factory, tmp_path):
+    ingestion_queue = create_ingestion_queue(session_factory, tmp_path)
+    job = enqueue_upload(session_factory, ingestion_queue, build_synthetic_pdf(["We propose a transformer for retrieval."]))
+    assert job.status == JOB_STATUS_PENDING
+
+    assert process_next_job(ingestion_queue) == job.job_id
+
+    completed_job = get_job(session_factory, job.job_id)
+    assert completed_job.status == JOB_STATUS_COMPLETED
+    assert completed_job.finished_at is not None
+    paper = get_paper(session_factory, completed_job.paper_id)
+    assert paper.file_hash == job.file_hash
+    # 一時保存したPDFは再要約用の保存領域に移動される
+    assert not os.path.exists(job.spool_file_path)
+    assert ingestion_queue.pdf_store.exists(job.file_hash)
+
+
+def test_job_fails_when_summarization_fails(session_factory, tmp_path):
+    client = FakeGeminiClient(latency_seconds=0, file_latency_seconds=0)
+
+    async def generate_content(model, contents, config=None):
+        raise FakeGeminiError(400, "INVALID_ARGUMENT (fake)")
+    client.aio.models.generate_content = generate_content
+    ingestion_queue = create_ingestion_queue(session_factory, tmp_path, client)
+    job = enqueue_upload(session_factory, ingestion_queue, build_synthetic_pdf(["Broken paper."]))
+
+    process_next_job(ingestion_queue)
+
+    failed_job = get_job(session_factory, job.job_id)
+    assert failed_job.status == JOB_STATUS_FAILED
+    assert "INVALID_ARGUMENT" in failed_job.error_message
+    assert failed_job.paper_id is None
+    assert not os.path.exists(job.spool_file_path)
+
+
+def test_duplicate_upload_returns_active_job_then_completed_paper(session_factory, tmp_path):
+    ingestion_queue = create_ingestion_queue(session_factory, tmp_path)
+    pdf_bytes = build_synthetic_pdf(["The same paper uploaded twice."])
+
+    # 処理中のジョブがある間は、同じファイルのアップロードをそのジョブに集約する
+    job = enqueue_upload(session_factory, ingestion_queue, pdf_bytes, "first.pdf")
+    duplicate_job = enqueue_upload(session_factory, ingestion_queue, pdf_bytes, "second.pdf")
+    assert duplicate_job.job_id == job.job_id
+    assert os.listdir(ingestion_queue.upload_directory) == [os.path.basename(job.spool_file_path)]
+
+    process_next_job(ingestion_queue)
+    assert asyncio.run(ingestion_queue._claim_next_job()) is None
+
+    # 取り込み済みのファイルは要約せずに完了済みのジョブとして返す
+    client_call_count = ingestion_queue.gemini_service.client.call_count
+    reuploaded_job = enqueue_upload(session_factory, ingestion_queue, pdf_bytes, "third.pdf")
+    assert reuploaded_job.job_id != job.job_id
+    assert reuploaded_job.status == JOB_STATUS_COMPLETED
+    assert reuploaded_job.paper_id == get_job(session_factory, job.job_id).paper_id
+    assert ingestion_queue.gemini_service.client.call_count == client_call_count
+
+
+def test_claim_skips_in_progress_job_with_live_lease(session_factory, tmp_path):
+    ingestion_queue = create_ingestion_queue(session_factory, tmp_path)
+    # 他のプロセスが処理中で、リースを更新し続けているジョブ
+    add_job(session_factory, "live", JOB_STATUS_SUMMARIZING, heartbeat_at=utc_now())
+
+    assert asyncio.run(ingestion_queue._claim_next_job()) is None
+    assert get_job(session_factory, "live").attempt_count == 1
+
+
+def test_claim_takes_over_in_progress_job_with_expired_lease(session_factory, tmp_path):
+    ingestion_queue = create_ingestion_queue(session_factory, tmp_path)
+    # 処理していたプロセスが停止し、リースの更新が途絶えたジョブ
+    add_job(session_factory, "expired", JOB_STATUS_SUMMARIZING, heartbeat_at=utc_now() - timedelta(seconds=LEASE_SECONDS * 2))
+    # リース導入前から処理中のままのジョブ
+    add_job(session_factory, "legacy", JOB_STATUS_SUMMARIZING)
+
+    claimed_job_ids = {asyncio.run(ingestion_queue._claim_next_job()) for _ in range(2)}
+
+    assert claimed_job_ids == {"expired", "legacy"}
+    reclaimed_job = get_job(session_factory, "expired")
+    assert reclaimed_job.attempt_count == 2
+    assert reclaimed_job.heartbeat_at > utc_now() - timedelta(seconds=LEASE_SECONDS)
+    assert asyncio.run(ingestion_queue._claim_next_job()) is None
+
+
+def test_renew_lease_extends_heartbeat_while_job_is_processed(session_factory, tmp_path):
+    ingestion_queue = create_ingestion_queue(session_factory, tmp_path)
+    ingestion_queue.lease_seconds = 0.03
+    add_job(session_factory, "running", JOB_STATUS_SUMMARIZING, heartbeat_at=utc_now() - timedelta(seconds=LEASE_SECONDS))
+
+    async def renew_briefly():
+        lease_task = asyncio.create_task(ingestion_queue._renew_lease("running"))
+        await asyncio.sleep(0.05)
+        lease_task.cancel()
+        await asyncio.gather(lease_task, return_exceptions=True)
+    asyncio.run(renew_briefly())
+
+    assert get_job(session_factory, "running").heartbeat_at > utc_now() - timedelta(seconds=LEASE_SECONDS / 2)
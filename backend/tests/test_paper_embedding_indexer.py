@@ -0,0 +1,36 @@
+import asyncio
+from services.corpus_version import CorpusVersion
+from services.embedding_backends import HashingEmbeddingBackend
+from services.paper_embedding_indexer import PaperEmbeddingIndexer
+from services.pdf_processor import PDFProcessor
+from services.vector_index import VectorIndex
+
+
+def test_periodic_backfill_indexes_papers_saved_by_another_process(session_factory, tmp_path):
+    embedding_backend = HashingEmbeddingBackend()
+    paper_embedding_indexer = PaperEmbeddingIndexer(
+        embedding_backend,
+        vector_index              = VectorIndex(str(tmp_path), embedding_backend.backend_name, embedding_backend.dimension),
+        session_factory           = session_factory,
+        corpus_version            = CorpusVersion(),
+        backfill_interval_seconds = 0.01
+    )
+
+    async def save_paper_while_running():
+        await paper_embedding_indexer.start()
+        await paper_embedding_indexer.wait_for_backfill()
+        # CLIなど、埋め込みを登録しない別のプロセスで保存された論文
+        async with session_factory() as db:
+            papers = await PDFProcessor().save_papers_to_database([{
+                "original_filename" : "cli.pdf",
+                "file_hash"         : "cli-hash",
+                "file_size"         : 1,
+                "summary_data"      : {"title": "Imported from the CLI", "abstract": "Saved without an embedding."},
+            }], db)
+        await asyncio.sleep(0.1)
+        await paper_embedding_indexer.stop()
+        return papers[0].paper_id
+
+    paper_id = asyncio.run(save_paper_while_running())
+
+    assert paper_embedding_indexer.vector_index.get_paper_ids() == {paper_id}
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from models.database_models import QAHistory, SearchDailyStat, SearchHistory, SearchResult
+from services.pdf_processor import PDFProcessor
+from services.retention_service import RetentionService
+
+
+def create_retention_service(session_factory, **options) -> RetentionService:
+    options = {
+        "search_retention_days" : 30,
+        "search_max_rows"       : 0,
+        "qa_retention_days"     : 30,
+        "qa_max_rows"           : 0,
+        "batch_size"            : 2,
+        "batch_pause_seconds"   : 0,
+        **options
+    }
+    return RetentionService(session_factory, **options)
+
+
+def days_ago(days: int) -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+
+
+def add_history(session_factory, searches, questions=()) -> int:
+    """論文1件と検索履歴 (日時, 検索タイプ, 結果の論文数)・質問履歴 (日時) を追加し、論文IDを返す"""
+    async def add():
+        async with session_factory() as db:
+            paper = (await PDFProcessor().save_papers_to_database([{
+                "original_filename" : "paper.pdf",
+                "file_hash"         : "hash",
+                "file_size"         : 1,
+                "summary_data"      : {"title": "Paper"},
+            }], db))[0]
+            for search_date, search_type, result_count in searches:
+                db.add(SearchHistory(
+                    search_query   = "query",
+                    search_type    = search_type,
+                    result_count   = result_count,
+                    search_date    = search_date,
+                    search_results = [SearchResult(paper_id=paper.paper_id) for _ in range(result_count)]
+                ))
+            for question_date in questions:
+                db.add(QAHistory(paper_id=paper.paper_id, question="question", answer="answer", question_date=question_date))
+            await db.commit()
+            return paper.paper_id
+    return asyncio.run(add())
+
+
+def load_rows(session_factory, statement):
+    async def load():
+        async with session_factory() as db:
+            return (await db.execute(statement)).all()
+    return asyncio.run(load())
+
+
+def test_expired_searches_are_rolled_up_into_daily_stats_and_deleted(session_factory):
+    expired_date = days_ago(40)
+    add_history(session_factory, [
+        (expired_date, "keyword", 2),
+        (expired_date, "keyword", 0),
+        (expired_date, "keyword", 3),
+        (expired_date, "title",   1),
+        (days_ago(1),  "keyword", 1),
+    ])
+
+    counts = asyncio.run(create_retention_service(session_factory).run_once())
+
+    assert counts["search_history_deleted"] == 4
+    assert counts["search_results_deleted"] == 6
+    # バッチに分けて削除しても、同じ日付・検索タイプの件数は1行に加算される
+    assert load_rows(session_factory, select(
+        SearchDailyStat.stat_date, SearchDailyStat.search_type, SearchDailyStat.search_count,
+        SearchDailyStat.zero_result_count, SearchDailyStat.total_result_count
+    ).order_by(SearchDailyStat.search_type)) == [
+        (expired_date.date(), "keyword", 3, 1, 5),
+        (expired_date.date(), "title",   1, 0, 1),
+    ]
+    assert load_rows(session_factory, select(SearchHistory.search_type, SearchHistory.result_count)) == [("keyword", 1)]
+    assert len(load_rows(session_factory, select(SearchResult.result_id))) == 1
+
+
+def test_rollup_adds_to_existing_daily_stats(session_factory):
+    expired_date = days_ago(40)
+    add_history(session_factory, [(expired_date, "keyword", 0)])
+
+    async def add_existing_stat():
+        async with session_factory() as db:
+            db.add(SearchDailyStat(
+                stat_date=expired_date.date(), search_type="keyword",
+                search_count=10, zero_result_count=2, total_result_count=30
+            ))
+            await db.commit()
+    asyncio.run(add_existing_stat())
+
+    asyncio.run(create_retention_service(session_factory).run_once())
+
+    assert load_rows(session_factory, select(
+        SearchDailyStat.search_count, SearchDailyStat.zero_result_count, SearchDailyStat.total_result_count
+    )) == [(11, 3, 30)]
+
+
+def test_search_max_rows_keeps_only_newest_searches(session_factory):
+    add_history(session_factory, [(days_ago(3 - search_number), "keyword", 0) for search_number in range(4)])
+    retention_service = create_retention_service(session_factory, search_retention_days=0, search_max_rows=1)
+
+    counts = asyncio.run(retention_service.run_once())
+
+    assert counts["search_history_deleted"] == 3
+    assert [row.search_date.date() for row in load_rows(session_factory, select(SearchHistory.search_date))] == [
+        days_ago(0).date()
+    ]
+    assert sum(row.search_count for row in load_rows(session_factory, select(SearchDailyStat.search_count))) == 3
+
+
+def test_expired_questions_are_deleted(session_factory):
+    add_history(session_factory, [], questions=[days_ago(400), days_ago(40), days_ago(1)])
+
+    counts = asyncio.run(create_retention_service(session_factory).run_once())
+
+    assert counts["qa_history_deleted"] == 2
+    assert [row.question_date.date() for row in load_rows(session_factory, select(QAHistory.question_date))] == [
+        days_ago(1).date()
+    ]
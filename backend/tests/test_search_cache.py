@@ -0,0 +1,72 @@
+from datetime import datetime
+from models.api_models import SearchResultItem
+from services.search_cache import SearchCache
+
+
+def create_search_result(paper_id: int, title: str = "Paper") -> SearchResultItem:
+    return SearchResultItem(paper_id=paper_id, title=title, relevance_score=1.0, upload_date=datetime(2026, 1, 1))
+
+
+def test_queries_differing_only_in_width_or_whitespace_are_cached_separately():
+    search_cache = SearchCache(enabled=True, max_entries=10, max_bytes=1024 * 1024)
+    search_cache.set(search_cache.build_key("ＢＥＲＴ", "title", 20, "all"), 0, [create_search_result(1)], {})
+
+    # 検索は入力したクエリのまま実行するため、表記の違うクエリの結果は共有しない
+    assert search_cache.get(search_cache.build_key("BERT", "title", 20, "all"), 0) is None
+    assert search_cache.get(search_cache.build_key("ＢＥＲＴ", "title", 20, "all"), 0) is not None
+
+
+def test_least_recently_used_search_is_evicted_when_entry_limit_is_reached():
+    search_cache = SearchCache(enabled=True, max_entries=2, max_bytes=1024 * 1024)
+    first_key, second_key, third_key = [search_cache.build_key(query, "title", 20, "all") for query in ["a", "b", "c"]]
+    search_cache.set(first_key, 0, [create_search_result(1)], {})
+    search_cache.set(second_key, 0, [create_search_result(2)], {})
+    # 参照された検索結果は最近使われたものとして残る
+    assert search_cache.get(first_key, 0) is not None
+
+    search_cache.set(third_key, 0, [create_search_result(3)], {})
+
+    assert search_cache.get(second_key, 0) is None
+    assert search_cache.get(first_key, 0) is not None
+    assert search_cache.get(third_key, 0) is not None
+    assert search_cache.get_stats()["evictions"] == 1
+
+
+def test_searches_are_evicted_to_stay_within_memory_limit():
+    search_cache = SearchCache(enabled=True, max_entries=100, max_bytes=5000)
+    for query in ["a", "b", "c"]:
+        search_cache.set(search_cache.build_key(query, "title", 20, "all"), 0, [create_search_result(1, "x" * 500)], {})
+
+    # 1件あたり約2000バイトと見積もられるため、2件までしか残らない
+    stats = search_cache.get_stats()
+    assert stats["bytes"] <= 5000
+    assert (stats["entries"], stats["evictions"]) == (2, 1)
+    assert search_cache.get(search_cache.build_key("a", "title", 20, "all"), 0) is None
+
+    # 上限より大きい検索結果は登録しない
+    large_key = search_cache.build_key("large", "title", 20, "all")
+    search_cache.set(large_key, 0, [create_search_result(1, "x" * 5000)], {})
+    assert search_cache.get(large_key, 0) is None
+
+
+def test_all_searches_are_discarded_when_corpus_version_advances():
+    search_cache = SearchCache(enabled=True, max_entries=10, max_bytes=1024 * 1024)
+    cache_key = search_cache.build_key("transformer", "keyword", 20, "all")
+    search_cache.set(cache_key, 1, [create_search_result(1)], {"transformer": 1})
+    assert search_cache.get(cache_key, 1) == ([create_search_result(1)], {"transformer": 1})
+
+    assert search_cache.get(cache_key, 2) is None
+    assert search_cache.get_stats()["entries"] == 0
+    assert search_cache.get_stats()["invalidations"] == 1
+
+
+def test_results_of_searches_started_before_corpus_update_are_not_stored():
+    search_cache = SearchCache(enabled=True, max_entries=10, max_bytes=1024 * 1024)
+    cache_key = search_cache.build_key("transformer", "keyword", 20, "all")
+    # 検索中に論文が追加され、後から始まった検索が新しいバージョンで参照済み
+    assert search_cache.get(cache_key, 2) is None
+
+    search_cache.set(cache_key, 1, [create_search_result(1)], {})
+
+    assert search_cache.get(cache_key, 2) is None
+    assert search_cache.get_stats()["corpus_version"] == 2
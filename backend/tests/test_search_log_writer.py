@@ -0,0 +1,77 @@
+import asyncio
+from sqlalchemy import func, select
+from models.database_models import SearchHistory, SearchResult
+from services.search_log_writer import SearchLogWriter
+
+
+def create_search_log_writer(session_factory, **options) -> SearchLogWriter:
+    options = {"enabled": True, "result_sample_rate": 1.0, "batch_size": 100, "flush_interval_seconds": 60, **options}
+    return SearchLogWriter(session_factory, **options)
+
+
+def count_rows(session_factory, model) -> int:
+    async def count():
+        async with session_factory() as db:
+            return await db.scalar(select(func.count()).select_from(model))
+    return asyncio.run(count())
+
+
+def test_record_buffers_until_flush_and_writes_results_with_search_ids(session_factory):
+    search_log_writer = create_search_log_writer(session_factory)
+    search_log_writer.record("transformer", "keyword", "session-1", [(1, 0.9), (2, 0.5)])
+    search_log_writer.record("graph", "title", "session-1", [])
+
+    assert count_rows(session_factory, SearchHistory) == 0
+
+    asyncio.run(search_log_writer.flush())
+
+    async def load_results():
+        async with session_factory() as db:
+            return (await db.execute(
+                select(SearchHistory.search_query, SearchHistory.result_count, SearchResult.paper_id)
+                .join(SearchResult, SearchResult.search_id == SearchHistory.search_id)
+                .order_by(SearchResult.paper_id)
+            )).all()
+    assert asyncio.run(load_results()) == [("transformer", 2, 1), ("transformer", 2, 2)]
+    assert count_rows(session_factory, SearchHistory) == 2
+    assert search_log_writer.get_stats()["written"] == 2
+    assert search_log_writer.get_stats()["buffered"] == 0
+
+
+def test_results_are_not_written_for_searches_outside_the_sample(session_factory):
+    search_log_writer = create_search_log_writer(session_factory, result_sample_rate=0.5, random_ratio=lambda: 0.7)
+    search_log_writer.record("transformer", "keyword", "session-1", [(1, 0.9)])
+
+    asyncio.run(search_log_writer.flush())
+
+    assert count_rows(session_factory, SearchHistory) == 1
+    assert count_rows(session_factory, SearchResult) == 0
+
+
+def test_writer_flushes_when_batch_size_is_reached_and_on_stop(session_factory):
+    search_log_writer = create_search_log_writer(session_factory, batch_size=2)
+
+    async def record_while_running():
+        await search_log_writer.start()
+        search_log_writer.record("first", "keyword", "session-1", [])
+        search_log_writer.record("second", "keyword", "session-1", [])
+        await asyncio.sleep(0.1)
+        written_before_stop = search_log_writer.written_count
+        # 件数に達していない履歴は停止時に書き込む
+        search_log_writer.record("third", "keyword", "session-1", [])
+        await search_log_writer.stop()
+        return written_before_stop
+
+    assert asyncio.run(record_while_running()) == 2
+    assert count_rows(session_factory, SearchHistory) == 3
+
+
+def test_record_drops_entries_when_buffer_is_full(session_factory):
+    search_log_writer = create_search_log_writer(session_factory, max_buffered_entries=2)
+    for search_number in range(3):
+        search_log_writer.record(f"query {search_number}", "keyword", "session-1", [])
+
+    asyncio.run(search_log_writer.flush())
+
+    assert count_rows(session_factory, SearchHistory) == 2
+    assert search_log_writer.get_stats()["dropped"] == 1
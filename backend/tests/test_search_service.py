@@ -0,0 +1,203 @@
+import asyncio
+import pytest
+from services.corpus_version import CorpusVersion
+from services.embedding_backends import EmbeddingBackend, HashingEmbeddingBackend
+from services.paper_embedding_indexer import PaperEmbeddingIndexer
+from services.pdf_processor import PDFProcessor
+from services.search_cache import SearchCache
+from services.search_service import SearchService
+from services.vector_index import VectorIndex
+
+PAPER_SUMMARIES = [
+    {
+        "title"    : "Graph neural networks for molecule property prediction",
+        "abstract" : "We predict molecular properties with message passing graph neural networks.",
+        "keywords" : ["graph neural network", "chemistry"],
+    },
+    {
+        "title"    : "Transformer language models for code completion",
+        "abstract" : "Large language models trained on source code complete programs.",
+        "keywords" : ["language model", "code"],
+    },
+    {
+        "title"    : "Reinforcement learning for robot locomotion",
+        "abstract" : "A quadruped robot learns to walk with deep reinforcement learning.",
+        "keywords" : ["reinforcement learning", "robotics"],
+    },
+]
+
+
+def create_search_service(session_factory, index_directory) -> SearchService:
+    corpus_version = CorpusVersion()
+    embedding_backend = HashingEmbeddingBackend()
+    paper_embedding_indexer = PaperEmbeddingIndexer(
+        embedding_backend,
+        vector_index    = VectorIndex(str(index_directory), embedding_backend.backend_name, embedding_backend.dimension),
+        session_factory = session_factory,
+        corpus_version  = corpus_version
+    )
+
+    async def index_papers():
+        async with session_factory() as db:
+            await PDFProcessor().save_papers_to_database([
+                {
+                    "original_filename" : f"paper-{paper_number}.pdf",
+                    "file_hash"         : f"hash-{paper_number}",
+                    "file_size"         : 1,
+                    "summary_data"      : summary_data,
+                }
+                for paper_number, summary_data in enumerate(PAPER_SUMMARIES)
+            ], db)
+        await paper_embedding_indexer.backfill_missing_papers()
+
+    asyncio.run(index_papers())
+    return SearchService(
+        paper_embedding_indexer = paper_embedding_indexer,
+        search_cache            = SearchCache(enabled=False),
+        corpus_version          = corpus_version
+    )
+
+
+def search(session_factory, search_service: SearchService, query: str, search_type: str, limit: int = 3):
+    async def run_search():
+        async with session_factory() as db:
+            return await search_service.search_papers(query, search_type, limit, db)
+    return asyncio.run(run_search())
+
+
+def test_embedding_backend_requires_embed_texts():
+    with pytest.raises(TypeError):
+        EmbeddingBackend()
+
+
+def test_semantic_search_ranks_similar_paper_first(session_factory, tmp_path):
+    search_service = create_search_service(session_factory, tmp_path / "vector_index")
+
+    search_results = search(session_factory, search_service, "robot learns locomotion with reinforcement learning", "semantic")
+
+    assert search_results[0].title == "Reinforcement learning for robot locomotion"
+    assert len(search_results) == 3
+    relevance_scores = [search_result.relevance_score for search_result in search_results]
+    assert relevance_scores == sorted(relevance_scores, reverse=True)
+
+
+def test_hybrid_search_combines_full_text_and_semantic_results(session_factory, tmp_path):
+    search_service = create_search_service(session_factory, tmp_path / "vector_index")
+
+    # 全文検索で一致するのは1件のみだが、セマンティック検索の候補も統合される
+    search_results = search(session_factory, search_service, "molecule", "hybrid")
+
+    assert search_results[0].title == "Graph neural networks for molecule property prediction"
+    assert len(search_results) == 3
+    relevance_scores = [search_result.relevance_score for search_result in search_results]
+    assert relevance_scores == sorted(relevance_scores, reverse=True)
+
+
+def test_semantic_search_excludes_removed_papers(session_factory, tmp_path):
+    search_service = create_search_service(session_factory, tmp_path / "vector_index")
+    removed_paper_id = search(session_factory, search_service, "code completion", "semantic")[0].paper_id
+
+    search_service.paper_embedding_indexer.vector_index.remove(removed_paper_id)
+
+    search_results = search(session_factory, search_service, "code completion", "semantic")
+    assert removed_paper_id not in [search_result.paper_id for search_result in search_results]
+
+
+def save_papers(session_factory, summaries) -> None:
+    async def save():
+        async with session_factory() as db:
+            await PDFProcessor().save_papers_to_database([
+                {
+                    "original_filename" : f"keyword-{paper_number}.pdf",
+                    "file_hash"         : f"keyword-hash-{paper_number}",
+                    "file_size"         : 1,
+                    "summary_data"      : summary_data,
+                }
+                for paper_number, summary_data in enumerate(summaries)
+            ], db)
+    asyncio.run(save())
+
+
+def test_keyword_search_breaks_ties_by_bm25(session_factory):
+    save_papers(session_factory, [
+        {"title": "Protein folding", "abstract": "A transformer is used once.", "keywords": ["transformer", "protein"]},
+        {"title": "Transformer for transformer translation", "abstract": "Transformer models translate text.", "keywords": ["transformer", "translation"]},
+        {"title": "Image classification", "abstract": "Convolutional networks.", "keywords": ["transformer", "vision"]},
+    ])
+    search_service = SearchService(search_cache=SearchCache(enabled=False), corpus_version=CorpusVersion())
+
+    search_results = search(session_factory, search_service, "transformer", "keyword")
+
+    # 一致したキーワード数は同じため、本文中でよく現れる論文が上位になる (paper_idの降順ではない)
+    assert [search_result.title for search_result in search_results] == [
+        "Transformer for transformer translation", "Protein folding", "Image classification"
+    ]
+    assert all(search_result.relevance_score == 1.0 for search_result in search_results)
+
+
+def test_keyword_search_ranks_papers_matching_more_keywords_first(session_factory):
+    save_papers(session_factory, [
+        {"title": "Transformer translation", "abstract": "Transformer transformer transformer.", "keywords": ["transformer"]},
+        {"title": "Vision", "abstract": "Images.", "keywords": ["transformer", "vision"]},
+    ])
+    search_service = SearchService(search_cache=SearchCache(enabled=False), corpus_version=CorpusVersion())
+
+    search_results = search(session_factory, search_service, "transformer vision", "keyword")
+    assert [search_result.title for search_result in search_results] == ["Vision"]
+
+    async def search_any():
+        async with session_factory() as db:
+            return await search_service.search_papers("transformer vision", "keyword", 10, db, keyword_match="any")
+    search_results = asyncio.run(search_any())
+    assert [search_result.title for search_result in search_results] == ["Vision", "Transformer translation"]
+    assert [search_result.relevance_score for search_result in search_results] == [1.0, 0.5]
+
+
+def test_keyword_search_matches_whole_multi_word_query_before_splitting(session_factory):
+    save_papers(session_factory, [
+        {"title": "Message passing", "abstract": "Graphs.", "keywords": ["graph neural networks", "chemistry"]},
+        {"title": "Graph kernels", "abstract": "Kernels.", "keywords": ["graph", "kernel"]},
+    ])
+    search_service = SearchService(search_cache=SearchCache(enabled=False), corpus_version=CorpusVersion())
+
+    # 空白を含むキーワードと完全に一致する場合は、各語に分割しない
+    keyword_counts = {}
+    async def search_with_counts(query):
+        async with session_factory() as db:
+            return await search_service.search_papers(query, "keyword", 10, db, keyword_counts=keyword_counts)
+    search_results = asyncio.run(search_with_counts("Graph  Neural Networks"))
+    assert [search_result.title for search_result in search_results] == ["Message passing"]
+    assert keyword_counts == {"graph neural networks": 1}
+
+    # 一致するキーワードがない場合は空白で区切った各語で検索する
+    search_results = search(session_factory, search_service, "graph kernel", "keyword")
+    assert [search_result.title for search_result in search_results] == ["Graph kernels"]
+
+
+def test_split_search_keywords_accepts_delimiters_and_whitespace():
+    search_service = SearchService(search_cache=SearchCache(enabled=False), corpus_version=CorpusVersion())
+
+    assert search_service._split_search_keywords("Deep Learning, 自然言語処理、ＢＥＲＴ\ngraph") == [
+        "deep learning", "自然言語処理", "bert", "graph"
+    ]
+    assert search_service._split_search_keywords("deep  learning") == ["deep", "learning"]
+
+
+def test_search_cache_is_invalidated_by_papers_saved_in_another_process(session_factory):
+    save_papers(session_factory, [{"title": "Transformer translation", "abstract": "Text.", "keywords": ["transformer"]}])
+    search_service = SearchService(search_cache=SearchCache(enabled=True), corpus_version=CorpusVersion())
+    assert len(search(session_factory, search_service, "transformer", "keyword")) == 1
+
+    # CLIなど別のプロセスでの保存は、データベースのコーパスの更新回数で検出する
+    async def save_paper_from_another_process():
+        async with session_factory() as db:
+            await PDFProcessor().save_papers_to_database([{
+                "original_filename" : "cli.pdf",
+                "file_hash"         : "cli-hash",
+                "file_size"         : 1,
+                "summary_data"      : {"title": "Vision transformer", "abstract": "Images.", "keywords": ["transformer"]},
+            }], db)
+    asyncio.run(save_paper_from_another_process())
+
+    assert len(search(session_factory, search_service, "transformer", "keyword")) == 2
+    assert search_service.search_cache.get_stats()["invalidations"] == 1
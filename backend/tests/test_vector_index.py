@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from services.vector_index import VectorIndex
+
+DIMENSION = 4
+
+
+def create_vector_index(index_directory, **options) -> VectorIndex:
+    return VectorIndex(str(index_directory), "test", DIMENSION, **options)
+
+
+def create_embedding(*values: float) -> np.ndarray:
+    embedding = np.asarray(values, dtype=np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+def test_search_returns_top_k_in_descending_score_order(tmp_path):
+    vector_index = create_vector_index(tmp_path)
+    vector_index.upsert([1, 2, 3], np.vstack([
+        create_embedding(1, 0, 0, 0),
+        create_embedding(1, 1, 0, 0),
+        create_embedding(0, 0, 1, 0),
+    ]))
+
+    results = vector_index.search(create_embedding(1, 0.2, 0, 0), 2)
+
+    assert [paper_id for paper_id, _ in results] == [1, 2]
+    assert results[0][1] > results[1][1]
+
+
+def test_upsert_replaces_and_remove_excludes_paper(tmp_path):
+    vector_index = create_vector_index(tmp_path)
+    vector_index.upsert([1, 2], np.vstack([create_embedding(1, 0, 0, 0), create_embedding(0, 1, 0, 0)]))
+    vector_index.save()
+
+    # 保存済みの行列にある論文の更新・削除
+    vector_index.upsert([1], np.vstack([create_embedding(0, 0, 1, 0)]))
+    vector_index.remove(2)
+
+    assert vector_index.get_paper_ids() == {1}
+    assert vector_index.search(create_embedding(0, 0, 1, 0), 5)[0][0] == 1
+    assert [paper_id for paper_id, _ in vector_index.search(create_embedding(0, 1, 0, 0), 5)] == [1]
+
+
+def test_upsert_is_not_blocked_while_search_computes_scores(tmp_path):
+    vector_index = create_vector_index(tmp_path)
+    vector_index.upsert([1], np.vstack([create_embedding(1, 0, 0, 0)]))
+    vector_index.save()
+
+    # 行列積の途中で止まる保存済みの行列
+    search_started  = threading.Event()
+    upsert_finished = threading.Event()
+    base_embeddings = vector_index._base_embeddings
+
+    class BlockingEmbeddings:
+        def __matmul__(self, query_embedding):
+            search_started.set()
+            upsert_finished.wait(timeout=5)
+            return base_embeddings @ query_embedding
+
+    vector_index._base_embeddings = BlockingEmbeddings()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        search_future = executor.submit(vector_index.search, create_embedding(1, 0, 0, 0), 5)
+        assert search_started.wait(timeout=5)
+
+        upsert_thread = threading.Thread(
+            target=lambda: vector_index.upsert([2], np.vstack([create_embedding(0, 1, 0, 0)]))
+        )
+        upsert_thread.start()
+        upsert_thread.join(timeout=1)
+        assert not upsert_thread.is_alive()
+        upsert_finished.set()
+
+        # 検索開始時点のインデックスで検索される
+        assert [paper_id for paper_id, _ in search_future.result()] == [1]
+    assert vector_index.get_paper_ids() == {1, 2}
+
+
+def test_save_and_load_round_trip_with_delta_log(tmp_path):
+    vector_index = create_vector_index(tmp_path, compaction_min_records=100)
+    vector_index.upsert([1, 2, 3], np.vstack([
+        create_embedding(1, 0, 0, 0),
+        create_embedding(0, 1, 0, 0),
+        create_embedding(0, 0, 1, 0),
+    ]))
+    vector_index.save()
+    embeddings_file_names = {file_name for file_name in os.listdir(tmp_path) if file_name.startswith("embeddings")}
+
+    # 2回目以降の保存は差分ログへの追記のみで、行列は書き直さない
+    vector_index.upsert([4], np.vstack([create_embedding(0, 0, 0, 1)]))
+    vector_index.upsert([1], np.vstack([create_embedding(1, 1, 0, 0)]))
+    vector_index.remove(3)
+    vector_index.save()
+    assert vector_index.pending_count == 0
+    assert {file_name for file_name in os.listdir(tmp_path) if file_name.startswith("embeddings")} == embeddings_file_names
+
+    loaded_vector_index = create_vector_index(tmp_path)
+    loaded_vector_index.load()
+
+    assert loaded_vector_index.get_paper_ids() == {1, 2, 4}
+    query_embedding = create_embedding(1, 1, 0, 0)
+    assert loaded_vector_index.search(query_embedding, 3) == vector_index.search(query_embedding, 3)
+    assert loaded_vector_index.search(query_embedding, 1)[0][0] == 1
+
+
+def test_save_compacts_delta_log_into_new_generation(tmp_path):
+    vector_index = create_vector_index(tmp_path, compaction_min_records=2)
+    vector_index.upsert([1], np.vstack([create_embedding(1, 0, 0, 0)]))
+    vector_index.save()
+    for paper_id in range(2, 6):
+        vector_index.upsert([paper_id], np.vstack([create_embedding(paper_id, 1, 0, 0)]))
+        vector_index.save()
+
+    with open(tmp_path / VectorIndex.METADATA_FILE_NAME, encoding="utf-8") as metadata_file:
+        metadata = json.load(metadata_file)
+    assert metadata["generation"] > 1
+    # 古い世代のファイルは削除される
+    generations = {
+        int(VectorIndex.GENERATION_FILE_PATTERN.match(file_name).group(1))
+        for file_name in os.listdir(tmp_path)
+        if VectorIndex.GENERATION_FILE_PATTERN.match(file_name)
+    }
+    assert generations == {metadata["generation"]}
+
+    loaded_vector_index = create_vector_index(tmp_path)
+    loaded_vector_index.load()
+    assert loaded_vector_index.get_paper_ids() == {1, 2, 3, 4, 5}
+
+
+def test_load_ignores_torn_delta_record(tmp_path):
+    vector_index = create_vector_index(tmp_path, compaction_min_records=100)
+    vector_index.upsert([1], np.vstack([create_embedding(1, 0, 0, 0)]))
+    vector_index.save()
+    vector_index.upsert([2], np.vstack([create_embedding(0, 1, 0, 0)]))
+    vector_index.save()
+
+    # 追記途中で中断された書きかけの記録
+    delta_file_name = next(file_name for file_name in os.listdir(tmp_path) if file_name.startswith("delta"))
+    with open(tmp_path / delta_file_name, "ab") as delta_file:
+        delta_file.write(b"\x00" * 5)
+
+    loaded_vector_index = create_vector_index(tmp_path, compaction_min_records=100)
+    loaded_vector_index.load()
+    assert loaded_vector_index.get_paper_ids() == {1, 2}
+
+    # 書きかけの記録を切り捨ててから追記する
+    loaded_vector_index.upsert([3], np.vstack([create_embedding(0, 0, 1, 0)]))
+    loaded_vector_index.save()
+    reloaded_vector_index = create_vector_index(tmp_path)
+    reloaded_vector_index.load()
+    assert reloaded_vector_index.get_paper_ids() == {1, 2, 3}
+
+
+def test_load_discards_index_with_mismatched_row_counts(tmp_path):
+    vector_index = create_vector_index(tmp_path)
+    vector_index.upsert([1, 2], np.vstack([create_embedding(1, 0, 0, 0), create_embedding(0, 1, 0, 0)]))
+    vector_index.save()
+
+    # 論文IDのファイルだけが書き換えられ、埋め込みと行数がずれた状態
+    paper_ids_file_name = next(file_name for file_name in os.listdir(tmp_path) if file_name.startswith("paper_ids"))
+    np.save(tmp_path / paper_ids_file_name, np.asarray([1], dtype=np.int64))
+
+    loaded_vector_index = create_vector_index(tmp_path)
+    loaded_vector_index.load()
+    assert loaded_vector_index.get_paper_ids() == set()
+
+    # 次回の保存で新しい世代として作り直す
+    loaded_vector_index.upsert([3], np.vstack([create_embedding(0, 0, 1, 0)]))
+    loaded_vector_index.save()
+    reloaded_vector_index = create_vector_index(tmp_path)
+    reloaded_vector_index.load()
+    assert reloaded_vector_index.get_paper_ids() == {3}
+
+
+def test_load_ignores_index_of_different_backend(tmp_path):
+    vector_index = create_vector_index(tmp_path)
+    vector_index.upsert([1], np.vstack([create_embedding(1, 0, 0, 0)]))
+    vector_index.save()
+
+    other_vector_index = VectorIndex(str(tmp_path), "other", DIMENSION)
+    other_vector_index.load()
+    assert other_vector_index.get_paper_ids() == set()
@@ -240,7 +240,18 @@ const PaperDetailPage = () => {
     }
   );
 
-  const questionMutation = useMutation(paperApi.askQuestion, {
+  // 回答は生成された順に表示する
+  const askQuestionStream = (questionRequest) => {
+    setCurrentAnswer({ question: questionRequest.question, answer: '' });
+    return paperApi.askQuestionStream(questionRequest, (answerChunk) => {
+      setCurrentAnswer((previousAnswer) => ({
+        ...previousAnswer,
+        answer: previousAnswer.answer + answerChunk
+      }));
+    });
+  };
+
+  const questionMutation = useMutation(askQuestionStream, {
     onSuccess: (data) => {
       setCurrentAnswer(data);
       reset();
@@ -105,17 +105,6 @@ const MetaItem = styled.div`
   }
 `;
 
-const PaperAbstract = styled.p`
-  color: #555;
-  line-height: 1.5;
-  margin-bottom: 1rem;
-  display: -webkit-box;
-  -webkit-line-clamp: 4;
-  -webkit-box-orient: vertical;
-  overflow: hidden;
-  font-size: 0.9rem;
-`;
-
 const Keywords = styled.div`
   display: flex;
   flex-wrap: wrap;
@@ -174,18 +163,20 @@ const EmptyStateLink = styled(Link)`
 
 const PaperList = () => {
   const { 
-    data: papers, 
+    data: paperPage, 
     isLoading, 
     error 
   } = useQuery(
     'papers', 
-    () => paperApi.getAllPapers(50, 0),
+    () => paperApi.getAllPapers(50),
     {
       staleTime: 5 * 60 * 1000, // 5分間キャッシュ
       cacheTime: 10 * 60 * 1000, // 10分間保持
     }
   );
 
+  const papers = paperPage?.items;
+
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString('ja-JP', {
       year: 'numeric',
@@ -253,10 +244,6 @@ const PaperList = () => {
               </MetaItem>
             </PaperMeta>
 
-            {paper.abstract && (
-              <PaperAbstract>{paper.abstract}</PaperAbstract>
-            )}
-
             {paper.keywords && paper.keywords.length > 0 && (
               <Keywords>
                 {paper.keywords.slice(0, 5).map((keyword, index) => (
@@ -4,9 +4,9 @@ import { useMutation } from 'react-query';
 import { toast } from 'react-toastify';
 import { Link } from 'react-router-dom';
 import styled from 'styled-components';
-import { Search, FileText, User, Hash, Globe, Calendar, ExternalLink } from 'lucide-react';
+import { Search, FileText, User, Hash, Globe, Sparkles, Layers, Calendar, ExternalLink } from 'lucide-react';
 import { paperApi } from '../services/api';
-import { SEARCH_TYPES } from '../types/api';
+import { SEARCH_TYPES, KEYWORD_MATCH_MODES } from '../types/api';
 
 const SearchContainer = styled.div`
   max-width: 900px;
@@ -227,6 +227,13 @@ const searchTypeOptions = [
   { value: SEARCH_TYPES.TITLE, label: 'タイトル検索', icon: FileText },
   { value: SEARCH_TYPES.AUTHOR, label: '著者検索', icon: User },
   { value: SEARCH_TYPES.FULL_TEXT, label: '全文検索', icon: Globe },
+  { value: SEARCH_TYPES.SEMANTIC, label: 'セマンティック検索', icon: Sparkles },
+  { value: SEARCH_TYPES.HYBRID, label: 'ハイブリッド検索', icon: Layers },
+];
+
+const keywordMatchOptions = [
+  { value: KEYWORD_MATCH_MODES.ALL, label: 'すべて含む' },
+  { value: KEYWORD_MATCH_MODES.ANY, label: 'いずれかを含む' },
 ];
 
 const SearchPage = () => {
@@ -235,9 +242,11 @@ const SearchPage = () => {
     defaultValues: {
       query: '',
       search_type: SEARCH_TYPES.KEYWORD,
+      keyword_match: KEYWORD_MATCH_MODES.ALL,
       limit: 20
     }
   });
+  const searchType = watch('search_type');
 
   const searchMutation = useMutation(paperApi.searchPapers, {
     onSuccess: (data) => {
@@ -277,7 +286,9 @@ const SearchPage = () => {
             </SearchIcon>
             <SearchInput
               {...register('query')}
-              placeholder="検索キーワードを入力してください"
+              placeholder={searchType === SEARCH_TYPES.KEYWORD
+                ? 'キーワードをカンマ区切りで入力してください（例: graph neural networks, chemistry）'
+                : '検索キーワードを入力してください'}
               disabled={searchMutation.isLoading}
             />
           </SearchInputContainer>
@@ -292,6 +303,19 @@ const SearchPage = () => {
               </option>
             ))}
           </SearchTypeSelect>
+
+          {searchType === SEARCH_TYPES.KEYWORD && (
+            <SearchTypeSelect
+              {...register('keyword_match')}
+              disabled={searchMutation.isLoading}
+            >
+              {keywordMatchOptions.map(option => (
+                <option key={option.value} value={option.value}>
+                  {option.label}
+                </option>
+              ))}
+            </SearchTypeSelect>
+          )}
           
           <SearchButton 
             type="submit" 
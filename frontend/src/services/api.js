@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { API_BASE_URL } from '../types/api';
+import { API_BASE_URL, JOB_STATUSES } from '../types/api';
 
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
@@ -35,7 +35,7 @@ apiClient.interceptors.response.use(
 
 // API関数群
 export const paperApi = {
-  // PDFアップロード・要約
+  // PDFアップロード・要約（ジョブ完了までポーリング）
   uploadAndSummarizePaper: async (file) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -45,26 +45,98 @@ export const paperApi = {
         'Content-Type': 'multipart/form-data',
       },
     });
+    return paperApi.waitForIngestionJob(response.data.job_id);
+  },
+
+  // 取り込みジョブの状態を取得
+  getIngestionJob: async (jobId) => {
+    const response = await apiClient.get(`/jobs/${jobId}`);
     return response.data;
   },
 
+  // 取り込みジョブの完了を待って要約結果を返す
+  waitForIngestionJob: async (jobId, pollIntervalMs = 2000) => {
+    for (;;) {
+      const job = await paperApi.getIngestionJob(jobId);
+      if (job.status === JOB_STATUSES.COMPLETED) {
+        return job.result;
+      }
+      if (job.status === JOB_STATUSES.FAILED) {
+        throw new Error(job.error_message || '論文の取り込みに失敗しました');
+      }
+      await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+    }
+  },
+
   // 論文検索
   searchPapers: async (searchRequest) => {
     const response = await apiClient.post('/search-papers', searchRequest);
     return response.data;
   },
 
+  // 論文数の多いキーワードを取得
+  getKeywordFacets: async (limit = 20) => {
+    const response = await apiClient.get('/keywords/facets', { params: { limit } });
+    return response.data;
+  },
+
   // PDFに質問
   askQuestion: async (questionRequest) => {
     const response = await apiClient.post('/ask-question', questionRequest);
     return response.data;
   },
 
-  // 全ての論文を取得
-  getAllPapers: async (limit = 20, offset = 0) => {
-    const response = await apiClient.get('/papers', {
-      params: { limit, offset }
+  // 複数の論文に複数の質問をまとめてする（結果は論文・質問ごと）
+  askQuestions: async (batchQuestionRequest) => {
+    const response = await apiClient.post('/ask-questions', batchQuestionRequest);
+    return response.data;
+  },
+
+  // 論文に質問し、回答を生成された順にonChunkへ渡す（Server-Sent Events）
+  askQuestionStream: async (questionRequest, onChunk) => {
+    const response = await fetch(`${API_BASE_URL}/ask-question/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(questionRequest),
     });
+    if (!response.ok) {
+      const errorBody = await response.json().catch(() => ({}));
+      throw new Error(errorBody.detail || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) {
+        throw new Error('回答の受信が途中で終了しました');
+      }
+      buffer += decoder.decode(value, { stream: true });
+
+      // イベントは空行で区切られる
+      let separatorIndex;
+      while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, separatorIndex);
+        buffer = buffer.slice(separatorIndex + 2);
+
+        const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (eventName === 'chunk') {
+          onChunk(data.text);
+        } else if (eventName === 'done') {
+          return data;
+        } else if (eventName === 'error') {
+          throw new Error(data.detail);
+        }
+      }
+    }
+  },
+
+  // 論文一覧を取得（cursorには前ページのnext_cursorを指定）
+  getAllPapers: async (limit = 20, cursor = null) => {
+    const params = cursor === null ? { limit } : { limit, cursor };
+    const response = await apiClient.get('/papers', { params });
     return response.data;
   },
 
@@ -16,11 +16,27 @@ export const PaperSummaryResponseSchema = {
   keywords: 'array'
 };
 
+// 論文一覧アイテム
+export const PaperListItemSchema = {
+  paper_id: 'number',
+  title: 'string',
+  authors: 'string',
+  keywords: 'array',
+  upload_date: 'string'
+};
+
+// 論文一覧レスポンス
+export const PaperListResponseSchema = {
+  items: 'array',
+  next_cursor: 'number' // 最終ページの場合はnull
+};
+
 // 検索リクエスト
 export const SearchRequestSchema = {
   query: 'string',
-  search_type: 'string', // keyword, title, author, full_text
-  limit: 'number'
+  search_type: 'string', // keyword, title, author, full_text, semantic, hybrid
+  limit: 'number',
+  keyword_match: 'string' // all, any (キーワード検索のみ)
 };
 
 // 検索結果アイテム
@@ -38,7 +54,20 @@ export const SearchResultItemSchema = {
 export const SearchResponseSchema = {
   query: 'string',
   results: 'array',
-  total_count: 'number'
+  total_count: 'number',
+  timings: 'object',
+  keyword_counts: 'object'
+};
+
+// キーワード検索の一致条件
+export const KEYWORD_MATCH_MODES = {
+  ALL: 'all',
+  ANY: 'any'
+};
+
+// キーワードファセットレスポンス
+export const KeywordFacetResponseSchema = {
+  facets: 'array' // { keyword, paper_count }
 };
 
 // 質問リクエスト
@@ -52,7 +81,21 @@ export const QuestionRequestSchema = {
 export const QuestionResponseSchema = {
   question: 'string',
   answer: 'string',
-  paper_id: 'number'
+  paper_id: 'number',
+  token_usage: 'object' // { prompt_tokens, cached_tokens, trimmed_tokens, input_tokens_saved }
+};
+
+// 一括質問リクエスト（すべての論文にすべての質問をする）
+export const BatchQuestionRequestSchema = {
+  paper_ids: 'array',
+  questions: 'array',
+  user_session: 'string'
+};
+
+// 一括質問レスポンス
+export const BatchQuestionResponseSchema = {
+  answers: 'array', // { paper_id, question, answer, detail }
+  token_usage: 'object'
 };
 
 // 検索タイプ定数
@@ -60,7 +103,29 @@ export const SEARCH_TYPES = {
   KEYWORD: 'keyword',
   TITLE: 'title',
   AUTHOR: 'author',
-  FULL_TEXT: 'full_text'
+  FULL_TEXT: 'full_text',
+  SEMANTIC: 'semantic',
+  HYBRID: 'hybrid'
+};
+
+// 取り込みジョブレスポンス
+export const IngestionJobResponseSchema = {
+  job_id: 'string',
+  status: 'string', // pending, summarizing, saving, completed, failed
+  progress_message: 'string',
+  original_filename: 'string',
+  paper_id: 'number',
+  error_message: 'string',
+  result: 'object' // 完了時のPaperSummaryResponse
+};
+
+// 取り込みジョブの状態定数
+export const JOB_STATUSES = {
+  PENDING: 'pending',
+  SUMMARIZING: 'summarizing',
+  SAVING: 'saving',
+  COMPLETED: 'completed',
+  FAILED: 'failed'
 };
 
 // エラーレスポンス